@@ -13,14 +13,41 @@ for k in list(os.environ.keys()):
     if k.startswith("\ufeff"):
         os.environ[k.lstrip("\ufeff")] = os.environ[k]
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi.responses import RedirectResponse
+from . import http_pool, item_bank, model_registry, skill_model, warmup
+from .write_behind import writes
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Preload the retriever off the request path; /api/ready reports when it's done
+    preloader = asyncio.create_task(warmup.run())
+    # Load the model list once, then keep it fresh off the request path
+    refresher = asyncio.create_task(model_registry.refresh_forever())
+    # Background item-bank refills (plus any ITEM_BANK_WARM buckets)
+    bank = item_bank.get_bank()
+    bank.start(item_bank.warm_buckets())
+    # Batched attempt/quiz writes; re-queues rows spilled by the last shutdown
+    writes.start()
+    # Per-student skill aggregates: load the last snapshot, then snapshot periodically
+    skill_model.start()
+    yield
+    await skill_model.stop()
+    await writes.stop()
+    await bank.stop()
+    refresher.cancel()
+    preloader.cancel()
+    # Close pooled LLM connections on worker shutdown
+    await http_pool.aclose()
 
 app = FastAPI(
     title="English AI Tutor API",
     version="0.1.0",
     docs_url="/docs",        # Swagger UI
     redoc_url="/redoc",      # ReDoc
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -31,7 +58,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from .routes import debug, health, models, quizzes
+from .routes import attempts, debug, health, models, quizzes
+app.include_router(attempts.router)
 app.include_router(debug.router)
 app.include_router(health.router)
 app.include_router(models.router)
@@ -0,0 +1 @@
+# Standalone benchmark scripts, run as `python -m server.benchmarks.<name>` from the project root.
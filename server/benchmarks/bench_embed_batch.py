@@ -0,0 +1,60 @@
+# server/benchmarks/bench_embed_batch.py
+"""
+Query-encode throughput under concurrency: inline `encode([query])` per request thread
+vs the micro-batching worker (embed_batcher.py).
+
+Usage (from the project root):
+  python -m server.benchmarks.bench_embed_batch --queries 512 --concurrency 1 8 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import numpy as np
+
+from .. import retriever
+from ..embed_batcher import EmbedBatcher
+
+TOPICS = ["past tense", "adjectives", "the sea", "punctuation", "my school", "Port Louis market", "animals"]
+
+
+def _queries(n: int) -> List[str]:
+    # Distinct strings, so nothing is shared between requests
+    return [f"{TOPICS[i % len(TOPICS)]} question {i}" for i in range(n)]
+
+
+def _run(encode_one: Callable[[str], np.ndarray], queries: List[str], concurrency: int) -> float:
+    """Queries per second with `concurrency` request threads."""
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(encode_one, queries))
+    return len(queries) / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=32)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    retriever._model = SentenceTransformer(retriever.EMBED_MODEL)
+    retriever._encode_texts(["warm up"])
+    queries = _queries(args.queries)
+
+    print(f"{'threads':>7}  {'inline q/s':>10}  {'batched q/s':>11}  {'avg batch':>9}")
+    for c in args.concurrency:
+        inline = _run(lambda q: retriever._encode_texts([q])[0], queries, c)
+        batcher = EmbedBatcher(retriever._encode_texts, window_ms=args.window_ms, max_batch=args.max_batch)
+        batched = _run(batcher.encode, queries, c)
+        print(f"{c:>7}  {inline:>10.1f}  {batched:>11.1f}  {batcher.stats()['avg_batch']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# server/benchmarks/bench_index_types.py
+"""
+Recall@k vs latency vs memory for each serving-index type, against the exact flat baseline.
+
+Runs on the stored passage vectors; no SentenceTransformer needed. Queries are corpus
+vectors with Gaussian noise (re-normalized), standing in for paraphrased queries.
+
+Usage (from the project root):
+  python -m server.benchmarks.bench_index_types --queries 200 --k 20
+  python -m server.benchmarks.bench_index_types --replicate 4   # simulate several textbooks
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from .. import index_types
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+INDEX_PATH = DATA_DIR / "index.faiss"
+VECTORS_PATH = DATA_DIR / "vectors.faiss"
+
+
+def load_vectors() -> np.ndarray:
+    """All passage vectors, from the ID-mapped store if present, else the flat index."""
+    if VECTORS_PATH.exists():
+        store = faiss.read_index(str(VECTORS_PATH))
+        ids = faiss.vector_to_array(store.id_map)
+        return np.vstack([store.reconstruct(int(i)) for i in ids])
+    index = faiss.read_index(str(INDEX_PATH))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def make_queries(vecs: np.ndarray, n: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    picks = vecs[rng.choice(len(vecs), size=n, replace=len(vecs) < n)]
+    q = (picks + rng.normal(scale=noise, size=picks.shape)).astype("float32")
+    faiss.normalize_L2(q)
+    return q
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20, help="recall@k (the retriever's TOP_N)")
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--replicate", type=int, default=1, help="tile the corpus N times (with jitter)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    base = load_vectors()
+    vecs = np.vstack([base] + [make_queries(base, len(base), 0.02, rng) for _ in range(args.replicate - 1)])
+    vecs = np.ascontiguousarray(vecs, dtype="float32")
+    queries = make_queries(vecs, args.queries, args.noise, rng)
+    print(f"{len(vecs)} vectors x {vecs.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    truth = None
+    print(f"{'type':<6}{'recall@k':>10}{'p50 ms':>9}{'p99 ms':>9}{'build s':>9}{'size MB':>9}  params")
+    for kind in index_types.INDEX_TYPES:
+        params = index_types.resolve_params(kind, len(vecs), vecs.shape[1])
+        t0 = time.perf_counter()
+        index = index_types.build(kind, vecs, params)
+        build_s = time.perf_counter() - t0
+        search_params = index_types.search_parameters(kind, params)
+
+        timings = []
+        found = np.empty((len(queries), args.k), dtype="int64")
+        for i, q in enumerate(queries):
+            t0 = time.perf_counter()
+            _, ids = index.search(q.reshape(1, -1), args.k, params=search_params)
+            timings.append((time.perf_counter() - t0) * 1000)
+            found[i] = ids[0]
+        if truth is None:
+            truth = found  # flat is first: exact ground truth
+
+        recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+        size_mb = len(faiss.serialize_index(index)) / 1e6
+        p50, p99 = np.percentile(timings, [50, 99])
+        print(f"{kind:<6}{recall:>10.3f}{p50:>9.3f}{p99:>9.3f}{build_s:>9.2f}{size_mb:>9.2f}  {params}")
+
+
+if __name__ == "__main__":
+    main()
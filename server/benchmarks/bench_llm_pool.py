@@ -0,0 +1,123 @@
+# server/benchmarks/bench_llm_pool.py
+"""
+Load test: concurrent quiz-generation LLM round trips against a local stub OpenAI server.
+
+  before  the old route: a fresh sync `OpenAI` client per request, models.retrieve +
+          chat.completions.create, each request holding one of FastAPI's 40 threadpool slots
+  after   the shared AsyncOpenAI client on http_pool's keep-alive pool, on the event loop
+
+Usage (from the project root):
+  python -m server.benchmarks.bench_llm_pool --requests 200 --concurrency 20 --delay-ms 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+from fastapi import FastAPI
+from openai import OpenAI
+
+from .. import http_pool
+
+STARLETTE_THREADPOOL = 40  # anyio's default thread limiter used by sync FastAPI routes
+MODEL = "gpt-4o-mini"
+MESSAGES = [{"role": "user", "content": "Generate a quiz"}]
+
+
+def make_stub(delay_s: float) -> FastAPI:
+    stub = FastAPI()
+
+    @stub.get("/v1/models/{model}")
+    async def model(model: str):
+        return {"id": model, "object": "model", "created": 0, "owned_by": "stub"}
+
+    @stub.post("/v1/chat/completions")
+    async def chat():
+        await asyncio.sleep(delay_s)  # stands in for LLM generation time
+        return {
+            "id": "stub", "object": "chat.completion", "created": 0, "model": MODEL,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": '{"items": []}'}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+    return stub
+
+
+def _serve_stub(port: int, delay_s: float) -> None:
+    uvicorn.run(make_stub(delay_s), host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_stub(port: int, delay_s: float) -> multiprocessing.Process:
+    """Stub server in its own process, so it doesn't compete with the client for the GIL."""
+    proc = multiprocessing.Process(target=_serve_stub, args=(port, delay_s), daemon=True)
+    proc.start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+
+
+def legacy_request(base_url: str) -> None:
+    client = OpenAI(api_key="sk-bench", base_url=base_url)
+    client.models.retrieve(MODEL)
+    client.chat.completions.create(model=MODEL, messages=MESSAGES, max_tokens=2000)
+
+
+def run_before(base_url: str, n: int) -> float:
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(STARLETTE_THREADPOOL) as pool:
+        list(pool.map(lambda _: legacy_request(base_url), range(n)))
+    return time.perf_counter() - t0
+
+
+async def run_after(n: int, concurrency: int) -> float:
+    client = http_pool.get_openai_client("sk-bench")
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with sem:
+            await client.models.retrieve(MODEL)
+            await client.chat.completions.create(model=MODEL, messages=MESSAGES, max_tokens=2000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    elapsed = time.perf_counter() - t0
+    await http_pool.aclose()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20, help="in-flight requests (after), also the pool size")
+    parser.add_argument("--delay-ms", type=float, default=200, help="stub completion latency")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stub = start_stub(args.port, args.delay_ms / 1000)
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("LLM_MAX_CONNECTIONS", str(args.concurrency))
+    os.environ.setdefault("LLM_MAX_KEEPALIVE", str(args.concurrency))
+
+    before = run_before(base_url, args.requests)
+    after = asyncio.run(run_after(args.requests, args.concurrency))
+    print(f"{args.requests} requests, stub latency {args.delay_ms:.0f} ms")
+    print(f"{'path':<34}{'wall s':>9}{'req/s':>9}")
+    print(f"{'before (sync client per request)':<34}{before:>9.2f}{args.requests / before:>9.1f}")
+    print(f"{'after (async pooled client)':<34}{after:>9.2f}{args.requests / after:>9.1f}")
+    stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
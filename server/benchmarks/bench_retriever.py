@@ -0,0 +1,84 @@
+# server/benchmarks/bench_retriever.py
+"""
+Latency of retriever.search: legacy "encode every candidate" path vs the FAISS index path.
+
+The query-embedding and ranked-pool caches are turned off and search runs in dense
+mode, so every timed call encodes the query and searches the index (the few QUERIES
+would otherwise be cache hits after the first round).
+
+Usage (from the project root):
+  python -m server.benchmarks.bench_retriever --iters 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from .. import retriever
+
+QUERIES = [
+    "PSAC Grade 6 English",
+    "past tense verbs",
+    "adjectives and adverbs",
+    "reading comprehension about the sea",
+    "punctuation and capital letters",
+]
+
+
+def legacy_search(query: str, k: int = 6, seed: int | None = None) -> List[Dict]:
+    """The pre-index implementation: re-encode every passage on every call."""
+    retriever._load()
+    candidates = retriever._passages
+    assert candidates is not None
+    cand_vecs = retriever._encode_texts([r["text"] for r in candidates])
+    q_vec = retriever._encode_texts([query]).squeeze(0)
+    order = np.argsort(-(cand_vecs @ q_vec))
+    pool = [candidates[i] for i in order[: min(20, len(order))]]
+    random.Random(seed).shuffle(pool)
+    return pool[:k]
+
+
+def _measure(fn: Callable[[str], object], iters: int) -> Dict[str, float]:
+    timings = []
+    for i in range(iters):
+        t0 = time.perf_counter()
+        fn(QUERIES[i % len(QUERIES)])
+        timings.append((time.perf_counter() - t0) * 1000)
+    arr = np.asarray(timings)
+    return {
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "mean_ms": float(arr.mean()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iters", type=int, default=50, help="timed calls per path")
+    parser.add_argument("--legacy-iters", type=int, default=5, help="timed calls for the slow legacy path")
+    args = parser.parse_args()
+
+    # Read by retriever._load(): time encoding + FAISS search, not cache hits
+    os.environ["EMBED_CACHE_SIZE"] = "0"
+    os.environ["RETRIEVER_POOL_CACHE_SIZE"] = "0"
+    retriever._load()
+    retriever.search(QUERIES[0], mode="dense")  # warm-up: model, index and passages loaded
+
+    rows = [
+        ("legacy (encode all)", _measure(lambda q: legacy_search(q), args.legacy_iters)),
+        ("faiss index", _measure(lambda q: retriever.search(q, mode="dense"), args.iters)),
+        ("faiss index + filter", _measure(lambda q: retriever.search(q, skills=["grammar"], mode="dense"), args.iters)),
+    ]
+    print(f"{'path':<24}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, r in rows:
+        print(f"{name:<24}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['mean_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# server/benchmarks/bench_startup.py
+"""
+Startup-cost regression check.
+
+  import  `python -X importtime -c "import server.app"` in fresh interpreters: median
+          cumulative import time, the slowest direct imports, and a check that none of
+          HEAVY_MODULES (torch, sentence-transformers, faiss, openai, supabase) load at
+          import. Exits 1 if a heavy module is imported or the median is over budget.
+  serve   cold `uvicorn server.app:app`: time until /api/live answers (process start
+          to accepting traffic) and until /api/ready (retriever preloaded).
+
+Usage (from the project root):
+  python -m server.benchmarks.bench_startup --runs 5 --budget-ms 1500
+  python -m server.benchmarks.bench_startup --serve --port 8765
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "faiss", "openai", "supabase", "transformers")
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_once() -> Tuple[float, Dict[str, float], List[str]]:
+    """(total ms, ms per direct import of server.app, heavy modules loaded) for one cold import."""
+    check = f"import sys, server.app; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total = 0.0
+    children: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        cumulative_us, depth, name = int(m.group(2)), len(m.group(3)) // 2, m.group(4)
+        if name == "server.app":
+            total = cumulative_us / 1000
+        elif depth == 1:
+            children[name] = cumulative_us / 1000
+    heavy = [m for m in proc.stdout.strip().split(",") if m]
+    return total, children, heavy
+
+
+def bench_import(runs: int, budget_ms: float) -> bool:
+    totals: List[float] = []
+    last: Dict[str, float] = {}
+    heavy: List[str] = []
+    for _ in range(runs):
+        total, last, heavy = import_once()
+        totals.append(total)
+    median = statistics.median(totals)
+    print(f"import server.app: median {median:.0f} ms over {runs} runs (min {min(totals):.0f}, max {max(totals):.0f})")
+    print("slowest direct imports (last run):")
+    for name, ms in sorted(last.items(), key=lambda kv: -kv[1])[:8]:
+        print(f"  {ms:8.1f} ms  {name}")
+    ok = True
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        ok = False
+    if median > budget_ms:
+        print(f"FAIL: median {median:.0f} ms is over the {budget_ms:.0f} ms budget")
+        ok = False
+    if ok:
+        print(f"OK: within the {budget_ms:.0f} ms budget, no heavy modules")
+    return ok
+
+
+def _wait_for(url: str, deadline: float) -> Optional[float]:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return time.perf_counter()
+        except Exception:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def bench_serve(port: int, timeout_s: float) -> None:
+    env = dict(os.environ)
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server.app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = t0 + timeout_s
+        live = _wait_for(f"http://127.0.0.1:{port}/api/live", deadline)
+        ready = _wait_for(f"http://127.0.0.1:{port}/api/ready", deadline) if live else None
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(f"cold uvicorn start -> /api/live:  {(live - t0) * 1000:8.0f} ms" if live else "never became live")
+    print(f"cold uvicorn start -> /api/ready: {(ready - t0) * 1000:8.0f} ms" if ready else "never became ready")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=1500.0, help="max median import time of server.app")
+    ap.add_argument("--serve", action="store_true", help="also time a cold uvicorn start")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--timeout-s", type=float, default=120.0)
+    args = ap.parse_args()
+
+    ok = bench_import(args.runs, args.budget_ms)
+    if args.serve:
+        bench_serve(args.port, args.timeout_s)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# server/benchmarks/bench_store.py
+"""
+Write-path benchmark on the local SQLite stand-in (no network needed).
+
+  before  the old pattern: a new client (here: a new store/connection) per write, one row
+          per request, as `sb()` did with create_client on every call
+  after   the process-wide store with chunked multi-row upserts (supabase_client)
+
+Usage (from the project root):
+  python -m server.benchmarks.bench_store --rows 5000 --chunk-size 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from ..supabase_client import SQLiteStore
+
+
+def make_rows(n: int):
+    return [
+        {"id": str(uuid.uuid4()), "quiz_id": "q1", "item_id": str(i), "skill": "grammar",
+         "user_id": f"u{i % 40}", "user_answer": "a", "is_correct": i % 3 != 0, "time_ms": 9000}
+        for i in range(n)
+    ]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--chunk-size", type=int, default=500)
+    args = ap.parse_args()
+    os.environ["DB_CHUNK_SIZE"] = str(args.chunk_size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.sqlite"
+        rows = make_rows(args.rows)
+
+        t = time.perf_counter()
+        for row in rows:
+            SQLiteStore(path).insert_many("attempts_before", [row])
+        before = time.perf_counter() - t
+
+        store = SQLiteStore(path)
+        t = time.perf_counter()
+        store.upsert_many("attempts_after", rows, on_conflict="id")
+        after = time.perf_counter() - t
+
+        print(f"rows: {args.rows}, chunk size: {args.chunk_size}")
+        print(f"before  per-row, new client each: {before * 1000:8.1f} ms  ({args.rows / before:9.0f} rows/s)")
+        print(f"after   shared store, bulk upsert: {after * 1000:8.1f} ms  ({args.rows / after:9.0f} rows/s)")
+        print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,389 @@
 # server/build_index.py
-import os, json
+"""
+Build the retrieval corpus (passages.jsonl, passages.store, index.faiss, lexical.npz,
+dupes.npy) from textbook PDFs.
+
+Incremental by default: each PDF and each page is hashed, and only new or changed
+pages are re-embedded. Vectors live in an ID-mapped store (vectors.faiss) so stale
+ones can be removed; manifest.json records which page produced which vectors.
+Adding a second textbook is an append, not a full rebuild. Sources are keyed by their
+path relative to the project root, so same-named PDFs in different folders don't clash.
+
+Usage (from the project root):
+  python -m server.build_index                                  # server/data/book.pdf
+  python -m server.build_index server/data/book.pdf other.pdf   # several sources, one corpus
+  python -m server.build_index --remove other.pdf               # drop a source (path or manifest key)
+  python -m server.build_index --rebuild                        # ignore the manifest
+  python -m server.build_index --workers 4 --batch-size 64      # tune the pipeline
+  python -m server.build_index --index-type hnsw                # flat | ivf | hnsw | pq | sq8
+
+Pipeline: pages are extracted across a process pool and streamed in order (at most
+2 pages per worker in flight, so extracted text never piles up ahead of the model),
+chunked by a generator, and embedded in fixed-size batches that are written to the
+vector store as they are produced, so at most one batch of texts waits on the model. The
+final assembly is not streamed: the passage records of the whole corpus and a copy
+of every vector (n x 384 float32, ~1.5 MB per 1,000 passages) are held in memory
+while the output files and the serving index are written.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
 import faiss
+import numpy as np
 from PyPDF2 import PdfReader
+from sentence_transformers import SentenceTransformer
+
+try:
+    from . import diversity, index_types  # python -m server.build_index
+    from .chunker import MAX_TOKENS, OVERLAP_TOKENS, Chunker
+    from .lexical_index import LexicalIndex
+    from .passage_store import write_store
+except ImportError:
+    import diversity, index_types  # python server/build_index.py
+    from chunker import MAX_TOKENS, OVERLAP_TOKENS, Chunker
+    from lexical_index import LexicalIndex
+    from passage_store import write_store
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
+PROJECT_ROOT = DATA_DIR.parent.parent
 PDF_PATH = DATA_DIR / "book.pdf"
 PASSAGES_PATH = DATA_DIR / "passages.jsonl"
 INDEX_PATH = DATA_DIR / "index.faiss"
+STORE_PATH = DATA_DIR / "passages.store"
+VECTORS_PATH = DATA_DIR / "vectors.faiss"
+MANIFEST_PATH = DATA_DIR / "manifest.json"
+LEXICAL_PATH = DATA_DIR / "lexical.npz"
+DUPES_PATH = DATA_DIR / "dupes.npy"
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+MANIFEST_VERSION = 2
+BATCH_SIZE = 64
+
+_model: Optional[SentenceTransformer] = None
+_reader: Optional[PdfReader] = None  # per extraction worker process
+
+
+def _get_model() -> SentenceTransformer:
+    """Only load SBERT if something actually needs embedding."""
+    global _model
+    if _model is None:
+        _model = SentenceTransformer(EMBED_MODEL)
+    return _model
+
+
+def _sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_key(pdf_path: Path) -> str:
+    """Manifest key and passage id prefix of a PDF: its path relative to the project root (absolute outside it)."""
+    path = pdf_path.resolve()
+    try:
+        return path.relative_to(PROJECT_ROOT).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def new_manifest() -> Dict[str, Any]:
+    return {"version": MANIFEST_VERSION, "model": EMBED_MODEL, "next_id": 0, "sources": {}}
+
+
+def load_manifest() -> Dict[str, Any]:
+    if not MANIFEST_PATH.exists():
+        return new_manifest()
+    manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("model") != EMBED_MODEL:
+        print("Manifest is from another version/model; rebuilding from scratch")
+        return new_manifest()
+    return manifest
+
+
+def save_manifest(manifest: Dict[str, Any]) -> None:
+    tmp = MANIFEST_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+    tmp.replace(MANIFEST_PATH)
+
+
+def _init_reader(pdf_path: str) -> None:
+    global _reader
+    _reader = PdfReader(pdf_path)
+
+
+def _extract_page(i: int) -> str:
+    assert _reader is not None
+    return _reader.pages[i].extract_text() or ""
+
+
+def extract_pages(pdf_path: Path, workers: int) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page index, text) in page order; empty string for pages without text.
+    Pages are extracted in `workers` processes, each holding its own PdfReader.
+    At most 2 * workers pages are submitted ahead of the consumer, so a slow
+    embedder bounds how much extracted text is buffered.
+    """
+    num_pages = len(PdfReader(str(pdf_path)).pages)
+    if workers <= 1:
+        _init_reader(str(pdf_path))
+        yield from ((i, _extract_page(i)) for i in range(num_pages))
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_reader, initargs=(str(pdf_path),)) as pool:
+        window = 2 * workers
+        pending: deque = deque()
+        for i in range(num_pages):
+            pending.append((i, pool.submit(_extract_page, i)))
+            if len(pending) >= window:
+                page, fut = pending.popleft()
+                yield page, fut.result()
+        while pending:
+            page, fut = pending.popleft()
+            yield page, fut.result()
+
+
+def load_passages() -> Dict[str, Dict[str, Any]]:
+    """Existing passages by id, so unchanged pages can be carried over."""
+    if not PASSAGES_PATH.exists():
+        return {}
+    with PASSAGES_PATH.open("r", encoding="utf-8") as f:
+        return {rec["id"]: rec for rec in map(json.loads, f)}
+
+
+class EmbedSink:
+    """
+    Embeds passages in fixed-size batches and adds each batch to the ID-mapped
+    vector store as soon as it is full, so at most one batch is held in memory.
+    """
+
+    def __init__(self, vectors: Optional[faiss.Index], batch_size: int):
+        self.vectors = vectors
+        self.batch_size = batch_size
+        self.embedded = 0
+        self._texts: List[str] = []
+        self._vids: List[int] = []
+
+    def add(self, text: str, vid: int) -> None:
+        self._texts.append(text)
+        self._vids.append(vid)
+        if len(self._texts) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._texts:
+            return
+        vecs = _get_model().encode(self._texts, convert_to_numpy=True, show_progress_bar=False)
+        vecs = np.ascontiguousarray(vecs, dtype="float32")
+        faiss.normalize_L2(vecs)
+        if self.vectors is None:
+            self.vectors = faiss.IndexIDMap2(faiss.IndexFlatIP(vecs.shape[1]))
+        self.vectors.add_with_ids(vecs, np.asarray(self._vids, dtype="int64"))
+        self.embedded += len(self._texts)
+        self._texts, self._vids = [], []
+
+
+def update_source(
+    manifest: Dict[str, Any],
+    pdf_path: Path,
+    new_recs: Dict[str, Dict[str, Any]],
+    sink: EmbedSink,
+    stale_vids: List[int],
+    workers: int,
+    chunker: Chunker,
+) -> Optional[int]:
+    """
+    Diff one PDF against the manifest. Streams changed pages' passages into `sink` and
+    queues their old vectors for removal. Returns the number of pages read (None if unchanged).
+
+    Every page is re-chunked (cheap, and the chunker's unit/section state has to follow
+    the whole book), but a page is only re-embedded if its chunks changed.
+    """
+    source = source_key(pdf_path)
+    fhash = file_hash(pdf_path)
+    settings = [chunker.max_tokens, chunker.overlap_tokens]
+    entry = manifest["sources"].get(source)
+    legacy = manifest["sources"].get(pdf_path.name)
+    if entry is None and legacy is not None and Path(legacy.get("path", "")) == pdf_path:
+        # Keyed by bare file name before: take its pages over (their vectors go stale,
+        # since the source in every passage's id and meta changes)
+        entry = manifest["sources"].pop(pdf_path.name)
+        entry["file_hash"] = None
+    if entry and entry["file_hash"] == fhash and entry.get("chunker") == settings:
+        print(f"{source}: unchanged, skipping")
+        return None
+
+    old_pages: Dict[str, Any] = entry["pages"] if entry else {}
+    pages: Dict[str, Any] = {}
+    changed = 0
+    for i, content in extract_pages(pdf_path, workers):
+        key = str(i)
+        recs = list(chunker.chunk_page(source, i, content))
+        phash = _sha1(json.dumps([[r["text"], r["meta"]] for r in recs], sort_keys=True).encode("utf-8"))
+        old = old_pages.get(key)
+        if old and old["hash"] == phash:
+            pages[key] = old
+            continue
+        if old:
+            stale_vids.extend(old["vids"])
+        page = {"hash": phash, "ids": [], "vids": []}
+        for rec in recs:
+            vid = manifest["next_id"]
+            manifest["next_id"] += 1
+            page["ids"].append(rec["id"])
+            page["vids"].append(vid)
+            new_recs[rec["id"]] = rec
+            sink.add(rec["text"], vid)
+        pages[key] = page
+        changed += 1
+
+    for key, old in old_pages.items():
+        if key not in pages:
+            stale_vids.extend(old["vids"])
+
+    manifest["sources"][source] = {"path": str(pdf_path), "file_hash": fhash, "chunker": settings, "pages": pages}
+    print(f"{source}: {changed} new/changed of {len(pages)} pages")
+    return len(pages)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or update the retrieval index from PDFs.")
+    parser.add_argument("pdfs", nargs="*", type=Path, help=f"source PDFs (default: {PDF_PATH})")
+    parser.add_argument("--remove", nargs="*", default=[], metavar="SOURCE", help="sources to drop (PDF path or manifest key)")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the manifest and re-embed everything")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="page extraction processes")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="passages per embedding batch")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS, help="token budget per passage")
+    parser.add_argument("--overlap-tokens", type=int, default=OVERLAP_TOKENS, help="overlap between passages")
+    parser.add_argument("--index-type", choices=index_types.INDEX_TYPES, default="flat", help="serving index type")
+    parser.add_argument("--nlist", type=int, help="ivf: number of clusters")
+    parser.add_argument("--nprobe", type=int, help="ivf: clusters probed per query")
+    parser.add_argument("--hnsw-m", dest="m", type=int, help="hnsw: links per node")
+    parser.add_argument("--ef-search", type=int, help="hnsw: search beam width")
+    parser.add_argument("--pq-m", type=int, help="pq: sub-quantizers (bytes per vector)")
+    args = parser.parse_args()
+    pdfs: List[Path] = args.pdfs or ([] if args.remove else [PDF_PATH])
+    overrides = {
+        k: getattr(args, k)
+        for k in ("nlist", "nprobe", "m", "ef_search", "pq_m")
+        if getattr(args, k) is not None
+    }
+
+    manifest = new_manifest() if args.rebuild else load_manifest()
+    incremental = bool(manifest["sources"]) and VECTORS_PATH.exists()
+    if not incremental:
+        manifest = new_manifest()
+    vectors = faiss.read_index(str(VECTORS_PATH)) if incremental else None
+    old_recs = load_passages() if incremental else {}
+
+    new_recs: Dict[str, Dict[str, Any]] = {}
+    sink = EmbedSink(vectors, args.batch_size)
+    stale_vids: List[int] = []
+
+    changed = False
+    for name in args.remove:
+        key = name if name in manifest["sources"] else source_key(Path(name))
+        entry = manifest["sources"].pop(key, None)
+        if entry is None:
+            print(f"{name}: not in the manifest")
+            continue
+        for page in entry["pages"].values():
+            stale_vids.extend(page["vids"])
+        changed = True
+        print(f"{name}: removed")
+
+    # 1. Stream pages -> passages -> embedding batches into the ID-mapped vector store
+    t0 = time.perf_counter()
+    pages_read = 0
+    for pdf_path in pdfs:
+        chunker = Chunker(args.max_tokens, args.overlap_tokens)
+        n = update_source(manifest, pdf_path.resolve(), new_recs, sink, stale_vids, args.workers, chunker)
+        if n is not None:
+            pages_read += n
+            changed = True
+    sink.flush()
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+
+    old_index = manifest.get("index") or {}
+    same_index = (
+        old_index.get("requested_type", old_index.get("type")) == args.index_type
+        and old_index.get("requested") == overrides
+    )
+    if not changed and same_index and INDEX_PATH.exists():
+        print("Index is up to date")
+        return
+
+    # Drop vectors of changed/removed pages
+    vectors = sink.vectors
+    if vectors is None:
+        raise SystemExit("No passages extracted; nothing to index")
+    if stale_vids:
+        vectors.remove_ids(np.asarray(stale_vids, dtype="int64"))
+    print(
+        f"Embedded {sink.embedded} passages, removed {len(stale_vids)} stale vectors "
+        f"in {elapsed:.1f}s ({pages_read / elapsed:.1f} pages/s, {sink.embedded / elapsed:.1f} passages/s)"
+    )
+
+    # 2. Assemble the corpus in source/page order; faiss row id == passage row
+    texts: List[Dict[str, Any]] = []
+    row_vids: List[int] = []
+    for source, entry in manifest["sources"].items():
+        for key in sorted(entry["pages"], key=int):
+            page = entry["pages"][key]
+            for pid, vid in zip(page["ids"], page["vids"]):
+                rec = new_recs.get(pid) or old_recs.get(pid)
+                if rec is None:
+                    raise SystemExit(f"Passage {pid} missing from {PASSAGES_PATH.name}; run with --rebuild")
+                texts.append(rec)
+                row_vids.append(vid)
+
+    # 3. Save passages.jsonl and the mmap-able passage store the retriever prefers
+    with open(PASSAGES_PATH, "w", encoding="utf-8") as f:
+        for rec in texts:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    write_store(texts, STORE_PATH)
+    # BM25 postings in the same row order (cheap: no embedding)
+    lexical = LexicalIndex.build(rec["text"] for rec in texts)
+    lexical.save(LEXICAL_PATH)
+    # Near-duplicate clusters (repeated headers, answer blanks), row -> canonical row
+    canonical = diversity.near_duplicates(rec["text"] for rec in texts)
+    np.save(DUPES_PATH, canonical)
+
+    # 4. Serving index in row order, rebuilt from stored vectors (no re-embedding)
+    row_vecs = (
+        np.vstack([vectors.reconstruct(vid) for vid in row_vids])
+        if row_vids else np.zeros((0, vectors.d), dtype="float32")
+    )
+    kind = index_types.serving_kind(args.index_type, len(row_vids))
+    if kind != args.index_type:
+        print(f"{len(row_vids)} passages are too few to train a {args.index_type} index; serving flat")
+    params = index_types.resolve_params(kind, len(row_vids), vectors.d, overrides)
+    index = index_types.build(kind, row_vecs, params)
+    manifest["index"] = {"type": kind, "requested_type": args.index_type, "requested": overrides, "params": params}
+    faiss.write_index(index, str(INDEX_PATH))
+    faiss.write_index(vectors, str(VECTORS_PATH))
+    save_manifest(manifest)
+
+    print(f"Saved {len(texts)} passages → {PASSAGES_PATH}")
+    print(f"Passage store saved → {STORE_PATH}")
+    print(f"Lexical index ({len(lexical.vocab)} terms) saved → {LEXICAL_PATH}")
+    print(f"Near-duplicates ({int((canonical != np.arange(len(canonical))).sum())} rows) saved → {DUPES_PATH}")
+    print(f"FAISS index ({kind} {params}) saved → {INDEX_PATH}")
+    print(f"Manifest saved → {MANIFEST_PATH}")
+
 
-# 1. Read PDF
-reader = PdfReader(str(PDF_PATH))
-texts = []
-for i, page in enumerate(reader.pages):
-    content = page.extract_text()
-    if not content:
-        continue
-    for chunk in content.split("\n"):
-        chunk = chunk.strip()
-        if chunk:
-            texts.append({"id": f"p{i}_{len(texts)}", "text": chunk, "meta": {"page": i+1}})
-
-print(f"Extracted {len(texts)} passages from {PDF_PATH.name}")
-
-# 2. Save passages.jsonl
-with open(PASSAGES_PATH, "w", encoding="utf-8") as f:
-    for rec in texts:
-        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-
-# 3. Build FAISS index
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-vecs = model.encode([t["text"] for t in texts], convert_to_numpy=True, show_progress_bar=True)
-faiss.normalize_L2(vecs)
-index = faiss.IndexFlatIP(vecs.shape[1])
-index.add(vecs)
-faiss.write_index(index, str(INDEX_PATH))
-
-print(f"Saved {len(texts)} passages → {PASSAGES_PATH}")
-print(f"FAISS index saved → {INDEX_PATH}")
+if __name__ == "__main__":
+    main()
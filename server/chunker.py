@@ -0,0 +1,173 @@
+# server/chunker.py
+"""
+Semantic chunking for build_index.py.
+
+PDF text comes out one visual line at a time, so splitting on "\n" yields rows like
+"Name:", "ii" and "_______________". The Chunker instead:
+  - drops boilerplate (blank-only lines, form fields, running headers/footers),
+  - merges lines into sentences and packs sentences into passages under a token
+    budget, carrying a small overlap from one passage into the next,
+  - tags passages with the `unit` and `section` (skill) the retriever filters on,
+    tracking both across pages from "Unit N ― ..." and "Activity N: ..." headings.
+
+A Chunker is stateful (current unit/section, repeated-line counts): feed it the pages
+of one source in order.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAX_TOKENS = 128
+OVERLAP_TOKENS = 24
+MIN_TOKENS = 4
+# A short line seen on this many earlier pages is a running header/footer
+REPEAT_PAGES = 3
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_BLANK_RE = re.compile(r"_{3,}")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"“‘(•\dA-Z])")
+_UNIT_RE = re.compile(r"^Unit\s+(\d+)\s*(?:[―–—-]\s*(.*))?$")
+# Searched, not matched: PDF extraction often glues headings onto the running footer
+_ACTIVITY_RE = re.compile(r"(?:Activity\s+\d+\s*:|Ex\.\s*\d+\s)\s*(.*)$")
+# Running page footer of the PSAC textbooks, e.g. "English110 GRADE6" / "GRADE6 English 68"
+_FOOTER_RE = re.compile(r"^(?:English\s*\d+\s*GRADE\s*6?|GRADE\s*6?\s*English\s*\d+)\s*")
+_FORM_FIELD_RE = re.compile(r"^(?:name|class|date|school|grade)\s*:?\s*$", re.IGNORECASE)
+
+# First match wins; section values line up with the `skills` sent by the frontend.
+SECTION_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("communication", ("communication", "listening", "speaking")),
+    ("reading", ("reading", "comprehension", "read the text")),
+    ("writing", ("writing", "letter", "email", "poster", "essay")),
+    ("vocabulary", ("vocabulary", "synonym", "antonym", "spelling", "glossary")),
+    ("grammar", ("grammar", "tense", "verb", "noun", "pronoun", "adjective", "adverb",
+                 "preposition", "conjunction", "article", "clause", "punctuation",
+                 "choose the correct")),
+]
+
+
+def count_tokens(text: str) -> int:
+    """Cheap local token estimate: words and punctuation marks."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def classify_section(heading: str) -> Optional[str]:
+    h = heading.lower()
+    for section, keywords in SECTION_KEYWORDS:
+        if any(k in h for k in keywords):
+            return section
+    return None
+
+
+class Chunker:
+    def __init__(self, max_tokens: int = MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.unit: Optional[int] = None
+        self.section: Optional[str] = None
+        self._unit_header: Optional[str] = None
+        self._line_pages: Counter = Counter()
+
+    # --- line cleanup -----------------------------------------------------------
+    def _clean_lines(self, content: str) -> List[str]:
+        lines: List[str] = []
+        for raw in dict.fromkeys(l.strip() for l in content.split("\n")):  # dedupe within page
+            line = raw
+            if self._unit_header and line.startswith(self._unit_header):
+                line = line[len(self._unit_header):].strip()
+            line = _FOOTER_RE.sub("", line)
+            line = _BLANK_RE.sub("____", line)
+            if sum(c.isalpha() for c in line) < 3 or _FORM_FIELD_RE.match(line):
+                continue
+            lines.append(line)
+
+        kept = []
+        for line in lines:
+            short = count_tokens(line) <= 8
+            if short and self._line_pages[line] >= REPEAT_PAGES:
+                continue
+            if short:
+                self._line_pages[line] += 1
+            kept.append(line)
+        return kept
+
+    # --- heading tracking ---------------------------------------------------------
+    def _heading(self, line: str) -> bool:
+        """Update unit/section state from a heading line; True if it was one."""
+        m = _UNIT_RE.match(line)
+        if m:
+            unit = int(m.group(1))
+            if unit != self.unit:
+                self.unit, self.section = unit, None
+            if m.group(2):
+                self._unit_header = line  # repeated as the running header on later pages
+            return True
+        m = _ACTIVITY_RE.search(line)
+        if m:
+            self.section = classify_section(m.group(1))
+            return True
+        return False
+
+    # --- packing ------------------------------------------------------------------
+    def _split_long(self, sentence: str) -> List[str]:
+        words = sentence.split()
+        step = max(self.max_tokens // 2, 1)  # words are ~1-2 tokens each
+        return [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+
+    def _pack(self, sentences: List[str]) -> Iterator[str]:
+        chunk: List[str] = []
+        size = 0
+        for sent in sentences:
+            for piece in (self._split_long(sent) if count_tokens(sent) > self.max_tokens else [sent]):
+                n = count_tokens(piece)
+                if chunk and size + n > self.max_tokens:
+                    yield " ".join(chunk)
+                    # carry trailing sentences up to the overlap budget
+                    carry: List[str] = []
+                    carried = 0
+                    for prev in reversed(chunk):
+                        carried += count_tokens(prev)
+                        if carried > self.overlap_tokens:
+                            break
+                        carry.insert(0, prev)
+                    chunk, size = carry, sum(count_tokens(c) for c in carry)
+                chunk.append(piece)
+                size += n
+        if chunk:
+            yield " ".join(chunk)
+
+    def _meta(self, source: str, page_idx: int) -> Dict[str, Any]:
+        meta: Dict[str, Any] = {"source": source, "page": page_idx + 1}
+        if self.unit is not None:
+            meta["unit"] = self.unit
+        if self.section is not None:
+            meta["section"] = self.section
+        return meta
+
+    def chunk_page(self, source: str, page_idx: int, content: str) -> Iterator[Dict[str, Any]]:
+        """Passage dicts ({id, text, meta}) for one page."""
+        n = 0
+        block: List[str] = []
+        body = False  # block has more than a bare heading
+        meta = self._meta(source, page_idx)
+
+        def flush() -> Iterator[Dict[str, Any]]:
+            nonlocal n, body
+            text = " ".join(block) if body else ""
+            for chunk in self._pack(_SENTENCE_RE.split(text) if text else []):
+                if count_tokens(chunk) >= MIN_TOKENS:
+                    yield {"id": f"{source}:p{page_idx}_{n}", "text": chunk, "meta": dict(meta)}
+                    n += 1
+            block.clear()
+            body = False
+
+        for line in self._clean_lines(content):
+            if self._heading(line):
+                yield from flush()
+                meta = self._meta(source, page_idx)
+            else:
+                body = True
+            block.append(line)
+        yield from flush()
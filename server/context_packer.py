@@ -0,0 +1,109 @@
+# server/context_packer.py
+"""
+Token-budgeted context for quiz prompts.
+
+Retrieved passages are ranked by how many query terms they contain (retrieval order
+breaks ties), sentences already packed from an earlier passage are dropped (the
+chunker carries overlapping sentences from one passage into the next), and passages
+are added until CONTEXT_TOKEN_BUDGET is reached; the passage that crosses the budget
+is cut at a sentence boundary. Tokens are counted with the chunker's local estimate,
+so prompt size is known before the request goes out.
+
+Env:
+  CONTEXT_TOKEN_BUDGET  passage tokens per quiz prompt  (default: 600)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+
+from .chunker import count_tokens
+from .lexical_index import tokenize
+
+# Don't bother adding a trimmed passage with fewer tokens than this
+MIN_PIECE_TOKENS = 24
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass
+class PackedContext:
+    text: str = ""
+    ids: List[str] = field(default_factory=list)  # passages that went into `text`, in order
+    tokens: int = 0
+    dropped: int = 0  # passages left out as duplicates or over budget
+
+
+def budget() -> int:
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+
+
+def trim(text: str, max_tokens: int) -> str:
+    """Longest prefix of `text` within `max_tokens`, cut at a sentence boundary if possible."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    out: List[str] = []
+    used = 0
+    for sent in _SENTENCE_RE.split(text):
+        n = count_tokens(sent)
+        if used + n > max_tokens:
+            if not out:  # a single overlong sentence: cut by words
+                words: List[str] = []
+                for w in sent.split():
+                    used += count_tokens(w)
+                    if used > max_tokens:
+                        break
+                    words.append(w)
+                return " ".join(words)
+            break
+        out.append(sent)
+        used += n
+    return " ".join(out)
+
+
+def rank(passages: Sequence[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
+    """Passages by number of distinct query terms they contain (stable: retrieval order on ties)."""
+    terms = set(tokenize(query))
+    if not terms:
+        return list(passages)
+    return sorted(passages, key=lambda p: -len(terms.intersection(tokenize(p.get("text", "")))))
+
+
+def pack(passages: Sequence[Dict[str, Any]], query: str = "", max_tokens: int | None = None) -> PackedContext:
+    """`[id] text` lines for the prompt, within `max_tokens` (default: CONTEXT_TOKEN_BUDGET)."""
+    limit = budget() if max_tokens is None else max_tokens
+    packed = PackedContext()
+    lines: List[str] = []
+    seen: set = set()
+    for p in rank(passages, query):
+        fresh: Dict[str, str] = {}  # normalized sentence -> sentence
+        for sent in _SENTENCE_RE.split(p.get("text", "").strip()):
+            key = " ".join(sent.lower().split())
+            if key and key not in seen:
+                fresh.setdefault(key, sent)
+        if not fresh:
+            packed.dropped += 1
+            continue
+        prefix = f"[{p.get('id')}] "
+        line = prefix + " ".join(fresh.values())
+        n = count_tokens(line)
+        if packed.tokens + n > limit:
+            room = limit - packed.tokens
+            if room >= MIN_PIECE_TOKENS:
+                line = trim(line, room)
+                n = count_tokens(line)
+                # Sentences cut off by the trim may still come in with a later passage
+                kept = set(_SENTENCE_RE.split(line[len(prefix):]))
+                fresh = {key: sent for key, sent in fresh.items() if sent in kept}
+            else:
+                packed.dropped += 1
+                continue
+        seen.update(fresh)
+        lines.append(line)
+        packed.ids.append(str(p.get("id")))
+        packed.tokens += n
+    packed.text = "\n".join(lines)
+    return packed
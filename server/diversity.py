@@ -0,0 +1,109 @@
+# server/diversity.py
+"""
+Keeping near-identical passages out of the same prompt.
+
+The textbook corpus repeats itself: answer blanks ("_____"), page headers,
+instructions printed on every activity. Two mechanisms:
+
+  near_duplicates  build time: MinHash over character shingles + LSH banding groups
+                   passages whose estimated Jaccard similarity is >= threshold, and
+                   maps every row to its cluster's first row. The retriever keeps one
+                   row per cluster in its ranked pool.
+  mmr              query time: maximal marginal relevance over the pool's stored
+                   embeddings (read back from the FAISS index, no encoding), so the k
+                   passages sent to the LLM cover different content.
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+SHINGLE = 5  # characters
+NUM_PERM = 64
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows each
+THRESHOLD = 0.8
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)  # fixed: signatures must be stable across builds
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+def _shingles(text: str) -> np.ndarray:
+    """crc32 of each character 5-gram of the normalized text (lowercase words only)."""
+    norm = _NON_WORD_RE.sub(" ", text.lower()).strip()
+    grams = {norm[i:i + SHINGLE] for i in range(max(len(norm) - SHINGLE + 1, 1))}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def signatures(texts: Iterable[str]) -> np.ndarray:
+    """(n, NUM_PERM) MinHash signatures."""
+    rows = [((_A[:, None] * (h[None, :] % _PRIME) + _B[:, None]) % _PRIME).min(axis=1) for h in map(_shingles, texts)]
+    return np.vstack(rows) if rows else np.zeros((0, NUM_PERM), dtype=np.uint64)
+
+
+def near_duplicates(texts: Iterable[str], threshold: float = THRESHOLD) -> np.ndarray:
+    """
+    Row -> canonical row (the first row of its near-duplicate cluster; itself if unique).
+    Candidates come from LSH buckets; within a bucket each row is compared to the
+    bucket's cluster representatives only, so repeated boilerplate stays linear.
+    """
+    sigs = signatures(texts)
+    n = len(sigs)
+    parent = np.arange(n)
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    width = NUM_PERM // BANDS
+    for band in range(BANDS):
+        buckets: Dict[bytes, List[int]] = {}
+        for i, key in enumerate(sigs[:, band * width:(band + 1) * width]):
+            reps = buckets.setdefault(key.tobytes(), [])
+            for r in reps:
+                if (sigs[i] == sigs[r]).mean() >= threshold:
+                    a, b = find(i), find(r)
+                    parent[max(a, b)] = min(a, b)
+                    break
+            else:
+                reps.append(i)
+    return np.fromiter((find(i) for i in range(n)), dtype=np.int32, count=n)
+
+
+def rank_relevance(m: int) -> np.ndarray:
+    """Relevance of `m` ranked rows: falls linearly with position, 1 for the first row."""
+    return 1.0 - np.arange(m, dtype="float32") / max(m, 1)
+
+
+def mmr(vecs: np.ndarray, k: int, lam: float = 0.7, relevance: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Positions of `k` rows of `vecs` (L2-normalized) picked by maximal marginal relevance:
+    lam * relevance - (1 - lam) * max cosine to the rows already picked.
+    `relevance` defaults to rank_relevance, i.e. rows are given most relevant first.
+    """
+    m = len(vecs)
+    if m == 0 or k <= 0:
+        return []
+    if relevance is None:
+        relevance = rank_relevance(m)
+    sims = vecs @ vecs.T
+    closest = np.zeros(m, dtype="float32")
+    picked = np.zeros(m, dtype=bool)
+    out: List[int] = []
+    for _ in range(min(k, m)):
+        score = lam * relevance - (1 - lam) * closest
+        score[picked] = -np.inf
+        j = int(np.argmax(score))
+        out.append(j)
+        picked[j] = True
+        closest = np.maximum(closest, sims[j])
+    return out
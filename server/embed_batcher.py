@@ -0,0 +1,105 @@
+# server/embed_batcher.py
+"""
+Micro-batching front for the SBERT model.
+
+Query encodes used to run inline on whichever request thread needed them: under load
+several threads ran `model.encode([one_query])` at once, each a full forward pass with
+its own torch thread pool, all fighting over the same cores.
+
+`EmbedBatcher` gives the model a single dedicated worker thread. Callers submit a text
+and block on a future; the worker takes the first waiting text, keeps collecting for
+up to EMBED_BATCH_WINDOW_MS (or until EMBED_BATCH_MAX texts), runs one `encode` for the
+whole batch and hands each caller its row. Identical texts in a batch are encoded once.
+Throughput under concurrency then grows with the batch size instead of degrading, at
+the cost of at most one window of added latency for a lone query.
+
+Env:
+  EMBED_BATCH_WINDOW_MS  collection window after the first text  (default: 5, 0 = encode inline)
+  EMBED_BATCH_MAX        max texts per encode                    (default: 32)
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class EmbedBatcher:
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], window_ms: float = 5.0, max_batch: int = 32):
+        self._encode = encode
+        self.window_s = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+        self.largest = 0
+
+    def encode(self, text: str) -> np.ndarray:
+        """Embedding of one text (1-D), encoded together with whatever else is waiting."""
+        self._ensure_started()
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut.result()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                    self._thread.start()
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            rows: Dict[str, int] = {}
+            for text, _ in batch:
+                rows.setdefault(text, len(rows))
+            try:
+                vecs = self._encode(list(rows))
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for text, fut in batch:
+                fut.set_result(vecs[rows[text]])
+            self.batches += 1
+            self.texts += len(batch)
+            self.largest = max(self.largest, len(batch))
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "window_ms": self.window_s * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest,
+            "queued": self._queue.qsize(),
+        }
+
+
+def from_env(encode: Callable[[List[str]], np.ndarray]) -> Optional[EmbedBatcher]:
+    """Batcher configured from env, or None when batching is off (window 0)."""
+    window_ms = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+    if window_ms <= 0:
+        return None
+    return EmbedBatcher(encode, window_ms=window_ms, max_batch=int(os.getenv("EMBED_BATCH_MAX", "32")))
@@ -0,0 +1,203 @@
+# server/embed_cache.py
+"""
+Bounded LRU + TTL cache for query embeddings.
+
+The same handful of query strings ("PSAC Grade 6 English", unit topics) come in
+over and over; caching their vectors skips a SentenceTransformer forward pass.
+
+Env:
+  EMBED_CACHE_BACKEND  memory | file   (default: memory)
+  EMBED_CACHE_SIZE     max entries     (default: 1024)
+  EMBED_CACHE_TTL_S    entry lifetime  (default: 86400, 0 = never expire)
+  EMBED_CACHE_PATH     SQLite file for the `file` backend, shared by all workers
+                       (default: server/data/embed_cache.sqlite)
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Protocol, Tuple
+
+import numpy as np
+
+DEFAULT_PATH = Path(__file__).parent / "data" / "embed_cache.sqlite"
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: lowercased, whitespace-collapsed (MiniLM is uncased)."""
+    return " ".join(query.lower().split())
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Optional[np.ndarray]: ...
+
+    def put(self, key: str, vec: np.ndarray) -> int:
+        """Store `vec`; returns the number of entries evicted to make room."""
+        ...
+
+    def __len__(self) -> int: ...
+
+
+class MemoryBackend:
+    """Per-process LRU over an OrderedDict."""
+
+    def __init__(self, max_size: int, ttl_s: float):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            stored_at, vec = hit
+            if self.ttl_s and time.time() - stored_at > self.ttl_s:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return vec
+
+    def put(self, key: str, vec: np.ndarray) -> int:
+        with self._lock:
+            self._data[key] = (time.time(), vec)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class FileBackend:
+    """
+    SQLite-file LRU shared by every uvicorn worker on the host.
+    Recency is tracked in a `used_at` column; WAL mode keeps readers non-blocking.
+    """
+
+    def __init__(self, path: Path, max_size: int, ttl_s: float):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, vec BLOB NOT NULL, dtype TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used_at ON embeddings(used_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT vec, dtype, stored_at FROM embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        blob, dtype, stored_at = row
+        now = time.time()
+        with conn:
+            if self.ttl_s and now - stored_at > self.ttl_s:
+                conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE embeddings SET used_at = ? WHERE key = ?", (now, key))
+        return np.frombuffer(blob, dtype=dtype)
+
+    def put(self, key: str, vec: np.ndarray) -> int:
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vec, dtype, stored_at, used_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, np.ascontiguousarray(vec).tobytes(), vec.dtype.str, now, now),
+            )
+            overflow = len(self) - self.max_size
+            if overflow <= 0:
+                return 0
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN"
+                " (SELECT key FROM embeddings ORDER BY used_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            return overflow
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class EmbeddingCache:
+    """
+    Query-string -> vector cache with hit/miss/eviction counters.
+    `namespace` (the embedding model name) keeps vectors from different models apart
+    in a shared file backend.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str = ""):
+        self.backend = backend
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _key(self, query: str) -> str:
+        return f"{self.namespace}|{normalize_query(query)}"
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        vec = self.backend.get(self._key(query))
+        with self._lock:
+            if vec is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return vec
+
+    def put(self, query: str, vec: np.ndarray) -> None:
+        evicted = self.backend.put(self._key(query), vec)
+        with self._lock:
+            self.evictions += evicted
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+def from_env(namespace: str = "") -> EmbeddingCache:
+    """Build the cache configured by EMBED_CACHE_* env vars."""
+    size = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+    ttl_s = float(os.getenv("EMBED_CACHE_TTL_S", "86400"))
+    backend = os.getenv("EMBED_CACHE_BACKEND", "memory").lower()
+    if backend == "file":
+        path = Path(os.getenv("EMBED_CACHE_PATH", str(DEFAULT_PATH)))
+        return EmbeddingCache(FileBackend(path, size, ttl_s), namespace)
+    if backend != "memory":
+        raise ValueError(f"Unknown EMBED_CACHE_BACKEND: {backend!r} (expected 'memory' or 'file')")
+    return EmbeddingCache(MemoryBackend(size, ttl_s), namespace)
@@ -0,0 +1,30 @@
+# server/gunicorn_conf.py
+"""
+Multi-worker production config with a pre-fork master:
+
+  PRELOAD_IN_MASTER=1 gunicorn -c server/gunicorn_conf.py server.app:app
+
+`preload_app` imports the app once in the master; with PRELOAD_IN_MASTER=1 the master
+also loads the retriever (see warmup.py) before forking, so every worker starts warm
+and shares the model/index memory copy-on-write.
+
+Env:
+  WEB_CONCURRENCY    worker processes  (default: 2)
+  BIND               listen address    (default: 0.0.0.0:8000)
+  PRELOAD_IN_MASTER  1 = load the retriever before forking (default: 0)
+"""
+
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120  # a worker without PRELOAD_IN_MASTER loads the embedding model after boot
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before workers are forked
+    if os.getenv("PRELOAD_IN_MASTER", "0") == "1":
+        from server import warmup
+        warmup.preload_in_master()
@@ -0,0 +1,86 @@
+# server/http_pool.py
+"""
+Process-wide pooled HTTP client for LLM calls.
+
+One keep-alive `httpx.AsyncClient` is shared by the quiz routes (through the
+`AsyncOpenAI` SDK client built on top of it) and `llm.LLMClient`, so requests reuse
+TLS connections instead of paying a handshake per call.
+
+Env:
+  LLM_MAX_CONNECTIONS     pool size                        (default: 20)
+  LLM_MAX_KEEPALIVE       idle connections kept open       (default: 10)
+  LLM_KEEPALIVE_EXPIRY_S  idle connection lifetime         (default: 30)
+  LLM_TIMEOUT_S           read/write timeout per request   (default: 60)
+  LLM_CONNECT_TIMEOUT_S   connect timeout                  (default: 5)
+  OPENAI_BASE_URL         OpenAI-compatible endpoint       (default: https://api.openai.com/v1)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import httpx
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+_http: Optional[httpx.AsyncClient] = None
+_http_loop: Optional[asyncio.AbstractEventLoop] = None
+_openai: Dict[Tuple[str, str], "AsyncOpenAI"] = {}
+
+
+def base_url() -> str:
+    return os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY_S", "30")),
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        float(os.getenv("LLM_TIMEOUT_S", "60")),
+        connect=float(os.getenv("LLM_CONNECT_TIMEOUT_S", "5")),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    The shared AsyncClient. Must be called from inside the event loop; a new pool is
+    made if the loop changed (pooled connections can't be shared across loops).
+    """
+    global _http, _http_loop
+    loop = asyncio.get_running_loop()
+    if _http is None or _http.is_closed or _http_loop is not loop:
+        _http = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+        _http_loop = loop
+        _openai.clear()
+    return _http
+
+
+def get_openai_client(api_key: str) -> AsyncOpenAI:
+    """AsyncOpenAI SDK client on top of the shared pool (one per api key/base url)."""
+    http = get_http_client()
+    key = (api_key, base_url())
+    client = _openai.get(key)
+    if client is None:
+        # Imported on first use: the SDK's type modules take ~0.5s to import
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(api_key=api_key, base_url=key[1], http_client=http, max_retries=2)
+        _openai[key] = client
+    return client
+
+
+async def aclose() -> None:
+    """Close pooled connections (app shutdown)."""
+    global _http, _http_loop
+    if _http is not None and not _http.is_closed:
+        await _http.aclose()
+    _http, _http_loop = None, None
+    _openai.clear()
@@ -0,0 +1,121 @@
+# server/index_types.py
+"""
+Serving-index types for the passage vectors (inner product on L2-normalized vectors).
+
+  flat  exact IndexFlatIP: best recall, linear scan, 4 bytes/dim
+  ivf   IndexIVFFlat: probes `nprobe` of `nlist` clusters, same memory as flat
+  hnsw  IndexHNSWFlat: graph search, fastest queries, extra memory for links
+  pq    IndexPQ: product-quantized codes, `pq_m` bytes/vector (smallest)
+  sq8   IndexScalarQuantizer 8-bit: 1 byte/dim, near-flat recall
+
+build_index.py records the chosen type and its params in manifest.json under
+"index"; the retriever reads them back to set search-time knobs (nprobe/efSearch).
+A corpus too small to train the chosen type is served flat (see serving_kind).
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq", "sq8")
+
+DEFAULT_PARAMS: Dict[str, Dict[str, int]] = {
+    "flat": {},
+    "ivf": {"nlist": 0, "nprobe": 8},  # nlist 0 = ~4*sqrt(n)
+    "hnsw": {"m": 32, "ef_construction": 80, "ef_search": 64},
+    "pq": {"pq_m": 48, "nbits": 8},
+    "sq8": {},
+}
+
+# faiss clustering wants ~39 training points per centroid
+_MIN_POINTS_PER_CENTROID = 39
+
+
+def serving_kind(kind: str, n: int) -> str:
+    """`kind`, or flat when `n` vectors can't train it (pq needs 2 to learn even 1-bit codes)."""
+    if kind == "pq" and n < 2:
+        return "flat"
+    return kind
+
+
+def resolve_params(kind: str, n: int, d: int, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """Defaults + overrides, clamped so training works on a corpus of `n` vectors of dim `d`."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {kind!r}; expected one of {INDEX_TYPES}")
+    params = dict(DEFAULT_PARAMS[kind])
+    params.update({k: v for k, v in (overrides or {}).items() if k in params and v is not None})
+
+    if kind == "ivf":
+        nlist = params["nlist"] or int(4 * math.sqrt(max(n, 1)))
+        params["nlist"] = max(1, min(nlist, n // _MIN_POINTS_PER_CENTROID or 1))
+        params["nprobe"] = max(1, min(params["nprobe"], params["nlist"]))
+    elif kind == "pq":
+        m = params["pq_m"]
+        while d % m:
+            m -= 1
+        params["pq_m"] = m
+        # 2**nbits centroids per sub-quantizer: keep ~39 points each, but never more
+        # centroids than points (tiny corpora; below 2 points see serving_kind)
+        fit = int(math.log2(max(n // _MIN_POINTS_PER_CENTROID, 1)))
+        floor = min(4, int(math.log2(max(n, 1))))
+        ceiling = int(math.log2(max(n, 2)))  # 2**nbits <= n
+        params["nbits"] = max(1, min(params["nbits"], max(fit, floor), ceiling))
+    return params
+
+
+def build(kind: str, vecs: np.ndarray, params: Dict[str, int]) -> faiss.Index:
+    """Train (if needed) and fill an index of `kind` with `vecs` (row i gets id i)."""
+    d = vecs.shape[1]
+    ip = faiss.METRIC_INNER_PRODUCT
+    if kind == "flat":
+        index = faiss.IndexFlatIP(d)
+    elif kind == "ivf":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(d), d, params["nlist"], ip)
+        index.nprobe = params["nprobe"]
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, params["m"], ip)
+        index.hnsw.efConstruction = params["ef_construction"]
+        index.hnsw.efSearch = params["ef_search"]
+    elif kind == "pq":
+        index = faiss.IndexPQ(d, params["pq_m"], params["nbits"], ip)
+    elif kind == "sq8":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, ip)
+    else:
+        raise ValueError(f"Unknown index type {kind!r}; expected one of {INDEX_TYPES}")
+
+    if not index.is_trained and len(vecs):
+        index.train(vecs)
+    if len(vecs):
+        index.add(vecs)
+    return index
+
+
+def supports_selector(kind: str) -> bool:
+    """IndexPQ rejects SearchParameters; filtered search there over-fetches and post-filters."""
+    return kind != "pq"
+
+
+def search_parameters(
+    kind: str,
+    params: Dict[str, int],
+    sel: Optional[faiss.IDSelector] = None,
+    exhaustive_n: Optional[int] = None,
+) -> Optional[faiss.SearchParameters]:
+    """
+    Per-call search parameters carrying the filter selector and the type's search knob.
+    `exhaustive_n` (the index size) widens ivf/hnsw to visit everything, for selective
+    filters whose few allowed rows the normal probe budget can miss.
+    """
+    if kind == "ivf":
+        nprobe = params.get("nlist", 1) if exhaustive_n else params.get("nprobe", 8)
+        return faiss.SearchParametersIVF(sel=sel, nprobe=nprobe)
+    if kind == "hnsw":
+        ef = params.get("ef_search", 64)
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=max(ef, exhaustive_n or 0))
+    if sel is None or not supports_selector(kind):
+        return None
+    return faiss.SearchParameters(sel=sel)
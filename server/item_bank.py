@@ -0,0 +1,326 @@
+# server/item_bank.py
+"""
+Pre-generated quiz item bank, so adaptive practice can serve the next question in
+milliseconds instead of waiting seconds on the LLM.
+
+Items are banked per (unit, skill, difficulty) bucket in a SQLite file shared by all
+workers. A background worker (started from the app lifespan) fills buckets in bulk off
+the request path, reusing the RAG + LLM code in routes/quizzes.py; `pop` hands out
+validated items and queues a refill when a bucket falls below the low-water mark.
+
+Every bucket costs LLM calls to fill, so buckets are limited to known skills (the
+chunker's sections, plus any in ITEM_BANK_WARM) and units (1..ITEM_BANK_MAX_UNIT, plus
+any in ITEM_BANK_WARM), and the refill queue and number of distinct buckets are capped.
+
+Env:
+  ITEM_BANK_PATH         SQLite file                          (default: server/data/item_bank.sqlite)
+  ITEM_BANK_TARGET       items a refill tops a bucket up to   (default: 30)
+  ITEM_BANK_LOW_WATER    refill once a bucket drops below     (default: 10)
+  ITEM_BANK_BATCH        items requested per LLM call         (default: 10)
+  ITEM_BANK_WARM         buckets to fill at startup, as comma-separated
+                         "skill:difficulty" or "unit:skill:difficulty" (default: none)
+  ITEM_BANK_MAX_UNIT     highest textbook unit number         (default: 12)
+  ITEM_BANK_MAX_BUCKETS  distinct buckets the bank will fill  (default: 200)
+  ITEM_BANK_MAX_QUEUED   refills waiting for the worker       (default: 50)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .chunker import SECTION_KEYWORDS
+from .quiz_schema import GenerateQuizPayload, QuizItem
+
+DEFAULT_PATH = Path(__file__).parent / "data" / "item_bank.sqlite"
+
+# (unit, skill, difficulty); unit "" = any unit
+Bucket = Tuple[str, str, int]
+
+# Give up on a bucket after this many refill batches that bank nothing new
+MAX_EMPTY_BATCHES = 3
+
+
+def bucket(unit: Optional[str], skill: str, difficulty: int) -> Bucket:
+    return (str(unit) if unit is not None else "", skill.lower(), int(difficulty))
+
+
+def check_bucket(b: Bucket, warm: List[Bucket], max_unit: int) -> Optional[str]:
+    """Why `b` can't be banked (unknown skill or unit), or None if it can."""
+    unit, skill, _ = b
+    skills = {section for section, _ in SECTION_KEYWORDS} | {w[1] for w in warm}
+    if skill not in skills:
+        return f"Unknown skill {skill!r}; expected one of {', '.join(sorted(skills))}"
+    units = {w[0] for w in warm if w[0]}
+    if unit and unit not in units and not (unit.isdigit() and 1 <= int(unit) <= max_unit):
+        return f"Unknown unit {unit!r}; expected 1-{max_unit}"
+    return None
+
+
+def validate_item(item: QuizItem) -> bool:
+    """Only bank items a student can actually answer."""
+    if not (item.question or "").strip():
+        return False
+    if item.type == "mcq":
+        options = item.options or []
+        if len(options) < 2 or len(set(options)) != len(options):
+            return False
+        if isinstance(item.answer, int):
+            return 0 <= item.answer < len(options)
+        return item.answer in options
+    if isinstance(item.answer, list):
+        return bool(item.answer)
+    return bool(str(item.answer).strip())
+
+
+def parse_warm_buckets(spec: str) -> List[Bucket]:
+    buckets = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        fields = part.split(":")
+        if len(fields) == 2:
+            buckets.append(bucket(None, fields[0], int(fields[1])))
+        elif len(fields) == 3:
+            buckets.append(bucket(fields[0] or None, fields[1], int(fields[2])))
+        else:
+            raise ValueError(f"Bad ITEM_BANK_WARM entry {part!r}; expected skill:difficulty or unit:skill:difficulty")
+    return buckets
+
+
+class ItemBank:
+    def __init__(
+        self,
+        path: Path,
+        target: int,
+        low_water: int,
+        batch: int,
+        max_buckets: int = 200,
+        max_queued: int = 50,
+    ):
+        self.path = Path(path)
+        self.target = target
+        self.low_water = min(low_water, target)
+        self.batch = batch
+        self.max_buckets = max_buckets
+        self.max_queued = max_queued
+        self.served = self.short = self.generated = self.rejected = self.refused = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: set = set()
+        self._worker: Optional[asyncio.Task] = None
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " unit TEXT NOT NULL, skill TEXT NOT NULL, difficulty INTEGER NOT NULL,"
+                " question TEXT NOT NULL, item TEXT NOT NULL, created_at REAL NOT NULL,"
+                " UNIQUE (unit, skill, difficulty, question))"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- storage ------------------------------------------------------------------
+    def count(self, b: Bucket) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM items WHERE unit = ? AND skill = ? AND difficulty = ?", b
+        ).fetchone()[0]
+
+    def take(self, b: Bucket, n: int) -> Tuple[List[QuizItem], int]:
+        """Remove and return up to `n` items (oldest first) and how many are left."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")  # other workers pop from the same file
+        try:
+            rows = conn.execute(
+                "SELECT id, item FROM items WHERE unit = ? AND skill = ? AND difficulty = ?"
+                " ORDER BY id LIMIT ?", (*b, n),
+            ).fetchall()
+            conn.executemany("DELETE FROM items WHERE id = ?", [(r[0],) for r in rows])
+            left = conn.execute(
+                "SELECT COUNT(*) FROM items WHERE unit = ? AND skill = ? AND difficulty = ?", b
+            ).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [QuizItem(**json.loads(r[1])) for r in rows], left
+
+    def add(self, b: Bucket, items: List[QuizItem]) -> int:
+        """Bank validated items; returns how many were new (duplicates are ignored)."""
+        conn = self._conn()
+        now = time.time()
+        before = conn.total_changes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for item in items:
+                item = item.model_copy(update={"id": f"bank_{uuid.uuid4().hex[:12]}"})
+                conn.execute(
+                    "INSERT OR IGNORE INTO items (unit, skill, difficulty, question, item, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (*b, item.question.strip(), item.model_dump_json(), now),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.total_changes - before
+
+    def buckets(self) -> int:
+        """Distinct buckets holding items."""
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM (SELECT DISTINCT unit, skill, difficulty FROM items)"
+        ).fetchone()[0]
+
+    def levels(self) -> List[dict]:
+        rows = self._conn().execute(
+            "SELECT unit, skill, difficulty, COUNT(*) FROM items GROUP BY unit, skill, difficulty"
+        ).fetchall()
+        return [{"unit": u or None, "skill": s, "difficulty": d, "items": n} for u, s, d, n in rows]
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.path),
+            "target": self.target,
+            "low_water": self.low_water,
+            "served": self.served,
+            "short": self.short,
+            "generated": self.generated,
+            "rejected": self.rejected,
+            "refused": self.refused,
+            "refills_queued": sorted(self._queued),
+            "buckets": self.levels(),
+        }
+
+    # --- serving ------------------------------------------------------------------
+    async def pop(self, b: Bucket, n: int) -> List[QuizItem]:
+        """Up to `n` banked items; queues a refill when the bucket runs low."""
+        items, left = await run_in_threadpool(self.take, b, n)
+        self.served += len(items)
+        if len(items) < n:
+            self.short += 1
+        if left < self.low_water:
+            self.request_refill(b)
+        return items
+
+    # --- background refill --------------------------------------------------------
+    def request_refill(self, b: Bucket) -> None:
+        if self._queue is None or b in self._queued:
+            return
+        try:
+            self._queue.put_nowait(b)
+        except asyncio.QueueFull:
+            self.refused += 1
+            print(f"[BANK] Refill queue full ({self.max_queued}); not queueing {b}")
+            return
+        self._queued.add(b)
+
+    async def _generate(self, b: Bucket, n: int) -> List[QuizItem]:
+        # Imported here: the routes module imports this one
+        from .routes import quizzes
+
+        unit, skill, difficulty = b
+        payload = GenerateQuizPayload(count=n, skills=[skill], unit=unit or None, difficulty=difficulty)
+        count, skills, query_text, unit_ = quizzes.normalize_payload(payload)
+        client, model = await quizzes.setup_client()
+        # Unseeded retrieval: each batch samples different passages for variety
+        passages = await run_in_threadpool(quizzes.retrieve_passages, query_text, unit_, skills, None)
+        quiz = await quizzes.generate_items(client, model, payload, passages)
+        if quiz.source != "llm":
+            raise RuntimeError(quiz.source)
+        return quiz.items or []
+
+    async def refill(self, b: Bucket) -> int:
+        """Top `b` up to the target in LLM batches; returns items added."""
+        if await run_in_threadpool(self.count, b) == 0 and await run_in_threadpool(self.buckets) >= self.max_buckets:
+            self.refused += 1
+            print(f"[BANK] Not filling {b}: already {self.max_buckets} buckets")
+            return 0
+        added = empty = 0
+        while empty < MAX_EMPTY_BATCHES:
+            have = await run_in_threadpool(self.count, b)
+            if have >= self.target:
+                break
+            items = await self._generate(b, min(self.batch, self.target - have))
+            valid = [i for i in items if validate_item(i)]
+            self.rejected += len(items) - len(valid)
+            new = await run_in_threadpool(self.add, b, valid)
+            self.generated += new
+            added += new
+            empty = 0 if new else empty + 1
+        print(f"[BANK] Refilled {b}: +{added} items")
+        return added
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        while True:
+            b = await self._queue.get()
+            try:
+                await self.refill(b)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[BANK] Refill of {b} failed: {e}")
+            finally:
+                self._queued.discard(b)
+
+    def start(self, warm: List[Bucket]) -> None:
+        """Start the refill worker (inside the event loop) and queue warm-up buckets."""
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._queued.clear()
+        self._worker = asyncio.create_task(self._run())
+        for b in warm:
+            self.request_refill(b)
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker, self._queue = None, None
+
+
+_bank: Optional[ItemBank] = None
+_bank_lock = threading.Lock()
+
+
+def get_bank() -> ItemBank:
+    """Process-wide bank configured from env."""
+    global _bank
+    if _bank is None:
+        with _bank_lock:
+            if _bank is None:
+                _bank = ItemBank(
+                    path=Path(os.getenv("ITEM_BANK_PATH", str(DEFAULT_PATH))),
+                    target=int(os.getenv("ITEM_BANK_TARGET", "30")),
+                    low_water=int(os.getenv("ITEM_BANK_LOW_WATER", "10")),
+                    batch=int(os.getenv("ITEM_BANK_BATCH", "10")),
+                    max_buckets=int(os.getenv("ITEM_BANK_MAX_BUCKETS", "200")),
+                    max_queued=int(os.getenv("ITEM_BANK_MAX_QUEUED", "50")),
+                )
+    return _bank
+
+
+def warm_buckets() -> List[Bucket]:
+    return parse_warm_buckets(os.getenv("ITEM_BANK_WARM", ""))
+
+
+def known_bucket_error(b: Bucket) -> Optional[str]:
+    """check_bucket against the configured warm buckets and unit range."""
+    return check_bucket(b, warm_buckets(), int(os.getenv("ITEM_BANK_MAX_UNIT", "12")))
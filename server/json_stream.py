@@ -0,0 +1,84 @@
+# server/json_stream.py
+"""
+Incremental extraction of quiz items from a streamed LLM JSON response.
+
+The model answers {"items": [{...}, {...}]} (or a bare [...] list) a few tokens at a
+time. ItemStreamParser is fed those fragments and returns each item object as soon as
+its closing brace arrives, without waiting for the rest of the document.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+ITEM_KEYS = ("items", "questions")
+
+
+class ItemStreamParser:
+    """
+    Tracks JSON nesting (and strings, so braces inside question text don't count).
+    An item is any object that is an element of the root list, or of the list under
+    one of ITEM_KEYS in the root object.
+    """
+
+    def __init__(self) -> None:
+        self.buf: List[str] = []
+        self.stack: List[str] = []  # "{" / "[" of the open containers
+        self.in_string = False
+        self.escape = False
+        self.item_start: Optional[int] = None
+        self.key: Optional[str] = None  # last string seen directly in the root object
+        self.key_start: Optional[int] = None
+        self.list_key: Optional[str] = None  # key of the currently open root-level list
+        self.pos = 0
+        self.errors = 0
+
+    def _item_list_open(self) -> bool:
+        if self.stack == ["["]:
+            return True
+        return self.stack == ["{", "["] and self.list_key in ITEM_KEYS
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume a fragment; returns the item objects completed by it."""
+        done: List[Dict[str, Any]] = []
+        for ch in text:
+            self.buf.append(ch)
+            i = self.pos
+            self.pos += 1
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.key_start is not None:
+                        self.key = "".join(self.buf[self.key_start + 1:i])
+                        self.key_start = None
+                continue
+            if ch == '"':
+                self.in_string = True
+                if self.stack == ["{"]:
+                    self.key_start = i
+            elif ch in "{[":
+                if ch == "{" and self._item_list_open():
+                    self.item_start = i
+                if ch == "[" and self.stack == ["{"]:
+                    self.list_key = self.key
+                self.stack.append(ch)
+            elif ch in "}]":
+                if not self.stack:
+                    continue
+                self.stack.pop()
+                if ch == "}" and self.item_start is not None and self._item_list_open():
+                    raw = "".join(self.buf[self.item_start:i + 1])
+                    self.item_start = None
+                    try:
+                        obj = json.loads(raw)
+                    except json.JSONDecodeError:
+                        self.errors += 1
+                        continue
+                    if isinstance(obj, dict):
+                        done.append(obj)
+        return done
@@ -0,0 +1,124 @@
+# server/lexical_index.py
+"""
+BM25 inverted index over the passages (built by build_index.py, read by retriever.py).
+
+Quiz queries are often plain keywords ("past tense", unit titles, payload keywords)
+that MiniLM embeddings rank loosely; exact term matches catch them. Scoring needs no
+model, so the retriever can answer lexical-only queries without loading SBERT.
+
+Postings are CSR arrays: the postings of term t are rows offsets[t]:offsets[t+1] of
+`docs` (passage row ids, ascending) and `tfs` (term frequency in that passage).
+Scoring a query is one vectorized scatter-add per query term.
+
+Saved as an uncompressed .npz next to passages.store; the vocabulary is stored as
+JSON bytes.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+K1, B = 1.2, 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in into is it its "
+    "of on or our she so that the their them then there these they this to was we were "
+    "what when which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords; possessive 's is dropped."""
+    out = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        if tok.endswith("'s"):
+            tok = tok[:-2]
+        if tok and tok not in STOPWORDS:
+            out.append(tok)
+    return out
+
+
+class LexicalIndex:
+    def __init__(self, vocab: Dict[str, int], offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray, doc_len: np.ndarray):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_len = doc_len
+        n = len(doc_len)
+        df = np.diff(offsets).astype("float32")
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype("float32")
+        avgdl = float(doc_len.mean()) if n else 1.0
+        # Per-passage length normalization of the BM25 denominator
+        self._norm = (K1 * (1 - B + B * doc_len / max(avgdl, 1e-9))).astype("float32")
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "LexicalIndex":
+        vocab: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        lengths: List[int] = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                t = vocab.setdefault(term, len(vocab))
+                if t == len(postings):
+                    postings.append([])
+                postings[t].append((row, tf))
+        offsets = np.zeros(len(postings) + 1, dtype="int64")
+        np.cumsum([len(p) for p in postings], out=offsets[1:])
+        docs = np.fromiter((d for p in postings for d, _ in p), dtype="int32", count=int(offsets[-1]))
+        tfs = np.fromiter((tf for p in postings for _, tf in p), dtype="float32", count=int(offsets[-1]))
+        return cls(vocab, offsets, docs, tfs, np.asarray(lengths, dtype="float32"))
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        terms = sorted(self.vocab, key=self.vocab.__getitem__)
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                terms=np.frombuffer(json.dumps(terms).encode("utf-8"), dtype=np.uint8),
+                offsets=self.offsets, docs=self.docs, tfs=self.tfs, doc_len=self.doc_len,
+            )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "LexicalIndex":
+        with np.load(path) as data:
+            terms = json.loads(data["terms"].tobytes().decode("utf-8"))
+            return cls({t: i for i, t in enumerate(terms)}, data["offsets"], data["docs"], data["tfs"], data["doc_len"])
+
+    def scores(self, query: str) -> Optional[np.ndarray]:
+        """BM25 score of every passage for `query`, or None if no query term is indexed."""
+        terms = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not terms:
+            return None
+        out = np.zeros(len(self.doc_len), dtype="float32")
+        for t in terms:
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            docs, tf = self.docs[lo:hi], self.tfs[lo:hi]
+            # Doc ids are unique within one term's postings, so fancy-index += is safe
+            out[docs] += self.idf[t] * tf * (K1 + 1) / (tf + self._norm[docs])
+        return out
+
+    def top(self, query: str, n: int, ids: Optional[np.ndarray] = None) -> List[int]:
+        """Top-`n` passage rows with a positive score, restricted to `ids` if given."""
+        scores = self.scores(query)
+        if scores is None or n <= 0:
+            return []
+        rows = np.flatnonzero(scores) if ids is None else ids[scores[ids] > 0]
+        if len(rows) > n:
+            rows = rows[np.argpartition(-scores[rows], n - 1)[:n]]
+        return [int(r) for r in rows[np.argsort(-scores[rows], kind="stable")]]
@@ -5,31 +5,43 @@ Env:
   OPENAI_API_KEY   (required)
   MODEL_NAME       (default: gpt-4o-mini)
   OPENAI_BASE_URL  (default: https://api.openai.com/v1)
+HTTP goes through the process-wide keep-alive pool in http_pool.py (LLM_* env vars).
 """
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
-import time
 from typing import Iterable, List, Literal, Optional, TypedDict
 
-import requests
 from dotenv import load_dotenv
 
-load_dotenv()
+from . import context_packer, http_pool
 
-# Load server/.env first
 _SERVER_ENV = os.path.join(os.path.dirname(__file__), ".env")
-load_dotenv(dotenv_path=_SERVER_ENV)
-
-# Then try project-root/.env (in case you want to share vars)
 _ROOT_ENV = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".env"))
-load_dotenv(dotenv_path=_ROOT_ENV)
+_env_loaded = False
+
+
+def _load_env() -> None:
+    """Load .env files once, on first client construction rather than at import."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    load_dotenv()
+
+    # Load server/.env first
+    load_dotenv(dotenv_path=_SERVER_ENV)
+
+    # Then try project-root/.env (in case you want to share vars)
+    load_dotenv(dotenv_path=_ROOT_ENV)
+
+    # Debug once
+    print("[ENV] server .env exists?", os.path.exists(_SERVER_ENV), "root .env exists?", os.path.exists(_ROOT_ENV))
+    print("[ENV] OPENAI_API_KEY length:", len(os.getenv("OPENAI_API_KEY") or "0"))
 
-# Debug once
-print("[ENV] server .env exists?", os.path.exists(_SERVER_ENV), "root .env exists?", os.path.exists(_ROOT_ENV))
-print("[ENV] OPENAI_API_KEY length:", len(os.getenv("OPENAI_API_KEY") or "0"))
 
 ChatRole = Literal["system", "user", "assistant"]
 
@@ -48,8 +60,9 @@ class LLMClient:
         timeout_s: float = 30.0,
         max_retries: int = 2,
     ):
+        _load_env()
         self.model: str = model or os.getenv("MODEL_NAME", "gpt-4o-mini")
-        self.base_url: str = base_url or os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+        self.base_url: str = base_url or http_pool.base_url()
         self.api_key: str = api_key or os.getenv("OPENAI_API_KEY", "")
         self.timeout_s: float = timeout_s
         self.max_retries: int = max_retries
@@ -57,18 +70,17 @@ class LLMClient:
         if not self.api_key:
             raise RuntimeError("OPENAI_API_KEY is not set in server/.env")
 
-        # One session = connection reuse
-        self._session = requests.Session()
-        self._session.headers.update({
+        # Connection reuse comes from the shared pool; only per-client headers here
+        self._headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "User-Agent": "psac-english-ai-tutor/1.0",
-        })
+        }
 
         # Helpful one-time log
         print(f"[LLM] Using model={self.model} base_url={self.base_url}")
 
-    def chat(
+    async def chat(
         self,
         messages: List[ChatMessage],
         *,
@@ -88,7 +100,9 @@ class LLMClient:
         last_err: Optional[Exception] = None
         for attempt in range(self.max_retries + 1):
             try:
-                resp = self._session.post(url, json=payload, timeout=self.timeout_s)
+                resp = await http_pool.get_http_client().post(
+                    url, json=payload, headers=self._headers, timeout=self.timeout_s
+                )
                 if resp.status_code in (429, 500, 502, 503, 504):
                     raise RuntimeError(f"LLM HTTP {resp.status_code}: {resp.text[:200]}")
                 resp.raise_for_status()
@@ -99,14 +113,14 @@ class LLMClient:
                 last_err = e
                 # small backoff
                 if attempt < self.max_retries:
-                    time.sleep(0.7 * (attempt + 1))
+                    await asyncio.sleep(0.7 * (attempt + 1))
                 else:
                     break
         # Surface useful error
         raise RuntimeError(f"LLM chat failed after retries: {last_err}")
 
 # Optional helper if you want a one-shot quiz generator from plain text
-def make_quiz_items_from_text(text: str, skills: Iterable[str], count: int = 3) -> List[dict]:
+async def make_quiz_items_from_text(text: str, skills: Iterable[str], count: int = 3) -> List[dict]:
     """Generate quiz items as structured JSON. Returns a list of item dicts."""
     client = LLMClient()
     skill_str = ", ".join(skills)
@@ -118,13 +132,13 @@ def make_quiz_items_from_text(text: str, skills: Iterable[str], count: int = 3)
         "Output JSON only.\n\n"
         f"Skills: {skill_str}\n"
         "Source text:\n"
-        f"{text[:3000]}\n"
+        f"{context_packer.trim(text, context_packer.budget())}\n"
     )
     messages: List[ChatMessage] = [
         {"role": "system", "content": "Return only strict JSON with an 'items' array."},
         {"role": "user", "content": prompt},
     ]
-    raw = client.chat(messages)
+    raw = await client.chat(messages)
     try:
         data = json.loads(raw)
         items = data.get("items", [])
@@ -0,0 +1,141 @@
+# server/model_registry.py
+"""
+Shared, TTL-cached view of which OpenAI models this API key can use.
+
+Replaces per-request `models.retrieve` calls in the quiz, health and models routes:
+one `models.list()` is loaded at startup and refreshed in the background, and model
+resolution becomes a set lookup. Failures are cached too (negative caching), so a
+bad MODEL_NAME or an unreachable API doesn't add round trips to every request.
+
+Env:
+  MODEL_NAME                  preferred model            (default: gpt-4o-mini)
+  MODEL_CACHE_TTL_S           refresh interval           (default: 600)
+  MODEL_CACHE_NEGATIVE_TTL_S  how long failures stick    (default: 60)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from fastapi import HTTPException
+
+from . import http_pool
+
+FALLBACK_MODELS: Tuple[Tuple[str, str], ...] = (("gpt-4o-mini", "fallback"), ("gpt-3.5-turbo", "last_resort"))
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    models: FrozenSet[str] = frozenset()
+    error: Optional[str] = None  # why the last refresh failed, if it did
+    fetched_at: float = 0.0
+    expires_at: float = 0.0
+
+
+_snapshot = Snapshot()
+_refresh_lock: Optional[asyncio.Lock] = None
+_unavailable: Dict[str, float] = {}  # model -> negative-cache expiry
+
+
+def configured_model() -> str:
+    return os.getenv("MODEL_NAME", "gpt-4o-mini")
+
+
+def _ttl() -> float:
+    return float(os.getenv("MODEL_CACHE_TTL_S", "600"))
+
+
+def _negative_ttl() -> float:
+    return float(os.getenv("MODEL_CACHE_NEGATIVE_TTL_S", "60"))
+
+
+def _describe(e: Exception) -> str:
+    from openai import APIConnectionError, APIStatusError, AuthenticationError
+    if isinstance(e, AuthenticationError):
+        return "Invalid OPENAI_API_KEY"
+    if isinstance(e, APIConnectionError):
+        return f"Connection error: {e}"
+    if isinstance(e, APIStatusError):
+        return f"OpenAI error {e.status_code}"
+    return str(e)
+
+
+async def refresh() -> Snapshot:
+    """Fetch the model list now. Failures are kept for the (shorter) negative TTL."""
+    global _snapshot
+    now = time.time()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        _snapshot = Snapshot(error="OPENAI_API_KEY missing", fetched_at=now, expires_at=now + _negative_ttl())
+        return _snapshot
+    try:
+        page = await http_pool.get_openai_client(api_key).models.list()
+        names = frozenset(m.id for m in page.data)
+        _snapshot = Snapshot(models=names, fetched_at=now, expires_at=now + _ttl())
+        _unavailable.clear()
+        print(f"[MODELS] Loaded {len(names)} models; configured {configured_model()} available: "
+              f"{configured_model() in names}")
+    except Exception as e:
+        _snapshot = Snapshot(
+            models=_snapshot.models, error=_describe(e), fetched_at=now, expires_at=now + _negative_ttl()
+        )
+        print(f"[MODELS] Refresh failed: {_snapshot.error}")
+    return _snapshot
+
+
+def _lock() -> asyncio.Lock:
+    global _refresh_lock
+    if _refresh_lock is None:
+        _refresh_lock = asyncio.Lock()
+    return _refresh_lock
+
+
+async def snapshot() -> Snapshot:
+    """Current snapshot, refreshed first if it expired (one refresh in flight at a time)."""
+    if time.time() < _snapshot.expires_at:
+        return _snapshot
+    async with _lock():
+        if time.time() >= _snapshot.expires_at:  # another waiter may have refreshed
+            await refresh()
+    return _snapshot
+
+
+def mark_unavailable(model: str) -> None:
+    """Negative-cache a model that failed at call time (e.g. 404 from completions)."""
+    _unavailable[model] = time.time() + _negative_ttl()
+
+
+def note_error(model: str, e: Exception) -> None:
+    """Negative-cache `model` if a call failed because it doesn't exist for this key."""
+    from openai import NotFoundError
+    if isinstance(e, NotFoundError):
+        mark_unavailable(model)
+
+
+def _usable(model: str, snap: Snapshot) -> bool:
+    if _unavailable.get(model, 0.0) > time.time():
+        return False
+    return model in snap.models
+
+
+async def resolve() -> Tuple[str, str]:
+    """(model, resolved_from) from the cache: configured, else the fallbacks in order."""
+    snap = await snapshot()
+    if not snap.models and snap.error:
+        raise HTTPException(status_code=500, detail=f"OpenAI models unavailable: {snap.error}")
+    for model, source in ((configured_model(), "configured"),) + FALLBACK_MODELS:
+        if _usable(model, snap):
+            return model, source
+    raise HTTPException(status_code=500, detail="No available OpenAI models")
+
+
+async def refresh_forever() -> None:
+    """Background task: load at startup, then refresh ahead of expiry so requests never wait."""
+    while True:
+        async with _lock():
+            snap = await refresh()
+        await asyncio.sleep(max(0.8 * (snap.expires_at - time.time()), 1.0))
@@ -0,0 +1,192 @@
+# server/passage_store.py
+"""
+Compact, memory-mapped passage store (written by build_index.py, read by retriever.py).
+
+Replaces parsing all of passages.jsonl into a list of dicts in every worker: the file
+is mmapped read-only, so workers share its pages through the OS page cache and a
+passage is only decoded when it is fetched by row id.
+
+Layout (little-endian):
+  MAGIC | u64 header length | header JSON | sections, each 8-byte aligned
+  sections: ids.offsets (u64, n+1) + ids.blob, text.offsets (u64, n+1) + text.blob,
+            one column per meta key:
+              int  -> i64 values, INT_MISSING where absent
+              cat  -> i32 codes into header["meta"][key]["values"], -1 where absent
+
+Convert an existing corpus without rebuilding the index:
+  python -m server.passage_store server/data/passages.jsonl server/data/passages.store
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+MAGIC = b"PSTORE01"
+INT_MISSING = np.iinfo(np.int64).min
+
+
+def _is_int(v: Any) -> bool:
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+def _strings_section(values: List[str]) -> Tuple[np.ndarray, bytes]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def write_store(records: Iterable[Dict[str, Any]], path: Path) -> int:
+    """Write passage dicts ({id, text, meta}) to `path`. Returns the passage count."""
+    records = list(records)
+    n = len(records)
+
+    sections: Dict[str, bytes] = {}
+    id_offsets, id_blob = _strings_section([str(r["id"]) for r in records])
+    text_offsets, text_blob = _strings_section([r["text"] for r in records])
+    sections["ids.offsets"] = id_offsets.tobytes()
+    sections["ids.blob"] = id_blob
+    sections["text.offsets"] = text_offsets.tobytes()
+    sections["text.blob"] = text_blob
+
+    meta_header: Dict[str, Dict[str, Any]] = {}
+    keys = sorted({k for r in records for k in r.get("meta", {})})
+    for key in keys:
+        column = [r.get("meta", {}).get(key) for r in records]
+        present = [v for v in column if v is not None]
+        if present and all(_is_int(v) for v in present):
+            arr = np.array([INT_MISSING if v is None else v for v in column], dtype="<i8")
+            meta_header[key] = {"kind": "int"}
+        else:
+            values: List[Any] = []
+            codes_by_value: Dict[str, int] = {}
+            codes = np.full(n, -1, dtype="<i4")
+            for i, v in enumerate(column):
+                if v is None:
+                    continue
+                token = json.dumps(v, sort_keys=True)
+                if token not in codes_by_value:
+                    codes_by_value[token] = len(values)
+                    values.append(v)
+                codes[i] = codes_by_value[token]
+            arr = codes
+            meta_header[key] = {"kind": "cat", "values": values}
+        sections[f"meta.{key}"] = arr.tobytes()
+
+    layout: Dict[str, List[int]] = {}
+    pos = 0
+    for name, blob in sections.items():
+        layout[name] = [pos, len(blob)]
+        pos += len(blob) + (-len(blob) % 8)
+
+    header = json.dumps({"count": n, "sections": layout, "meta": meta_header}).encode("utf-8")
+    base = len(MAGIC) + 8 + len(header)
+    base_pad = -base % 8
+
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header) + base_pad).tobytes())
+        f.write(header + b" " * base_pad)  # JSON tolerates trailing spaces
+        for blob in sections.values():
+            f.write(blob)
+            f.write(b"\0" * (-len(blob) % 8))
+    tmp.replace(path)
+    return n
+
+
+class PassageStore:
+    """Read-only, mmapped passage store. Behaves like a sequence of passage dicts."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a passage store")
+        header_len = int(np.frombuffer(self._mm, dtype="<u8", count=1, offset=len(MAGIC))[0])
+        start = len(MAGIC) + 8
+        header = json.loads(self._mm[start : start + header_len].decode("utf-8"))
+        self._base = start + header_len
+        self._layout: Dict[str, List[int]] = header["sections"]
+        self._meta_header: Dict[str, Dict[str, Any]] = header["meta"]
+        self._count: int = header["count"]
+
+        self._id_offsets = self._array("ids.offsets", "<u8")
+        self._text_offsets = self._array("text.offsets", "<u8")
+        self._meta_cols = {
+            key: self._array(f"meta.{key}", "<i8" if spec["kind"] == "int" else "<i4")
+            for key, spec in self._meta_header.items()
+        }
+
+    def _array(self, name: str, dtype: str) -> np.ndarray:
+        start, length = self._layout[name]
+        itemsize = np.dtype(dtype).itemsize
+        return np.frombuffer(self._mm, dtype=dtype, count=length // itemsize, offset=self._base + start)
+
+    def _string(self, blob: str, offsets: np.ndarray, i: int) -> str:
+        start = self._base + self._layout[blob][0]
+        return self._mm[start + int(offsets[i]) : start + int(offsets[i + 1])].decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def id(self, i: int) -> str:
+        return self._string("ids.blob", self._id_offsets, i)
+
+    def text(self, i: int) -> str:
+        return self._string("text.blob", self._text_offsets, i)
+
+    def meta(self, i: int) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for key, col in self._meta_cols.items():
+            v = col[i]
+            if self._meta_header[key]["kind"] == "int":
+                if v != INT_MISSING:
+                    out[key] = int(v)
+            elif v >= 0:
+                out[key] = self._meta_header[key]["values"][v]
+        return out
+
+    def meta_column(self, key: str) -> List[Any]:
+        """All values of one meta key (None where absent), read straight from its column."""
+        col = self._meta_cols.get(key)
+        if col is None:
+            return [None] * self._count
+        if self._meta_header[key]["kind"] == "int":
+            return [None if v == INT_MISSING else int(v) for v in col.tolist()]
+        values = self._meta_header[key]["values"]
+        return [values[c] if c >= 0 else None for c in col.tolist()]
+
+    def iter_meta(self) -> Iterator[Dict[str, Any]]:
+        """Meta dicts for every row, without touching the text blob."""
+        columns = {key: self.meta_column(key) for key in self._meta_cols}
+        for i in range(self._count):
+            yield {key: col[i] for key, col in columns.items() if col[i] is not None}
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return {"id": self.id(i), "text": self.text(i), "meta": self.meta(i)}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._count):
+            yield self[i]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m server.passage_store <passages.jsonl> <passages.store>")
+    src, dst = Path(sys.argv[1]), Path(sys.argv[2])
+    with src.open("r", encoding="utf-8") as f:
+        count = write_store((json.loads(line) for line in f), dst)
+    print(f"Wrote {count} passages → {dst}")
@@ -0,0 +1,208 @@
+# server/quiz_cache.py
+"""
+Persistent cache of generated quizzes, so identical requests don't re-hit the LLM.
+
+Keys are content hashes of everything that shapes the LLM output: the model, both
+prompts, the sampling settings and (for seeded requests) the retrieved passage ids.
+Each key holds a small pool of variants:
+  - seeded requests are deterministic: one variant, served as-is;
+  - non-seeded requests draw a random variant, and the pool grows in the background
+    (up to QUIZ_CACHE_POOL_SIZE) so repeat users still see different quizzes.
+Concurrent misses on the same key share one in-flight LLM call (`coalesce`), which
+is cancelled once every caller waiting on it has been cancelled.
+
+Entries live in one SQLite file shared by all workers and are evicted least recently
+used first once the stored quizzes exceed QUIZ_CACHE_MAX_MB.
+
+Env:
+  QUIZ_CACHE_ENABLED    0 disables the cache          (default: 1)
+  QUIZ_CACHE_PATH       SQLite file                   (default: server/data/quiz_cache.sqlite)
+  QUIZ_CACHE_MAX_MB     size budget for stored JSON   (default: 64)
+  QUIZ_CACHE_POOL_SIZE  variants kept per unseeded key (default: 4)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+DEFAULT_PATH = Path(__file__).parent / "data" / "quiz_cache.sqlite"
+
+
+def make_key(model: str, prompts: Sequence[str], passage_ids: Optional[Sequence[str]] = None, **settings: Any) -> str:
+    """Content address for one LLM request; `settings` are sampling knobs (temperature...)."""
+    blob = json.dumps(
+        {"model": model, "prompts": list(prompts), "passages": passage_ids, "settings": settings},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class QuizCache:
+    def __init__(self, path: Path, max_bytes: int, pool_size: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.pool_size = max(pool_size, 1)
+        self.hits = self.misses = self.evictions = self.coalesced = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, int] = {}
+        self._background: set = set()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quizzes ("
+                " key TEXT NOT NULL, variant INTEGER NOT NULL, quiz TEXT NOT NULL,"
+                " size INTEGER NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL,"
+                " PRIMARY KEY (key, variant))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS quizzes_used_at ON quizzes(used_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- storage ------------------------------------------------------------------
+    def variants(self, key: str) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM quizzes WHERE key = ?", (key,)).fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A random stored variant for `key` (the only one, for seeded keys)."""
+        conn = self._conn()
+        rows = conn.execute("SELECT variant, quiz FROM quizzes WHERE key = ?", (key,)).fetchall()
+        if not rows:
+            self.misses += 1
+            return None
+        variant, quiz = random.choice(rows)
+        with conn:
+            conn.execute("UPDATE quizzes SET used_at = ? WHERE key = ? AND variant = ?", (time.time(), key, variant))
+        self.hits += 1
+        return json.loads(quiz)
+
+    def put(self, key: str, quiz: Dict[str, Any]) -> None:
+        """Add a variant under `key` (replacing the oldest once the pool is full)."""
+        conn = self._conn()
+        blob = json.dumps(quiz, ensure_ascii=False)
+        now = time.time()
+        with conn:
+            rows = conn.execute(
+                "SELECT variant FROM quizzes WHERE key = ? ORDER BY stored_at ASC", (key,)
+            ).fetchall()
+            if len(rows) >= self.pool_size:
+                variant = rows[0][0]
+            else:
+                variant = max((r[0] for r in rows), default=-1) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO quizzes (key, variant, quiz, size, stored_at, used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, variant, blob, len(blob), now, now),
+            )
+            self.evictions += self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM quizzes").fetchone()[0]
+        evicted = 0
+        while total > self.max_bytes:
+            batch = conn.execute(
+                "SELECT rowid, size FROM quizzes ORDER BY used_at ASC LIMIT 64"
+            ).fetchall()
+            if not batch:
+                break
+            drop: List[int] = []
+            for rowid, size in batch:
+                if total <= self.max_bytes:
+                    break
+                drop.append(rowid)
+                total -= size
+            conn.executemany("DELETE FROM quizzes WHERE rowid = ?", [(r,) for r in drop])
+            evicted += len(drop)
+        return evicted
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM quizzes").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM quizzes").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "pool_size": self.pool_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "inflight": len(self._inflight),
+        }
+
+    # --- request coalescing -------------------------------------------------------
+    async def coalesce(self, key: str, make: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `make()` once per key at a time; concurrent callers await the same result."""
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+        else:
+            fut = asyncio.ensure_future(make())
+            self._inflight[key] = fut
+            self._waiters[key] = 0
+            fut.add_done_callback(lambda f: self._forget(key, f))
+        self._waiters[key] += 1
+        try:
+            # shield: one caller disconnecting must not cancel the call others are awaiting
+            return await asyncio.shield(fut)
+        finally:
+            if self._inflight.get(key) is fut:
+                self._waiters[key] -= 1
+                if not self._waiters[key] and not fut.done():
+                    # every caller gave up (e.g. a cancelled batch): stop paying for the call
+                    fut.cancel()
+
+    def _forget(self, key: str, fut: asyncio.Future) -> None:
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+            del self._waiters[key]
+
+    def grow_in_background(self, key: str, make: Callable[[], Awaitable[Any]]) -> None:
+        """Add a variant to an unseeded pool without making the caller wait."""
+        if key in self._inflight:
+            return
+        task = asyncio.ensure_future(self.coalesce(key, make))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+
+_cache: Optional[QuizCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[QuizCache]:
+    """Process-wide cache from env (None when QUIZ_CACHE_ENABLED=0)."""
+    global _cache
+    if os.getenv("QUIZ_CACHE_ENABLED", "1") == "0":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QuizCache(
+                    path=Path(os.getenv("QUIZ_CACHE_PATH", str(DEFAULT_PATH))),
+                    max_bytes=int(float(os.getenv("QUIZ_CACHE_MAX_MB", "64")) * 1024 * 1024),
+                    pool_size=int(os.getenv("QUIZ_CACHE_POOL_SIZE", "4")),
+                )
+    return _cache
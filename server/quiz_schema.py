@@ -4,7 +4,9 @@ These should align with the frontend types in src/lib/api.ts.
 """
 
 from typing import List, Optional, Union
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+DIFFICULTY_LEVELS = {"easy": 1, "medium": 2, "hard": 3}
 
 
 class QuizItem(BaseModel):
@@ -19,6 +21,7 @@ class QuizItem(BaseModel):
 class BackendQuizResponse(BaseModel):
     items: Optional[List[QuizItem]] = None
     source: Optional[str] = None
+    passage_ids: Optional[List[str]] = None  # textbook passages packed into the prompt
 
 
 class GenerateQuizPayload(BaseModel):
@@ -34,6 +37,36 @@ class GenerateQuizPayload(BaseModel):
     keywords: List[str] = Field(default_factory=list)
     query: Optional[str] = None
     seed: Optional[int] = None
+    # 1 = easy, 2 = medium, 3 = hard (see ADAPTIVE_DIFFICULTY_README.md)
+    difficulty: Optional[int] = Field(default=None, ge=1, le=3)
+
+    @field_validator("difficulty", mode="before")
+    @classmethod
+    def _difficulty_level(cls, v):
+        # The frontend also sends labels ("easy") or free text ("PSAC-G6"): map or ignore
+        if isinstance(v, str):
+            v = v.strip().lower()
+            return DIFFICULTY_LEVELS.get(v, int(v) if v.isdigit() else None)
+        return v
+
+
+class GenerateQuizBatchPayload(BaseModel):
+    requests: List[GenerateQuizPayload] = Field(min_length=1, max_length=50)
+    # max LLM calls in flight for this batch (default: QUIZ_BATCH_CONCURRENCY env, 4)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=32)
+
+
+class BatchQuizResult(BaseModel):
+    # position of the request in GenerateQuizBatchPayload.requests
+    index: int
+    quiz: BackendQuizResponse
+
+
+class BankItemsRequest(BaseModel):
+    skill: str = "grammar"
+    unit: Optional[str] = None
+    difficulty: int = Field(default=2, ge=1, le=3)
+    count: int = Field(default=1, ge=1, le=20)
 
 
 class SaveQuizRequest(BaseModel):
@@ -52,6 +85,7 @@ class AttemptPayload(BaseModel):
     user_answer: str
     is_correct: bool
     time_ms: Optional[int] = None
+    hints: int = 0
 
 
 class NextDifficultyRequest(BaseModel):
@@ -61,5 +95,11 @@ class NextDifficultyRequest(BaseModel):
 
 class NextDifficultyResponse(BaseModel):
     skill: str
+    # 1 = easy, 2 = medium, 3 = hard
+    difficulty: int = 2
+    # recent attempts the decision was based on
+    attempts: int = 0
+    accuracy: Optional[float] = None
+    avg_time_s: Optional[float] = None
 
 
@@ -0,0 +1,175 @@
+# server/quiz_validator.py
+"""
+Parsing, repair and validation of LLM quiz output, item by item.
+
+A completion used to be all-or-nothing: one bad item or a response cut off by
+max_tokens sent the whole request to the fallback quiz. Instead:
+
+  parse_items  json.loads; if that fails (truncated or wrapped output), the complete
+               item objects are salvaged with json_stream.ItemStreamParser
+  repair       fixes what can be fixed locally: "B" / "2" / option-text answers become
+               option indexes, duplicate or blank options are dropped (answer index
+               remapped), int answers of fill-in-the-blank items become strings
+  check        repair + normalize + item_bank.validate_item; returns the answerable
+               items, so the route only asks the model again for the shortfall
+
+Streamed completions go through the same `check`, one item at a time, with
+`record_stream` for the response-level counters.
+
+Counters (`stats()`, /api/debug/generation) track how often responses fail to parse
+and how many items had to be repaired or dropped. An item counts as repaired only if
+its answer, number of options or type changed.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+from .item_bank import validate_item
+from .json_stream import ITEM_KEYS, ItemStreamParser
+from .quiz_schema import QuizItem
+
+_counts: Dict[str, int] = {
+    "responses": 0,
+    "parse_failures": 0,  # json.loads failed (items may still have been salvaged)
+    "unusable_responses": 0,  # nothing salvageable either
+    "items": 0,
+    "repaired_items": 0,
+    "invalid_items": 0,  # includes malformed ones
+    "malformed_items": 0,  # item objects that weren't valid JSON
+    "topup_calls": 0,
+    "fallbacks": 0,
+}
+_lock = threading.Lock()
+
+
+def record(**deltas: int) -> None:
+    with _lock:
+        for key, n in deltas.items():
+            _counts[key] += n
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        out: Dict[str, Any] = dict(_counts)
+    responses, items = out["responses"], out["items"]
+    out["parse_failure_rate"] = round(out["parse_failures"] / responses, 4) if responses else 0.0
+    out["invalid_item_rate"] = round(out["invalid_items"] / items, 4) if items else 0.0
+    return out
+
+
+def parse_items(content: str) -> List[Dict[str, Any]]:
+    """Raw item dicts from a completion; [] if nothing usable."""
+    record(responses=1)
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        parser = ItemStreamParser()
+        items = parser.feed(content)
+        print(f"[DEBUG] JSON parsing failed ({e}); salvaged {len(items)} complete items")
+        record(parse_failures=1, unusable_responses=int(not items))
+        _record_malformed(parser.errors)
+        return items
+    if isinstance(data, dict):
+        for key in ITEM_KEYS:
+            if isinstance(data.get(key), list):
+                return [q for q in data[key] if isinstance(q, dict)]
+    elif isinstance(data, list):
+        return [q for q in data if isinstance(q, dict)]
+    print(f"[DEBUG] Unexpected data structure: {str(data)[:200]}")
+    record(unusable_responses=1)
+    return []
+
+
+def _record_malformed(n: int) -> None:
+    if n:
+        record(items=n, invalid_items=n, malformed_items=n)
+
+
+def record_stream(parser: ItemStreamParser, items: int, finished: bool) -> None:
+    """
+    parse_items' counters for a streamed completion. `finished`: the model's output was
+    read to the end (not cut short because enough items had arrived), so the whole
+    document can be checked.
+    """
+    record(responses=1)
+    _record_malformed(parser.errors)
+    if not finished:
+        return
+    try:
+        json.loads("".join(parser.buf))
+    except json.JSONDecodeError:
+        record(parse_failures=1)
+    record(unusable_responses=int(not items))
+
+
+def _answer_index(answer: Any, options: List[str]) -> Any:
+    """Map letter / digit / option-text answers of an MCQ to an option index."""
+    if isinstance(answer, bool) or not isinstance(answer, (int, str)):
+        return answer
+    if isinstance(answer, int):
+        return answer
+    a = answer.strip()
+    folded = [o.casefold() for o in options]
+    if a.casefold() in folded:
+        return folded.index(a.casefold())
+    if a.isdigit():
+        return int(a)
+    if len(a) == 1 and a.isalpha() and ord(a.upper()) - ord("A") < len(options):
+        return ord(a.upper()) - ord("A")
+    return answer
+
+
+def repair(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of `raw` with locally fixable problems fixed (see module docstring)."""
+    q = dict(raw)
+    q_type = str(q.get("type") or "mcq").strip().lower()
+    options = q.get("options") or []
+    answer = q.get("answer", 0)
+    if q_type == "mcq" and isinstance(options, list):
+        original = [str(o).strip() for o in options]
+        if isinstance(answer, int) and not isinstance(answer, bool) and 0 <= answer < len(original):
+            answer = original[answer]  # remap by text once options are cleaned
+        cleaned = list(dict.fromkeys(o for o in original if o))
+        q["options"] = cleaned
+        q["answer"] = _answer_index(answer, cleaned)
+    elif q_type != "mcq" and isinstance(answer, int) and not isinstance(answer, bool):
+        q["answer"] = str(answer)
+    q["type"] = q_type
+    return q
+
+
+def was_repaired(raw: Dict[str, Any], fixed: Dict[str, Any]) -> bool:
+    """True if repair changed the answer, the number of options or the type."""
+    if raw.get("answer", 0) != fixed.get("answer", 0):
+        return True
+    raw_options = raw.get("options") or []
+    if isinstance(raw_options, list) and len(raw_options) != len(fixed.get("options") or []):
+        return True
+    return "type" in raw and raw["type"] != fixed["type"]
+
+
+def check(
+    raw_items: List[Dict[str, Any]], normalize: Callable[[int, Dict[str, Any]], QuizItem], start: int = 0
+) -> Tuple[List[QuizItem], int]:
+    """(answerable QuizItems, number dropped) for raw item dicts."""
+    items: List[QuizItem] = []
+    repaired = invalid = 0
+    for i, raw in enumerate(raw_items):
+        fixed = repair(raw)
+        try:
+            item = normalize(start + i, fixed)
+        except Exception as e:
+            print(f"[DEBUG] Failed to normalize item {i}: {e}")
+            invalid += 1
+            continue
+        if not validate_item(item):
+            print(f"[DEBUG] Dropping unanswerable item: {raw}")
+            invalid += 1
+            continue
+        repaired += int(was_repaired(raw, fixed))
+        items.append(item)
+    record(items=len(raw_items), repaired_items=repaired, invalid_items=invalid)
+    return items, invalid
@@ -2,98 +2,463 @@
 from __future__ import annotations
 
 import json
+import os
 import random
+import threading
+from collections import OrderedDict, defaultdict
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from . import diversity, embed_batcher, embed_cache, index_types
+from .lexical_index import LexicalIndex
+from .passage_store import PassageStore
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 # Paths relative to this file
 DATA_DIR = Path(__file__).parent / "data"
 PASSAGES_PATH = DATA_DIR / "passages.jsonl"
 INDEX_PATH = DATA_DIR / "index.faiss"
+STORE_PATH = DATA_DIR / "passages.store"
+MANIFEST_PATH = DATA_DIR / "manifest.json"
+LEXICAL_PATH = DATA_DIR / "lexical.npz"
+DUPES_PATH = DATA_DIR / "dupes.npy"
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Size of the ranked pool that `search` samples its `k` passages from
+TOP_N = 20
+
+# Ranking modes (default from RETRIEVER_MODE, "hybrid"):
+#   dense    SBERT query embedding against the FAISS index
+#   lexical  BM25 over the inverted index; falls back to dense when no query term matches
+#            the (filtered) candidates, and tops up a pool shorter than TOP_N with dense
+#            hits, so the model is only loaded for queries BM25 can't fill on its own
+#   hybrid   both rankings merged by reciprocal-rank fusion
+MODES = ("dense", "hybrid", "lexical")
+RRF_K = 60
+
+# MMR trade-off when picking the k passages: 1 = no diversity (RETRIEVER_MMR_LAMBDA)
+MMR_LAMBDA = 0.7
+# Random bonus (seeded per call) added to rank relevance (1 -> 0 down the pool) for variety
+RANK_JITTER = 0.5
+
+# Wildcard for either side of a (unit, section) filter key
+ANY = "*"
+
+# FAISS selectors kept for recently used (unit, sections) filters (LRU)
+SELECTOR_CACHE_SIZE = 256
 
 # Lazy globals
 _model: Optional[SentenceTransformer] = None
 _index: Optional[faiss.Index] = None
-_passages: Optional[List[Dict[str, Any]]] = None
+_index_spec: Dict[str, Any] = {"type": "flat", "params": {}}
+_passages: Optional[Union[List[Dict[str, Any]], PassageStore]] = None
+_filter_index: Optional[Dict[Tuple[str, str], np.ndarray]] = None
+_query_cache: Optional[embed_cache.EmbeddingCache] = None
+_batcher: Optional[embed_batcher.EmbedBatcher] = None
+_lexical: Optional[LexicalIndex] = None
+_canonical: Optional[np.ndarray] = None  # row -> first row of its near-duplicate cluster
+# Ranked top-N row ids per (query, unit, skills, mode); RETRIEVER_POOL_CACHE_SIZE entries, 0 = off
+_pool_cache: Optional[embed_cache.EmbeddingCache] = None
+# Keyed on indexed (unit, section) pairs only, so client-supplied filters can't grow it
+_selectors: "OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[np.ndarray, faiss.IDSelector]]" = OrderedDict()
+_selectors_lock = threading.Lock()
+# Startup preloading (warmup.py) runs in a thread while requests may already call search()
+_load_lock = threading.Lock()
+_model_lock = threading.Lock()
+
+
+def default_mode() -> str:
+    return os.getenv("RETRIEVER_MODE", "hybrid")
 
 
 def _load() -> None:
-    """Load the SBERT model, FAISS index, and passages into memory (lazy)."""
-    global _model, _index, _passages
+    """Load the FAISS index, passages, filter and lexical indexes into memory (lazy)."""
+    if _filter_index is not None:
+        return
+    with _load_lock:
+        _load_locked()
 
-    if _model is None:
-        _model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+
+def _load_locked() -> None:
+    global _index, _index_spec, _passages, _filter_index, _query_cache, _batcher, _lexical, _pool_cache, _canonical
+
+    if _query_cache is None:
+        _query_cache = embed_cache.from_env(namespace=EMBED_MODEL)
+
+    if _pool_cache is None:
+        size = int(os.getenv("RETRIEVER_POOL_CACHE_SIZE", "512"))
+        if size > 0:
+            _pool_cache = embed_cache.EmbeddingCache(embed_cache.MemoryBackend(size, ttl_s=0), namespace="pool")
+
+    if _batcher is None:
+        # Query encodes from concurrent requests share one forward pass (None = inline)
+        _batcher = embed_batcher.from_env(_encode_texts)
 
     if _index is None and INDEX_PATH.exists():
         _index = faiss.read_index(str(INDEX_PATH))
+        if MANIFEST_PATH.exists():
+            # Index type + search knobs recorded by build_index.py (flat if absent)
+            manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+            _index_spec = manifest.get("index") or _index_spec
+        if _index_spec["type"] == "ivf":
+            # MMR reads stored vectors back by row id
+            faiss.extract_index_ivf(_index).make_direct_map()
 
     if _passages is None:
-        with PASSAGES_PATH.open("r", encoding="utf-8") as f:
-            _passages = [json.loads(line) for line in f]
+        if _is_current(STORE_PATH):
+            # mmapped: shared across workers via the page cache, decoded per fetch
+            _passages = PassageStore(STORE_PATH)
+        else:
+            with PASSAGES_PATH.open("r", encoding="utf-8") as f:
+                _passages = [json.loads(line) for line in f]
+
+    if _lexical is None:
+        _lexical = _load_lexical(_passages)
+
+    if _canonical is None:
+        _canonical = _load_dupes(_passages)
+
+    if _filter_index is None:
+        _filter_index = _build_filter_index(_passages)
+        _selectors.clear()
+
+
+def _ensure_model() -> SentenceTransformer:
+    """Load SBERT on first encode (lexical-only searches never get here)."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                # Imported here: sentence-transformers/torch dominate import time
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBED_MODEL)
+    return _model
+
+
+def _is_current(path: Path) -> bool:
+    """A build artifact exists and is no older than passages.jsonl."""
+    if not path.exists():
+        return False
+    return not PASSAGES_PATH.exists() or path.stat().st_mtime >= PASSAGES_PATH.stat().st_mtime
+
+
+def _texts(passages: Union[List[Dict[str, Any]], PassageStore]) -> Iterable[str]:
+    if isinstance(passages, PassageStore):
+        return (passages.text(i) for i in range(len(passages)))
+    return (r["text"] for r in passages)
+
+
+def _load_lexical(passages: Union[List[Dict[str, Any]], PassageStore]) -> LexicalIndex:
+    """The BM25 index from build_index.py, or built in memory if it is missing or stale."""
+    if _is_current(LEXICAL_PATH):
+        lexical = LexicalIndex.load(LEXICAL_PATH)
+        if len(lexical) == len(passages):
+            return lexical
+    return LexicalIndex.build(_texts(passages))
+
+
+def _load_dupes(passages: Union[List[Dict[str, Any]], PassageStore]) -> np.ndarray:
+    """Near-duplicate clusters from build_index.py, or computed now if missing or stale."""
+    if _is_current(DUPES_PATH):
+        canonical = np.load(DUPES_PATH)
+        if len(canonical) == len(passages):
+            return canonical
+    return diversity.near_duplicates(_texts(passages))
+
+
+def is_loaded() -> bool:
+    return _filter_index is not None
+
+
+def preload(encode: bool = True) -> Dict[str, Any]:
+    """
+    Load everything `search` needs now instead of on the first request. `encode` also
+    runs one throwaway encode so the first real query doesn't pay torch's first-call
+    setup; skip it in a pre-fork master (see gunicorn_conf.py).
+    """
+    _load()
+    if default_mode() != "lexical":
+        _ensure_model()
+        if encode:
+            _encode_texts(["warm up"])
+    return {
+        "passages": len(_passages) if _passages is not None else 0,
+        "index_vectors": _index.ntotal if _index is not None else None,
+        "index_type": _index_spec.get("type"),
+        "lexical_terms": len(_lexical.vocab) if _lexical is not None else 0,
+        "near_duplicates": int((_canonical != np.arange(len(_canonical))).sum()) if _canonical is not None else 0,
+        "mode": default_mode(),
+    }
 
 
 def _encode_texts(texts: List[str]) -> np.ndarray:
     """SBERT encode + L2-normalize."""
-    assert _model is not None, "Embedding model not loaded"
-    vecs = _model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+    vecs = _ensure_model().encode(texts, convert_to_numpy=True, show_progress_bar=False)
     faiss.normalize_L2(vecs)
     return vecs
 
 
+def _encode_query(query: str) -> np.ndarray:
+    """Encode a single query as a (1, dim) array, going through the query-embedding cache."""
+    assert _query_cache is not None
+    vec = _query_cache.get(query)
+    if vec is None:
+        vec = _batcher.encode(query) if _batcher is not None else _encode_texts([query])[0]
+        _query_cache.put(query, vec)
+    return vec.reshape(1, -1)
+
+
+def batcher_stats() -> Dict[str, object]:
+    """Batch counters of the query-encode batcher."""
+    if _batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **_batcher.stats()}
+
+
+def pool_cache_stats() -> Dict[str, object]:
+    """Hit/miss/eviction counters of the ranked-pool cache."""
+    if _pool_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **_pool_cache.stats()}
+
+
+def cache_stats() -> Dict[str, object]:
+    """Hit/miss/eviction counters of the query-embedding cache."""
+    if _query_cache is None:
+        return {"backend": None, "size": 0, "hits": 0, "misses": 0, "evictions": 0, "hit_rate": 0.0}
+    return _query_cache.stats()
+
+
+def _build_filter_index(
+    passages: Union[List[Dict[str, Any]], PassageStore]
+) -> Dict[Tuple[str, str], np.ndarray]:
+    """
+    Inverted index from (unit, section) to sorted passage row ids.
+    Either side may be ANY, so unit-only and section-only lookups are single dict hits.
+    Passages without `unit`/`section` meta simply produce no keys.
+    """
+    metas: Iterable[Dict[str, Any]]
+    if isinstance(passages, PassageStore):
+        metas = passages.iter_meta()  # columnar, no text decoding
+    else:
+        metas = (r.get("meta", {}) for r in passages)
+
+    buckets: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for i, meta in enumerate(metas):
+        unit = meta.get("unit")
+        section = (meta.get("section") or "").lower()
+        if unit is not None:
+            buckets[(str(unit), ANY)].append(i)
+            if section:
+                buckets[(str(unit), section)].append(i)
+        if section:
+            buckets[(ANY, section)].append(i)
+    return {key: np.asarray(ids, dtype="int64") for key, ids in buckets.items()}
+
+
+def _filter(
+    unit: int | str | None, skills: list[str] | None
+) -> Tuple[Optional[np.ndarray], Optional[faiss.IDSelector]]:
+    """
+    Row ids (and a reusable FAISS selector) for passages matching `unit`/`skills`.
+    Returns (None, None) for "no filter", including when filtering removes everything
+    (e.g. build_index.py has not tagged unit/section).
+    """
+    if unit is None and not skills:
+        return None, None
+
+    assert _filter_index is not None
+    u = ANY if unit is None else str(unit)
+    sections = tuple(sorted({s.lower() for s in skills})) if skills else (ANY,)
+    sections = tuple(s for s in sections if (u, s) in _filter_index)
+    if not sections:
+        return None, None
+    key = (u, sections)
+    with _selectors_lock:
+        hit = _selectors.get(key)
+        if hit is not None:
+            _selectors.move_to_end(key)
+            return hit
+
+    parts = [_filter_index[(u, s)] for s in sections]
+    ids = parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+    result = (ids, faiss.IDSelectorBatch(ids))
+    with _selectors_lock:
+        _selectors[key] = result
+        while len(_selectors) > SELECTOR_CACHE_SIZE:
+            _selectors.popitem(last=False)
+    return result
+
+
+def _search_index(
+    q_vec: np.ndarray, n: int, ids: Optional[np.ndarray], sel: Optional[faiss.IDSelector]
+) -> List[int]:
+    """Top-`n` row ids from the FAISS index, restricted to `ids` (via `sel`) if given."""
+    assert _index is not None
+    if n <= 0:
+        return []
+    kind, spec_params = _index_spec["type"], _index_spec["params"]
+    if ids is not None and not index_types.supports_selector(kind):
+        # Index can't take a selector: over-fetch, then keep allowed rows
+        fetch = min(_index.ntotal, max(n * 10, 100))
+        _, found = _index.search(q_vec, fetch, params=index_types.search_parameters(kind, spec_params))
+        hits = found[0][np.isin(found[0], ids)]
+        if len(hits) < min(n, len(ids)) and fetch < _index.ntotal:
+            _, found = _index.search(q_vec, _index.ntotal)
+            hits = found[0][np.isin(found[0], ids)]
+        return [int(i) for i in hits[:n]]
+
+    _, found = _index.search(q_vec, n, params=index_types.search_parameters(kind, spec_params, sel))
+    hits = [int(i) for i in found[0] if i >= 0]
+    if ids is not None and len(hits) < min(n, len(ids)) and kind in ("ivf", "hnsw"):
+        # Selective filter starved the approximate search: widen it to the whole index
+        params = index_types.search_parameters(kind, spec_params, sel, exhaustive_n=_index.ntotal)
+        _, found = _index.search(q_vec, n, params=params)
+        hits = [int(i) for i in found[0] if i >= 0]
+    return hits
+
+
+def _search_bruteforce(q_vec: np.ndarray, n: int, ids: Optional[np.ndarray]) -> List[int]:
+    """Encode candidate texts and rank them; only used without a usable index."""
+    assert _passages is not None
+    rows = np.arange(len(_passages)) if ids is None else ids
+    cand_vecs = _encode_texts([_passages[i]["text"] for i in rows])
+    sims = cand_vecs @ q_vec[0]
+    order = np.argsort(-sims)[:n]
+    return [int(rows[i]) for i in order]
+
+
+def _dense_top(
+    query: str, n: int, ids: Optional[np.ndarray], sel: Optional[faiss.IDSelector]
+) -> List[int]:
+    """Top-`n` rows by cosine similarity to the query embedding."""
+    assert _passages is not None
+    q_vec = _encode_query(query)  # shape: (1, dim)
+    if _index is not None and _index.ntotal == len(_passages):
+        return _search_index(q_vec, n, ids, sel)
+    # No usable prebuilt index: encode the candidates on the fly
+    return _search_bruteforce(q_vec, n, ids)
+
+
+def _fuse(rankings: List[List[int]], n: int) -> List[int]:
+    """Reciprocal-rank fusion: rank-based, so BM25 and cosine scales need no calibration."""
+    scores: Dict[int, float] = defaultdict(float)
+    for ranked in rankings:
+        for rank, row in enumerate(ranked):
+            scores[row] += 1.0 / (RRF_K + rank + 1)
+    return sorted(scores, key=scores.__getitem__, reverse=True)[:n]
+
+
 def search(
     query: str,
     k: int = 6,
     unit: int | None = None,
     skills: list[str] | None = None,
     seed: int | None = None,
+    mode: str | None = None,
 ) -> List[Dict[str, Any]]:
     """
     Retrieve textbook passages for a query.
     - Filters by `unit` and `skills` (skills match the 'section' heuristic tag).
-    - Ranks by cosine similarity (dot product after L2 norm).
-    - Samples from a wider top-N (for variety) with an optional `seed`.
+    - Ranks by `mode` (see MODES): dense cosine similarity, BM25, or both fused.
+    - Picks `k` of a wider top-N by MMR over rank relevance plus random jitter, so
+      calls vary (reproducibly with a `seed`) but still favour the best-ranked rows.
     Returns passage dicts with keys: id, text, meta.
     """
+    mode = mode or default_mode()
+    if mode not in MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {MODES}")
     _load()
     assert _passages is not None
 
-    # 1) Pre-filter by unit/skill (section) if provided
-    candidates = _passages
-    if unit is not None:
-        candidates = [r for r in candidates if r.get("meta", {}).get("unit") == unit]
-
-    if skills:
-        want = {s.lower() for s in skills}
-        candidates = [
-            r
-            for r in candidates
-            if (r.get("meta", {}).get("section") or "").lower() in want
-        ]
-
-    # If filtering removed everything, fall back to the full set
-    if not candidates:
-        candidates = _passages
-
-    # 2) Encode candidate texts and the query
-    texts = [r["text"] for r in candidates]
-    cand_vecs = _encode_texts(texts)
-    q_vec = _encode_texts([query]).squeeze(0)  # shape: (dim,)
-
-    # 3) Rank by cosine similarity (dot product after normalization)
-    sims = cand_vecs @ q_vec  # (num_candidates,)
-    order = np.argsort(-sims)  # descending
-
-    # 4) Sample from a wider top-N for diversity
-    topN = min(20, len(order))  # tune N as you like
-    pool = [candidates[i] for i in order[:topN]]
-
-    if seed is not None:
-        random.seed(seed)
-    random.shuffle(pool)
-
-    # 5) Return top-k sampled passages
-    return pool[:k]
+    # 1-2) Ranked top-N pool, reused across calls for the same query and filters
+    key = _pool_key(query, unit, skills, mode)
+    cached = _pool_cache.get(key) if _pool_cache is not None else None
+    if cached is not None:
+        ids = cached.tolist()
+    else:
+        ids = _rank(query, unit, skills, mode)
+        if _pool_cache is not None:
+            _pool_cache.put(key, np.asarray(ids, dtype="int64"))
+
+    # 3) Jitter rank relevance for variety; a per-call RNG keeps seeded requests
+    #    reproducible when several run at once (no shared global state)
+    rng = random.Random(seed)
+    relevance = diversity.rank_relevance(len(ids)) + np.array(
+        [rng.uniform(0, RANK_JITTER) for _ in ids], dtype="float32"
+    )
+
+    # 4) Return k passages that are relevant and don't repeat each other
+    return [_passages[i] for i in _select(ids, k, relevance)]
+
+
+def _select(ids: List[int], k: int, relevance: np.ndarray) -> List[int]:
+    """`k` of the ranked rows, picked by MMR over their stored vectors when available."""
+    lam = float(os.getenv("RETRIEVER_MMR_LAMBDA", str(MMR_LAMBDA)))
+    vecs = _stored_vectors(ids) if lam < 1 and len(ids) > k else None
+    if vecs is None:
+        return [ids[j] for j in np.argsort(-relevance, kind="stable")[:k]]
+    return [ids[j] for j in diversity.mmr(vecs, k, lam, relevance)]
+
+
+def _stored_vectors(ids: List[int]) -> Optional[np.ndarray]:
+    """L2-normalized index vectors of `ids` (no encoding); None without a usable index."""
+    if _index is None or _passages is None or _index.ntotal != len(_passages):
+        return None
+    try:
+        vecs = _index.reconstruct_batch(np.asarray(ids, dtype="int64"))
+    except RuntimeError:
+        return None
+    faiss.normalize_L2(vecs)  # pq/sq8 reconstructions are approximate
+    return vecs
+
+
+def _dedupe(ids: List[int]) -> List[int]:
+    """Keep the best-ranked row of each near-duplicate cluster."""
+    if _canonical is None:
+        return ids
+    seen: set = set()
+    out = []
+    for i in ids:
+        c = int(_canonical[i])
+        if c not in seen:
+            seen.add(c)
+            out.append(i)
+    return out
+
+
+def _pool_key(query: str, unit: int | str | None, skills: list[str] | None, mode: str) -> str:
+    sections = ",".join(sorted({s.lower() for s in skills})) if skills else ANY
+    return f"{mode}|{ANY if unit is None else unit}|{sections}|{query}"
+
+
+def _rank(query: str, unit: int | str | None, skills: list[str] | None, mode: str) -> List[int]:
+    """Top-N passage rows for the query, after the unit/skill pre-filter."""
+    assert _passages is not None and _lexical is not None
+
+    # 1) Pre-filter by unit/skill (section) if provided -> candidate row ids
+    candidate_ids, selector = _filter(unit, skills)
+
+    # 2) Rank the candidates into a wider top-N pool; over-fetch so the pool is still
+    #    full after dropping near-duplicates
+    n_candidates = len(_passages) if candidate_ids is None else len(candidate_ids)
+    fetch = min(2 * TOP_N, n_candidates)
+    lexical = _lexical.top(query, fetch, candidate_ids) if mode != "dense" else []
+    if mode == "lexical" and lexical:
+        pool = _dedupe(lexical)[:TOP_N]
+        if len(pool) >= TOP_N or len(lexical) == n_candidates:
+            return pool
+        # Too few BM25 hits to pick k from: top up with the dense ranking
+        seen = set(pool)
+        dense = _dense_top(query, fetch, candidate_ids, selector)
+        return _dedupe(pool + [i for i in dense if i not in seen])[:TOP_N]
+    # Dense, hybrid, or a lexical query none of whose terms match the candidates
+    dense = _dense_top(query, fetch, candidate_ids, selector)
+    ranked = _fuse([dense, lexical], fetch) if lexical else dense
+    return _dedupe(ranked)[:TOP_N]
@@ -0,0 +1,99 @@
+# server/routes/attempts.py
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime, timezone
+import asyncio, uuid
+from .. import skill_model, supabase_client
+from ..supabase_client import attempts_table
+from ..write_behind import writes
+from ..quiz_schema import AttemptPayload, NextDifficultyRequest, NextDifficultyResponse
+
+router = APIRouter(prefix="/api", tags=["attempts"])
+
+# Stored attempts replayed when a (user, skill) isn't in the skill model yet
+HISTORY_LIMIT = 200
+
+_hydrating: dict[tuple[str, str], asyncio.Future] = {}
+# Attempts acknowledged while their (user, skill) row was still being hydrated; they are
+# applied, in order, right after the history it replays
+_deferred: dict[tuple[str, str], list[dict]] = {}
+
+def _loaded(key: tuple[str, str]) -> bool:
+    model = skill_model.model
+    return key in model and key not in model.stale and key not in _deferred
+
+async def _hydrate(user_id: str, skill: str) -> None:
+    """
+    Rebuild a (user, skill) row from history the first time this worker sees it, or
+    catch a row loaded from the snapshot up with the attempts stored after it.
+    """
+    key = (user_id, skill)
+    try:
+        stored = await run_in_threadpool(
+            supabase_client.get_store().select, attempts_table(), {"user_id": user_id, "skill": skill}, "created_at", HISTORY_LIMIT
+        )
+    except Exception as e:
+        print(f"[DEBUG] Reading stored attempts failed: {e}")
+        stored = []
+    # Nothing below awaits, so no attempt for this key can slip in between
+    deferred = _deferred.pop(key, [])
+    skip = {a["id"] for a in deferred}
+    pending = [a for a in writes.buffer(attempts_table()).pending(user_id=user_id, skill=skill) if a["id"] not in skip]
+    # skip rows flushed while we were reading
+    seen = skip | {a["id"] for a in pending}
+    history = [a for a in stored[::-1] if a.get("id") not in seen] + pending + deferred
+    if key not in skill_model.model:
+        skill_model.model.replay(user_id, skill, history)
+        print(f"[DEBUG] Skill model: loaded {user_id}/{skill} from {len(history)} attempts")
+    else:
+        # replay skips attempts the snapshot already counted
+        n = skill_model.model.replay(user_id, skill, history)
+        print(f"[DEBUG] Skill model: caught up {user_id}/{skill} with {n} attempts")
+
+def hydrate_in_background(user_id: str, skill: str) -> asyncio.Future:
+    """Start (or join) the hydration of a (user, skill) row."""
+    key = (user_id, skill)
+    fut = _hydrating.get(key)
+    if fut is None or fut.done():
+        fut = asyncio.ensure_future(_hydrate(user_id, skill))
+        _hydrating[key] = fut
+        fut.add_done_callback(lambda f: _hydrating.pop(key) if _hydrating.get(key) is f else None)
+    return fut
+
+async def ensure_loaded(user_id: str, skill: str) -> None:
+    """Wait until the (user, skill) row reflects its stored and acknowledged attempts."""
+    if not _loaded((user_id, skill)):
+        await asyncio.shield(hydrate_in_background(user_id, skill))
+
+@router.post("/attempts")
+async def log_attempt(payload: AttemptPayload):
+    # Acknowledge now; the row is stored with the next batch (see write_behind.py)
+    now = datetime.now(timezone.utc)
+    row = {
+        "id": str(uuid.uuid4()),
+        **payload.model_dump(),
+        "created_at": now.isoformat(),
+    }
+    writes.buffer(attempts_table()).add(row)
+    if payload.user_id:
+        key = (payload.user_id, payload.skill)
+        if _loaded(key):
+            skill_model.model.update(
+                payload.user_id, payload.skill, payload.is_correct, payload.time_ms, payload.hints, at=now.timestamp()
+            )
+        else:
+            # First attempt for this row in this worker: history is read in the background
+            # (no store round trip before the ack) and this attempt is applied after it
+            _deferred.setdefault(key, []).append(row)
+            hydrate_in_background(*key)
+    return {"ok": True, "id": row["id"]}
+
+@router.post("/next-difficulty", response_model=NextDifficultyResponse)
+async def next_difficulty(req: NextDifficultyRequest):
+    """
+    Difficulty (1-3) for the user's next questions in `skill`, answered from the
+    in-memory skill model (see skill_model.py).
+    """
+    await ensure_loaded(req.user_id, req.skill)
+    state = skill_model.model.get(req.user_id, req.skill)
+    return NextDifficultyResponse(skill=req.skill, **state)
@@ -38,3 +38,50 @@ def env_probe():
         "equal_after_clean": (raw == cleaned) if raw is not None else None,
         "MODEL_NAME": os.getenv("MODEL_NAME"),
     }
+
+@router.get("/retriever")
+def retriever_probe():
+    # Imported lazily so the debug router doesn't pull in torch/faiss on its own
+    try:
+        from ..retriever import batcher_stats, cache_stats, pool_cache_stats
+    except Exception as e:
+        return {"available": False, "error": str(e)}
+    return {
+        "available": True,
+        "query_embedding_cache": cache_stats(),
+        "query_encode_batcher": batcher_stats(),
+        "ranked_pool_cache": pool_cache_stats(),
+    }
+
+@router.get("/quiz-cache")
+def quiz_cache_probe():
+    from ..quiz_cache import get_cache
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@router.get("/item-bank")
+def item_bank_probe():
+    from ..item_bank import get_bank
+    return get_bank().stats()
+
+@router.get("/writes")
+def writes_probe():
+    from ..write_behind import writes
+    return writes.stats()
+
+@router.get("/skill-model")
+def skill_model_probe():
+    from ..skill_model import model, snapshot_path
+    return {"rows": len(model), "capacity": len(model.cols["attempts"]), "snapshot": str(snapshot_path())}
+
+@router.get("/generation")
+def generation_probe():
+    from ..quiz_validator import stats
+    return stats()
+
+@router.get("/db")
+def db_probe():
+    from ..supabase_client import health
+    return health(force=True)
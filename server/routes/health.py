@@ -1,30 +1,33 @@
 # server/routes/health.py
 from fastapi import APIRouter
-from openai import OpenAI, AuthenticationError, APIConnectionError, APIStatusError
-import os
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from .. import model_registry, supabase_client, warmup
 
 router = APIRouter(prefix="/api", tags=["health"])
 
 @router.get("/health")
-def health():
-    model = os.getenv("MODEL_NAME", "gpt-4o-mini")
-    api_key = os.getenv("OPENAI_API_KEY")
+async def health():
+    model = model_registry.configured_model()
 
-    if not api_key:
-        return {"status": "degraded", "openai_reachable": False, "model": model, "error": "OPENAI_API_KEY missing"}
+    # Served from the shared model cache (refreshed in the background), not a live probe
+    snap = await model_registry.snapshot()
+    # Cached DB ping (see supabase_client.health)
+    db = await run_in_threadpool(supabase_client.health)
+    db = {"ok": db["ok"], "backend": db.get("backend"), "error": db["error"]}
+    if snap.error:
+        return {"status": "degraded", "openai_reachable": False, "model": model, "error": snap.error, "db": db}
+    if model not in snap.models:
+        return {"status": "degraded", "openai_reachable": True, "model": model, "error": f"Model {model} not available", "db": db}
+    return {"status": "up", "openai_reachable": True, "model": model, "db": db}
 
-    try:
-        # Lightweight check (free): just verify the model exists for this key
-        client = OpenAI(api_key=api_key)
-        client.models.retrieve(model)
-        return {"status": "up", "openai_reachable": True, "model": model}
+@router.get("/live")
+def live():
+    # Liveness: the process is up and serving (restart only if this fails)
+    return {"status": "live"}
 
-    except AuthenticationError:
-        return {"status": "degraded", "openai_reachable": False, "model": model, "error": "Invalid OPENAI_API_KEY"}
-    except APIConnectionError as e:
-        return {"status": "degraded", "openai_reachable": False, "model": model, "error": f"Connection error: {e}"}
-    except APIStatusError as e:
-        # Covers 4xx/5xx from OpenAI; include status code for clarity
-        return {"status": "degraded", "openai_reachable": False, "model": model, "error": f"OpenAI error {e.status_code}"}
-    except Exception as e:
-        return {"status": "degraded", "openai_reachable": False, "model": model, "error": str(e)}
+@router.get("/ready")
+def ready():
+    # Readiness: preloading finished, safe to route traffic here (503 until then)
+    body = {"status": "ready" if warmup.state["ready"] else "starting", **warmup.state}
+    return JSONResponse(body, status_code=200 if warmup.state["ready"] else 503)
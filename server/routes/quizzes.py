@@ -1,19 +1,52 @@
 # server/routes/quizzes.py - Enhanced with better debugging and error handling
+from __future__ import annotations
 from fastapi import APIRouter, HTTPException
-from openai import OpenAI
-import os, json, uuid, traceback
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import os, json, uuid, traceback, asyncio
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable
+from .. import context_packer, http_pool, item_bank, model_registry, quiz_cache, quiz_validator
+from ..json_stream import ItemStreamParser
 from ..structured_schema import QUIZ_RESPONSE_FORMAT
-from ..quiz_schema import GenerateQuizPayload, BackendQuizResponse, QuizItem
+from ..quiz_schema import (
+    GenerateQuizPayload, BackendQuizResponse, QuizItem,
+    GenerateQuizBatchPayload, BatchQuizResult, BankItemsRequest,
+    SaveQuizRequest, SaveQuizResponse,
+)
+from ..supabase_client import quizzes_table
+from ..write_behind import writes
+from datetime import datetime, timezone
 
-# Safe retriever import
-try:
-    from ..retriever import search as rag_search
-except Exception:
-    rag_search = None
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Safe retriever import, deferred to first use: it pulls in sentence-transformers/torch/
+# faiss, seconds of import time that worker boot (and /api/ready preloading) shouldn't wait on
+_rag_search = None
+
+def get_rag_search():
+    global _rag_search
+    if _rag_search is None:
+        try:
+            from ..retriever import search
+            _rag_search = search
+        except Exception as e:
+            print(f"[DEBUG] Retriever unavailable: {e}")
+            _rag_search = False
+    return _rag_search or None
 
 router = APIRouter(prefix="/api/quizzes", tags=["quizzes"])
 
-def get_openai_client() -> OpenAI:
+# Sampling settings for quiz generation (part of the quiz cache key)
+LLM_SETTINGS = {"temperature": 0.7, "max_tokens": 2000}  # max_tokens: ensure we get complete responses
+
+DIFFICULTY_LABELS = {
+    1: "easy (short, familiar words; one clear correct answer)",
+    2: "medium (standard Grade 6 level)",
+    3: "hard (longer sentences, closer distractors, less common vocabulary)",
+}
+
+def get_openai_client() -> AsyncOpenAI:
     api_key = os.getenv("OPENAI_API_KEY")
     print(f"[DEBUG] API Key present: {'Yes' if api_key and api_key.startswith('sk-') else 'No'}")
     print(f"[DEBUG] API Key length: {len(api_key) if api_key else 0}")
@@ -23,169 +56,211 @@ def get_openai_client() -> OpenAI:
     if not api_key.startswith('sk-'):
         raise HTTPException(status_code=500, detail="OPENAI_API_KEY format appears invalid")
     
-    return OpenAI(api_key=api_key)
+    # Process-wide client on the shared keep-alive pool (see http_pool.py)
+    return http_pool.get_openai_client(api_key)
 
-def resolve_model(client: OpenAI) -> tuple[str, str]:
-    configured = os.getenv("MODEL_NAME", "gpt-4o-mini")
-    print(f"[DEBUG] Configured model: {configured}")
-    
-    try:
-        model_info = client.models.retrieve(configured)
-        print(f"[DEBUG] Model validation successful: {model_info.id}")
-        return configured, "configured"
-    except Exception as e:
-        print(f"[DEBUG] Model validation failed: {e}")
-        # Try fallback model
-        try:
-            fallback = "gpt-4o-mini"
-            client.models.retrieve(fallback)
-            print(f"[DEBUG] Using fallback model: {fallback}")
-            return fallback, "fallback"
-        except Exception as e2:
-            print(f"[DEBUG] Fallback model also failed: {e2}")
-            # Try another common model
-            try:
-                gpt35 = "gpt-3.5-turbo"
-                client.models.retrieve(gpt35)
-                print(f"[DEBUG] Using GPT-3.5-turbo as last resort")
-                return gpt35, "last_resort"
-            except Exception as e3:
-                print(f"[DEBUG] All models failed: {e3}")
-                raise HTTPException(status_code=500, detail="No available OpenAI models")
+async def resolve_model() -> tuple[str, str]:
+    """Pick the model from the shared TTL cache (no per-request models.retrieve)."""
+    print(f"[DEBUG] Configured model: {model_registry.configured_model()}")
+    return await model_registry.resolve()
 
-@router.post("/generate")
-def generate_quiz(payload: GenerateQuizPayload):
-    print(f"[DEBUG] Received payload: {payload}")
-    
-    # Normalize inputs
+def normalize_payload(payload: GenerateQuizPayload) -> tuple[int, list[str], str, str | None]:
+    """(count, skills, query_text, unit) with the legacy-field fallbacks applied."""
     count = payload.count or payload.num_questions or 6
     skills = payload.skills or ["grammar"]
     query_text = payload.query or payload.topic or "PSAC Grade 6 English"
-    unit = payload.unit
-    
-    print(f"[DEBUG] Normalized - count: {count}, skills: {skills}, query: {query_text}, unit: {unit}")
+    return count, skills, query_text, payload.unit
 
+
+def retrieve_passages(
+    query_text: str, unit, skills: list[str], seed: int | None, keywords: list[str] | None = None
+) -> list:
+    """RAG call (optional): returns [] if the retriever is unavailable or fails."""
+    rag_search = get_rag_search()
+    if not rag_search:
+        return []
+    # Keywords are exact terms the lexical ranking can match on
+    query = " ".join([query_text, *(keywords or [])])
     try:
-        # Test OpenAI client creation
-        client = get_openai_client()
-        print("[DEBUG] OpenAI client created successfully")
-        
-        # Test model resolution
-        model, resolved_from = resolve_model(client)
-        print(f"[DEBUG] Model resolved: {model} (from: {resolved_from})")
-        
+        passages = rag_search(query=query, k=6, unit=unit, skills=skills, seed=seed)
+        print(f"[DEBUG] RAG retrieved {len(passages)} passages")
+        return passages
     except Exception as e:
-        print(f"[DEBUG] Client/Model setup failed: {e}")
-        print(f"[DEBUG] Full traceback: {traceback.format_exc()}")
-        return create_fallback_response(count, f"OpenAI setup failed: {str(e)}")
+        print(f"[DEBUG] RAG retrieval failed: {e}")
+        return []
 
-    # RAG call (optional)
-    passages = []
-    if rag_search:
-        try:
-            passages = rag_search(query=query_text, k=6, unit=unit, skills=skills, seed=payload.seed)
-            print(f"[DEBUG] RAG retrieved {len(passages)} passages")
-        except Exception as e:
-            print(f"[DEBUG] RAG retrieval failed: {e}")
 
-    # Prepare OpenAI request
-    try:
-        system_prompt = (
-            "You are a PSAC Grade 6 English quiz generator for Mauritius students. "
-            "Generate quiz questions that are appropriate for Grade 6 level. "
-            "Return ONLY valid JSON in this exact format: "
-            '{"items": [{"id": "q1", "type": "mcq", "question": "What is the past tense of \'go\'?", "options": ["went", "goes", "going", "gone"], "answer": 0, "explanation": "The past tense of \'go\' is \'went\'"}]}'
-        )
-        
-        user_prompt = (
-            f"Generate {count} quiz questions for Grade 6 English students in Mauritius (PSAC level). "
-            f"Focus on these skills: {', '.join(skills)}. "
-            f"Topic/Unit: {query_text} (Unit {unit}). "
-            f"Keywords to include: {', '.join(payload.keywords or [])}. "
-            f"Make questions appropriate for Grade 6 level and relevant to Mauritius PSAC curriculum."
+def build_prompts(payload: GenerateQuizPayload, context: str = "") -> tuple[str, str]:
+    """(system_prompt, user_prompt) for one quiz request; `context` is the packed passages."""
+    count, skills, query_text, unit = normalize_payload(payload)
+    system_prompt = (
+        "You are a PSAC Grade 6 English quiz generator for Mauritius students. "
+        "Generate quiz questions that are appropriate for Grade 6 level. "
+        "Return ONLY valid JSON in this exact format: "
+        '{"items": [{"id": "q1", "type": "mcq", "question": "What is the past tense of \'go\'?", "options": ["went", "goes", "going", "gone"], "answer": 0, "explanation": "The past tense of \'go\' is \'went\'"}]}'
+    )
+
+    user_prompt = (
+        f"Generate {count} quiz questions for Grade 6 English students in Mauritius (PSAC level). "
+        f"Focus on these skills: {', '.join(skills)}. "
+        f"Topic/Unit: {query_text} (Unit {unit}). "
+        f"Keywords to include: {', '.join(payload.keywords or [])}. "
+        f"Make questions appropriate for Grade 6 level and relevant to Mauritius PSAC curriculum."
+    )
+    if payload.difficulty:
+        user_prompt += f" Difficulty: {DIFFICULTY_LABELS[payload.difficulty]}."
+    if context:
+        user_prompt += (
+            "\n\nBase the questions on these passages from the PSAC Grade 6 textbook "
+            "(passage ids in brackets):\n" + context
         )
-        
-        print(f"[DEBUG] System prompt length: {len(system_prompt)}")
-        print(f"[DEBUG] User prompt: {user_prompt[:200]}...")
-        
-        # Make OpenAI API call
-        print("[DEBUG] Making OpenAI API call...")
-        chat = client.chat.completions.create(
+    return system_prompt, user_prompt
+
+
+def pack_context(payload: GenerateQuizPayload, passages: list) -> context_packer.PackedContext:
+    """Retrieved passages -> prompt context within CONTEXT_TOKEN_BUDGET."""
+    _, _, query_text, _ = normalize_payload(payload)
+    context = context_packer.pack(passages, query=" ".join([query_text, *(payload.keywords or [])]))
+    print(f"[DEBUG] Context: {len(context.ids)}/{len(passages)} passages, {context.tokens} tokens, ids: {context.ids}")
+    return context
+
+
+def normalize_item(i: int, q: dict) -> QuizItem:
+    """One raw LLM item -> QuizItem (raises if it can't be validated)."""
+    # Ensure required fields
+    q_id = q.get("id", f"ai_q_{i+1}")
+    q_type = q.get("type", "mcq")
+    question = q.get("question") or q.get("prompt", f"Question {i+1}")
+    options = q.get("options", [])
+    answer = q.get("answer", 0)
+    explanation = q.get("explanation", "No explanation provided")
+
+    return QuizItem(
+        id=q_id,
+        type=q_type,
+        question=question,
+        options=options,
+        answer=answer,
+        explanation=explanation
+    )
+
+
+# STRUCTURED_OUTPUT=0 turns off the strict JSON schema; QUIZ_TOPUP_ROUNDS (default 1) bounds
+# the follow-up calls that ask only for items missing after validation
+def structured_output_enabled() -> bool:
+    return os.getenv("STRUCTURED_OUTPUT", "1") != "0"
+
+# Models that rejected the json_schema response_format (older snapshots): plain JSON for them
+_no_structured_output: set[str] = set()
+
+def _rejects_response_format(e: Exception) -> bool:
+    return getattr(e, "status_code", None) == 400 and "response_format" in str(e)
+
+async def create_completion(client: AsyncOpenAI, model: str, system_prompt: str, user_prompt: str, **extra):
+    """chat.completions.create with the strict quiz schema when the model supports it."""
+    settings = dict(LLM_SETTINGS)
+    if structured_output_enabled() and model not in _no_structured_output:
+        settings["response_format"] = QUIZ_RESPONSE_FORMAT
+    try:
+        return await client.chat.completions.create(
             model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            temperature=0.7,
-            max_tokens=2000  # Ensure we get complete responses
+            **settings,
+            **extra
         )
-        
-        print("[DEBUG] OpenAI API call successful")
-        content = chat.choices[0].message.content.strip()
-        print(f"[DEBUG] Raw OpenAI response length: {len(content)}")
-        print(f"[DEBUG] Raw OpenAI response preview: {content[:300]}...")
-        
-        # Parse JSON response
-        try:
-            data = json.loads(content)
-            print(f"[DEBUG] JSON parsing successful, keys: {list(data.keys())}")
-        except json.JSONDecodeError as e:
-            print(f"[DEBUG] JSON parsing failed: {e}")
-            print(f"[DEBUG] Full content that failed: {repr(content)}")
-            return create_fallback_response(count, f"Invalid JSON from OpenAI: {str(e)}")
-
-        # Extract quiz items
-        quiz_items = []
-        if "items" in data:
-            quiz_items = data["items"]
-        elif "questions" in data:
-            quiz_items = data["questions"]
-        elif isinstance(data, list):
-            quiz_items = data
-        else:
-            print(f"[DEBUG] Unexpected data structure: {data}")
-            return create_fallback_response(count, f"Unexpected response structure from OpenAI")
-
-        print(f"[DEBUG] Extracted {len(quiz_items)} quiz items")
-        
-        # Normalize quiz items
-        normalized_items = []
-        for i, q in enumerate(quiz_items):
+    except Exception as e:
+        if "response_format" in settings and _rejects_response_format(e):
+            print(f"[DEBUG] {model} rejected structured output, retrying as plain JSON: {e}")
+            _no_structured_output.add(model)
+            return await create_completion(client, model, system_prompt, user_prompt, **extra)
+        # Model vanished since the last list: skip it until the negative TTL passes
+        model_registry.note_error(model, e)
+        raise
+
+
+def topup_prompt(user_prompt: str, missing: int, have: list[QuizItem]) -> str:
+    """Ask for only the `missing` items, without repeating the ones we already kept."""
+    asked = "\n".join(f"- {item.question}" for item in have)
+    return (
+        f"{user_prompt}\n\nOnly {missing} more question(s) are needed. "
+        f"Do not repeat any of these questions:\n{asked}"
+    )
+
+
+async def generate_items(
+    client: AsyncOpenAI,
+    model: str,
+    payload: GenerateQuizPayload,
+    passages: list,
+) -> BackendQuizResponse:
+    """
+    Prompt the LLM for one quiz and keep every item that is (or can be repaired to be)
+    answerable; only the shortfall is requested again, up to QUIZ_TOPUP_ROUNDS times.
+    Fallback items only when no usable item comes back at all (a failed top-up call
+    returns the items already kept).
+    """
+    count, skills, query_text, unit = normalize_payload(payload)
+
+    # Prepare OpenAI request
+    try:
+        context = pack_context(payload, passages)
+        system_prompt, user_prompt = build_prompts(payload, context.text)
+
+        print(f"[DEBUG] System prompt length: {len(system_prompt)}")
+        print(f"[DEBUG] User prompt: {user_prompt[:200]}...")
+
+        items: list[QuizItem] = []
+        prompt = user_prompt
+        rounds = int(os.getenv("QUIZ_TOPUP_ROUNDS", "1"))
+        for attempt in range(rounds + 1):
+            if attempt:
+                print(f"[DEBUG] Requesting {count - len(items)} missing items (round {attempt})")
+                quiz_validator.record(topup_calls=1)
+            # Make OpenAI API call
+            print("[DEBUG] Making OpenAI API call...")
             try:
-                # Ensure required fields
-                q_id = q.get("id", f"ai_q_{i+1}")
-                q_type = q.get("type", "mcq")
-                question = q.get("question") or q.get("prompt", f"Question {i+1}")
-                options = q.get("options", [])
-                answer = q.get("answer", 0)
-                explanation = q.get("explanation", "No explanation provided")
-                
-                item = QuizItem(
-                    id=q_id,
-                    type=q_type,
-                    question=question,
-                    options=options,
-                    answer=answer,
-                    explanation=explanation
-                )
-                normalized_items.append(item)
-                print(f"[DEBUG] Normalized item {i+1}: {item.question[:50]}...")
-                
+                chat = await create_completion(client, model, system_prompt, prompt)
             except Exception as e:
-                print(f"[DEBUG] Failed to normalize item {i}: {e}")
-                print(f"[DEBUG] Problematic item: {q}")
-                continue
+                if not items:
+                    raise
+                # A failed top-up keeps what earlier rounds produced
+                print(f"[DEBUG] Top-up call failed, returning {len(items)} items: {e}")
+                break
+            print("[DEBUG] OpenAI API call successful")
+            content = (chat.choices[0].message.content or "").strip()
+            print(f"[DEBUG] Raw OpenAI response length: {len(content)}")
+            print(f"[DEBUG] Raw OpenAI response preview: {content[:300]}...")
 
-        if not normalized_items:
+            # Parse (salvaging complete items from truncated output), repair, validate
+            raw_items = quiz_validator.parse_items(content)
+            kept, dropped = quiz_validator.check(raw_items, normalize_item, start=len(items))
+            seen = {item.question for item in items}
+            for item in kept:
+                if item.question in seen:
+                    continue
+                seen.add(item.question)
+                item.id = f"q{len(items) + 1}"
+                items.append(item)
+            print(f"[DEBUG] Extracted {len(raw_items)} quiz items, kept {len(kept)}, dropped {dropped}")
+            if len(items) >= count:
+                break
+            prompt = topup_prompt(user_prompt, count - len(items), items)
+
+        if not items:
             print("[DEBUG] No items could be normalized")
+            quiz_validator.record(fallbacks=1)
             return create_fallback_response(count, "Failed to normalize any quiz items")
 
-        final_items = normalized_items[:count]
+        final_items = items[:count]
         print(f"[DEBUG] Returning {len(final_items)} items, source: llm")
-        
+
         return BackendQuizResponse(
             items=final_items,
-            source="llm"
+            source="llm",
+            passage_ids=context.ids,
         )
 
     except Exception as e:
@@ -193,6 +268,278 @@ def generate_quiz(payload: GenerateQuizPayload):
         print(f"[DEBUG] Full traceback: {traceback.format_exc()}")
         return create_fallback_response(count, f"OpenAI request failed: {str(e)}")
 
+async def cached_generate(
+    client: AsyncOpenAI,
+    model: str,
+    payload: GenerateQuizPayload,
+    get_passages: Callable[[], Awaitable[list]],
+) -> BackendQuizResponse:
+    """
+    generate_items behind the quiz cache (see quiz_cache.py). Seeded requests are keyed
+    on the retrieved passage ids; unseeded ones share a pool of variants per prompt, so a
+    hit skips retrieval as well as the LLM call.
+    """
+    cache = quiz_cache.get_cache()
+    if cache is None:
+        return await generate_items(client, model, payload, await get_passages())
+
+    prompts = build_prompts(payload)
+
+    async def generate(key: str, passages: list) -> BackendQuizResponse:
+        quiz = await generate_items(client, model, payload, passages)
+        if quiz.source == "llm":  # never cache fallbacks
+            await run_in_threadpool(cache.put, key, quiz.model_dump())
+        return quiz
+
+    if payload.seed is not None:
+        passages = await get_passages()
+        key = quiz_cache.make_key(model, prompts, [p["id"] for p in passages], **LLM_SETTINGS)
+        hit = await run_in_threadpool(cache.get, key)
+        if hit is not None:
+            print(f"[DEBUG] Quiz cache hit (seeded) {key[:12]}")
+            return BackendQuizResponse(**hit)
+        return await cache.coalesce(key, lambda: generate(key, passages))
+
+    key = quiz_cache.make_key(model, prompts, **LLM_SETTINGS)
+
+    async def generate_variant() -> BackendQuizResponse:
+        return await generate(key, await get_passages())
+
+    hit = await run_in_threadpool(cache.get, key)
+    if hit is None:
+        return await cache.coalesce(key, generate_variant)
+    if await run_in_threadpool(cache.variants, key) < cache.pool_size:
+        cache.grow_in_background(key, generate_variant)
+    print(f"[DEBUG] Quiz cache hit (pool) {key[:12]}")
+    return BackendQuizResponse(**hit)
+
+
+async def setup_client() -> tuple[AsyncOpenAI, str]:
+    """OpenAI client + resolved model name; raises if either can't be set up."""
+    # Test OpenAI client creation
+    client = get_openai_client()
+    print("[DEBUG] OpenAI client created successfully")
+    
+    # Test model resolution
+    model, resolved_from = await resolve_model()
+    print(f"[DEBUG] Model resolved: {model} (from: {resolved_from})")
+    return client, model
+
+
+@router.post("/generate")
+async def generate_quiz(payload: GenerateQuizPayload):
+    print(f"[DEBUG] Received payload: {payload}")
+    
+    # Normalize inputs
+    count, skills, query_text, unit = normalize_payload(payload)
+    
+    print(f"[DEBUG] Normalized - count: {count}, skills: {skills}, query: {query_text}, unit: {unit}")
+
+    try:
+        client, model = await setup_client()
+    except Exception as e:
+        print(f"[DEBUG] Client/Model setup failed: {e}")
+        print(f"[DEBUG] Full traceback: {traceback.format_exc()}")
+        return create_fallback_response(count, f"OpenAI setup failed: {str(e)}")
+
+    # Retrieval is CPU-bound (SBERT/FAISS): keep it off the event loop
+    async def get_passages() -> list:
+        return await run_in_threadpool(retrieve_passages, query_text, unit, skills, payload.seed, payload.keywords)
+
+    return await cached_generate(client, model, payload, get_passages)
+
+def sse(event: str, data) -> str:
+    """One server-sent event frame (data is JSON)."""
+    body = data if isinstance(data, str) else json.dumps(data)
+    return f"event: {event}\ndata: {body}\n\n"
+
+
+async def stream_items(
+    client: AsyncOpenAI,
+    model: str,
+    payload: GenerateQuizPayload,
+    context: context_packer.PackedContext,
+) -> AsyncIterator[QuizItem]:
+    """
+    Streamed completion -> validated QuizItems (ids q1, q2, ...), each yielded as soon as
+    its JSON closes. Items go through quiz_validator.check like generate_items' do.
+    """
+    system_prompt, user_prompt = build_prompts(payload, context.text)
+    stream = await create_completion(client, model, system_prompt, user_prompt, stream=True)
+
+    parser = ItemStreamParser()
+    seen: set[str] = set()
+    finished = False
+    try:
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            for raw in parser.feed(delta):
+                kept, _ = quiz_validator.check([raw], normalize_item, start=len(seen))
+                for item in kept:
+                    if item.question in seen:
+                        continue
+                    seen.add(item.question)
+                    item.id = f"q{len(seen)}"
+                    yield item
+        finished = True
+    finally:
+        quiz_validator.record_stream(parser, len(seen), finished)
+        # Stop the upstream generation if the client left or we have enough items
+        await stream.close()
+
+
+@router.post("/generate/stream")
+async def generate_quiz_stream(payload: GenerateQuizPayload):
+    """
+    Like /generate, but streams each item as a server-sent event the moment the model
+    finishes writing it, so the first question renders long before the full quiz:
+      event: item  data: QuizItem
+      event: done  data: {"count": n, "source": "llm" | "fallback (...)", "passage_ids": [...]}
+    If the stream fails partway, fallback items fill up the remaining count.
+    """
+    count, skills, query_text, unit = normalize_payload(payload)
+    print(f"[DEBUG] Streaming {count} items, skills: {skills}, query: {query_text}, unit: {unit}")
+
+    async def events():
+        sent = 0
+        try:
+            client, model = await setup_client()
+            passages = await run_in_threadpool(
+                retrieve_passages, query_text, unit, skills, payload.seed, payload.keywords
+            )
+            context = pack_context(payload, passages)
+            items = stream_items(client, model, payload, context)
+            try:
+                async for item in items:
+                    yield sse("item", item.model_dump_json())
+                    sent += 1
+                    if sent >= count:
+                        break
+            finally:
+                await items.aclose()
+            if not sent:
+                raise ValueError("No valid quiz items in response")
+            print(f"[DEBUG] Streamed {sent} items, source: llm")
+            yield sse("done", {"count": sent, "source": "llm", "passage_ids": context.ids})
+        except Exception as e:
+            print(f"[DEBUG] Streaming generation failed after {sent} items: {e}")
+            fallback = create_fallback_response(count - sent, f"OpenAI stream failed: {str(e)}")
+            for item in fallback.items or []:
+                yield sse("item", item.model_dump_json())
+            yield sse("done", {"count": sent + len(fallback.items or []), "source": fallback.source})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/generate-batch")
+async def generate_quiz_batch(batch: GenerateQuizBatchPayload):
+    """
+    Generate several quizzes in one call (e.g. one per unit for a class set).
+    Client/model setup and identical retrievals are shared across the batch, LLM calls
+    run concurrently up to `concurrency`, and each quiz is streamed back as NDJSON
+    ({"index": i, "quiz": {...}}) in completion order.
+    """
+    limit = batch.concurrency or int(os.getenv("QUIZ_BATCH_CONCURRENCY", "4"))
+    print(f"[DEBUG] Batch of {len(batch.requests)} quizzes, concurrency {limit}")
+
+    try:
+        client, model = await setup_client()
+        setup_error = None
+    except Exception as e:
+        print(f"[DEBUG] Client/Model setup failed: {e}")
+        client, model, setup_error = None, None, f"OpenAI setup failed: {str(e)}"
+
+    async def stream():
+        # One retrieval per distinct (query, unit, skills, seed)
+        retrievals: dict[tuple, asyncio.Task] = {}
+        semaphore = asyncio.Semaphore(limit)
+
+        async def one(i: int, payload: GenerateQuizPayload) -> BatchQuizResult:
+            count, skills, query_text, unit = normalize_payload(payload)
+            if setup_error:
+                return BatchQuizResult(index=i, quiz=create_fallback_response(count, setup_error))
+            key = (query_text, unit, tuple(skills), payload.seed, tuple(payload.keywords or []))
+
+            async def get_passages() -> list:
+                if key not in retrievals:
+                    retrievals[key] = asyncio.ensure_future(
+                        run_in_threadpool(
+                            retrieve_passages, query_text, unit, skills, payload.seed, payload.keywords
+                        )
+                    )
+                return await retrievals[key]
+
+            async with semaphore:
+                quiz = await cached_generate(client, model, payload, get_passages)
+            return BatchQuizResult(index=i, quiz=quiz)
+
+        tasks = [asyncio.ensure_future(one(i, p)) for i, p in enumerate(batch.requests)]
+        try:
+            for done in asyncio.as_completed(tasks):
+                result = await done
+                print(f"[DEBUG] Batch item {result.index} done, source: {result.quiz.source}")
+                yield result.model_dump_json() + "\n"
+        finally:
+            # Client went away mid-stream: don't keep paying for LLM calls
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post("/bank/next")
+async def next_bank_items(req: BankItemsRequest):
+    """
+    Next pre-generated items for a (unit, skill, difficulty) bucket, popped from the
+    item bank (see item_bank.py). A cold or drained bucket is topped up with a live
+    LLM call for the shortfall and queued for a background refill.
+    """
+    b = item_bank.bucket(req.unit, req.skill, req.difficulty)
+    error = item_bank.known_bucket_error(b)
+    if error:
+        # each new bucket costs background LLM refills: only bank known skills/units
+        raise HTTPException(status_code=400, detail=error)
+    bank = item_bank.get_bank()
+    items = await bank.pop(b, req.count)
+    print(f"[DEBUG] Bank {b}: served {len(items)}/{req.count}")
+    if len(items) == req.count:
+        return BackendQuizResponse(items=items, source="bank")
+
+    payload = GenerateQuizPayload(
+        count=req.count - len(items), skills=[req.skill], unit=req.unit, difficulty=req.difficulty
+    )
+    try:
+        client, model = await setup_client()
+    except Exception as e:
+        print(f"[DEBUG] Client/Model setup failed: {e}")
+        if items:
+            return BackendQuizResponse(items=items, source="bank")
+        return create_fallback_response(req.count, f"OpenAI setup failed: {str(e)}")
+
+    count, skills, query_text, unit = normalize_payload(payload)
+    passages = await run_in_threadpool(retrieve_passages, query_text, unit, skills, None, payload.keywords)
+    live = await generate_items(client, model, payload, passages)
+    if live.source != "llm":
+        return BackendQuizResponse(items=items, source="bank") if items else live
+    fresh = [i for i in live.items or [] if item_bank.validate_item(i)]
+    return BackendQuizResponse(items=items + fresh, source="bank+llm" if items else "llm")
+
+@router.post("/save", response_model=SaveQuizResponse)
+async def save_quiz(req: SaveQuizRequest):
+    # Id is assigned here so the client can use it right away; the row is written
+    # with the next batch (see write_behind.py)
+    quiz_id = str(req.quiz.get("id") or uuid.uuid4())
+    writes.buffer(quizzes_table()).add({
+        "id": quiz_id,
+        "quiz": req.quiz,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    })
+    return SaveQuizResponse(id=quiz_id)
+
 def create_fallback_response(count: int, error_reason: str) -> BackendQuizResponse:
     """Create fallback response with debugging info"""
     print(f"[DEBUG] Creating fallback response, reason: {error_reason}")
@@ -0,0 +1,332 @@
+# server/skill_model.py
+"""
+In-memory adaptive-difficulty state per (user_id, skill).
+
+Each attempt updates a row of running aggregates in O(1): attempt/correct counts,
+EWMA accuracy and response time, a decayed hint count and the current level. The
+next-difficulty route reads the row instead of querying question history.
+
+Rows live in parallel numpy arrays (one slot per student/skill, grown by doubling),
+so a school's worth of students is a few hundred KB. The arrays are snapshotted to an
+.npz file periodically and at shutdown, and reloaded at startup. A pair missing from
+memory (new worker, lost snapshot) is rebuilt once from stored attempts; a row loaded
+from a snapshot is caught up once with the stored attempts newer than its `updated_at`.
+
+Rules (ADAPTIVE_DIFFICULTY_README.md), applied once MIN_ATTEMPTS attempts have been
+seen since the last level change:
+  up one level    accuracy > 85% and avg time < 20s
+  down one level  accuracy < 50% or more than 3 recent hints
+Levels stay within 1-3.
+
+Each worker holds its own model and all workers share the snapshot file: saves take
+a file lock and merge with what is on disk, keeping the most recently updated version
+of each row, so one worker's snapshot never discards another's students. Route a
+student to the same worker for the live counts to see every attempt.
+
+Env:
+  SKILL_EWMA_ALPHA     weight of the newest attempt   (default: 0.2, ~ last 10 attempts)
+  SKILL_SNAPSHOT_PATH  snapshot file                  (default: server/data/skill_model.npz)
+  SKILL_SNAPSHOT_S     snapshot interval              (default: 60)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker dev servers only
+    fcntl = None
+
+DEFAULT_PATH = Path(__file__).parent / "data" / "skill_model.npz"
+
+MIN_LEVEL, MAX_LEVEL, START_LEVEL = 1, 3, 2
+MIN_ATTEMPTS = 3
+UP_ACCURACY, UP_TIME_S = 0.85, 20.0
+DOWN_ACCURACY, DOWN_HINTS = 0.5, 3.0
+
+# name -> dtype of the per-row arrays
+COLUMNS = {
+    "attempts": np.int32,
+    "correct": np.int32,
+    "acc": np.float32,  # EWMA accuracy (0-1)
+    "time_s": np.float32,  # EWMA response time, NaN until a timed attempt
+    "hints": np.float32,  # hints, decayed by (1 - alpha) per attempt
+    "hints_total": np.int32,
+    "level": np.int8,
+    "since_change": np.int16,  # attempts since the level last moved
+    "updated_at": np.float64,  # epoch seconds of the newest attempt folded in
+}
+
+
+def attempt_time(att: Dict[str, Any]) -> float:
+    """Epoch seconds of a stored attempt's created_at (0 if missing or unparsable)."""
+    try:
+        return datetime.fromisoformat(str(att["created_at"]).replace("Z", "+00:00")).timestamp()
+    except (KeyError, ValueError):
+        return 0.0
+
+
+class SkillModel:
+    def __init__(self, alpha: float = 0.2, capacity: int = 1024):
+        self.alpha = alpha
+        self.rows: Dict[Tuple[str, str], int] = {}
+        self.cols: Dict[str, np.ndarray] = {}
+        self._alloc(capacity)
+        self.stale: set = set()  # keys loaded from a snapshot, not yet caught up
+        self.dirty = False
+
+    def _alloc(self, capacity: int) -> None:
+        n = len(self.rows)
+        for name, dtype in COLUMNS.items():
+            col = np.zeros(capacity, dtype=dtype)
+            if name in self.cols:
+                col[:n] = self.cols[name][:n]
+            self.cols[name] = col
+
+    def _row(self, user_id: str, skill: str) -> int:
+        key = (user_id, skill)
+        i = self.rows.get(key)
+        if i is None:
+            i = len(self.rows)
+            if i == len(self.cols["attempts"]):
+                self._alloc(2 * i)
+            self.rows[key] = i
+            self.cols["level"][i] = START_LEVEL
+            self.cols["time_s"][i] = np.nan
+        return i
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self.rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def update(
+        self,
+        user_id: str,
+        skill: str,
+        is_correct: bool,
+        time_ms: Optional[int] = None,
+        hints: int = 0,
+        at: Optional[float] = None,
+    ) -> int:
+        """Fold one attempt (made at epoch `at`, default now) into the (user, skill) row; returns the level."""
+        c = self.cols
+        i = self._row(user_id, skill)
+        a = self.alpha
+        first = c["attempts"][i] == 0
+        c["attempts"][i] += 1
+        c["correct"][i] += int(is_correct)
+        c["acc"][i] = float(is_correct) if first else (1 - a) * c["acc"][i] + a * float(is_correct)
+        if time_ms is not None:
+            t = time_ms / 1000
+            c["time_s"][i] = t if np.isnan(c["time_s"][i]) else (1 - a) * c["time_s"][i] + a * t
+        c["hints"][i] = (1 - a) * c["hints"][i] + (hints or 0)
+        c["hints_total"][i] += hints or 0
+        c["since_change"][i] = min(c["since_change"][i] + 1, np.iinfo(np.int16).max)
+        c["updated_at"][i] = max(c["updated_at"][i], time.time() if at is None else at)
+
+        if c["since_change"][i] >= MIN_ATTEMPTS:
+            level = int(c["level"][i])
+            if c["acc"][i] > UP_ACCURACY and c["time_s"][i] < UP_TIME_S:  # NaN time never levels up
+                level = min(level + 1, MAX_LEVEL)
+            elif c["acc"][i] < DOWN_ACCURACY or c["hints"][i] > DOWN_HINTS:
+                level = max(level - 1, MIN_LEVEL)
+            if level != c["level"][i]:
+                c["level"][i] = level
+                c["since_change"][i] = 0
+        self.dirty = True
+        return int(c["level"][i])
+
+    def replay(self, user_id: str, skill: str, attempts: Iterable[Dict[str, Any]]) -> int:
+        """
+        Fold stored attempts (oldest first) into a row, skipping those not newer than
+        the row's `updated_at` (already counted when the row came from a snapshot).
+        Returns the number of attempts applied.
+        """
+        i = self._row(user_id, skill)
+        since = float(self.cols["updated_at"][i])
+        n = 0
+        for att in attempts:
+            at = attempt_time(att)
+            if at and at <= since:
+                continue
+            self.update(user_id, skill, bool(att.get("is_correct")), att.get("time_ms"), att.get("hints") or 0, at=at or None)
+            n += 1
+        self.stale.discard((user_id, skill))
+        return n
+
+    def get(self, user_id: str, skill: str) -> Optional[Dict[str, Any]]:
+        i = self.rows.get((user_id, skill))
+        if i is None:
+            return None
+        c = self.cols
+        t = float(c["time_s"][i])
+        return {
+            "difficulty": int(c["level"][i]),
+            "attempts": int(c["attempts"][i]),
+            "accuracy": round(float(c["acc"][i]), 3) if c["attempts"][i] else None,
+            "avg_time_s": None if np.isnan(t) else round(t, 2),
+        }
+
+    def progress(self, user_id: str, skill: str) -> Optional[Dict[str, Any]]:
+        """The row as a student_progress record (migrations/...-adaptive-difficulty-system.sql)."""
+        i = self.rows.get((user_id, skill))
+        if i is None:
+            return None
+        c = self.cols
+        t = float(c["time_s"][i])
+        return {
+            "user_id": user_id,
+            "topic": skill,
+            "current_difficulty": int(c["level"][i]),
+            "accuracy": round(100 * float(c["acc"][i]), 2),
+            "avg_response_time": 0.0 if np.isnan(t) else round(t, 2),
+            "hints_used": int(c["hints_total"][i]),
+            "total_questions": int(c["attempts"][i]),
+            "correct_answers": int(c["correct"][i]),
+            "last_updated": datetime.fromtimestamp(float(c["updated_at"][i]), timezone.utc).isoformat(),
+        }
+
+    # --- snapshots ----------------------------------------------------------------
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Copy of the live rows (take it on the event loop, write it elsewhere)."""
+        n = len(self.rows)
+        arrays = {name: col[:n].copy() for name, col in self.cols.items()}
+        arrays["keys"] = np.frombuffer(json.dumps(list(self.rows)).encode("utf-8"), dtype=np.uint8)
+        self.dirty = False
+        return arrays
+
+    @staticmethod
+    def read(path: Path) -> Optional[Dict[str, np.ndarray]]:
+        """Arrays of a snapshot file (None if there is none)."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        n = len(arrays["attempts"])
+        if "updated_at" not in arrays:  # older snapshot: rows are as of the file's mtime
+            arrays["updated_at"] = np.full(n, path.stat().st_mtime, dtype=np.float64)
+        for name, dtype in COLUMNS.items():  # columns added since the snapshot was written
+            arrays.setdefault(name, np.zeros(n, dtype=dtype))
+        return arrays
+
+    @staticmethod
+    def merge(ours: Dict[str, np.ndarray], theirs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Union of two snapshots; a key in both keeps the row with the newer updated_at."""
+        keys = [tuple(k) for k in json.loads(ours["keys"].tobytes().decode("utf-8"))]
+        their_keys = [tuple(k) for k in json.loads(theirs["keys"].tobytes().decode("utf-8"))]
+        index = {k: i for i, k in enumerate(keys)}
+        out = {name: ours[name].copy() for name in COLUMNS}
+        extra = []
+        for j, key in enumerate(their_keys):
+            i = index.get(key)
+            if i is None:
+                extra.append(j)
+                keys.append(key)
+            elif theirs["updated_at"][j] > out["updated_at"][i]:
+                for name in COLUMNS:
+                    out[name][i] = theirs[name][j]
+        for name in COLUMNS:
+            out[name] = np.concatenate([out[name], theirs[name][extra].astype(COLUMNS[name])])
+        out["keys"] = np.frombuffer(json.dumps(keys).encode("utf-8"), dtype=np.uint8)
+        return out
+
+    @staticmethod
+    def save(arrays: Dict[str, np.ndarray], path: Path) -> None:
+        """Merge `arrays` into the snapshot at `path` (other workers write it too) and replace it."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _locked(path):
+            try:
+                on_disk = SkillModel.read(path)
+            except Exception as e:
+                print(f"[SKILL] Overwriting unreadable snapshot {path}: {e}")
+                on_disk = None
+            if on_disk is not None:
+                arrays = SkillModel.merge(arrays, on_disk)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, path)
+
+    def load(self, path: Path) -> bool:
+        data = self.read(path)
+        if data is None:
+            return False
+        keys = json.loads(data["keys"].tobytes().decode("utf-8"))
+        self.rows = {}
+        self._alloc(max(len(keys), 1024))
+        self.rows = {(u, s): i for i, (u, s) in enumerate(keys)}
+        for name in COLUMNS:
+            self.cols[name][:len(keys)] = data[name]
+        # attempts stored after the snapshot are replayed on first use (see routes/attempts.py)
+        self.stale = set(self.rows)
+        return True
+
+
+@contextmanager
+def _locked(path: Path):
+    """Exclusive lock on `path`.lock across worker processes (no-op without fcntl)."""
+    if fcntl is None:
+        yield
+        return
+    with open(path.with_name(path.name + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+model = SkillModel(alpha=float(os.getenv("SKILL_EWMA_ALPHA", "0.2")))
+_snapshot_task: Optional[asyncio.Task] = None
+
+
+def snapshot_path() -> Path:
+    return Path(os.getenv("SKILL_SNAPSHOT_PATH", str(DEFAULT_PATH)))
+
+
+async def save_snapshot() -> None:
+    if model.dirty:
+        await run_in_threadpool(SkillModel.save, model.snapshot(), snapshot_path())
+
+
+async def _snapshot_forever() -> None:
+    interval = float(os.getenv("SKILL_SNAPSHOT_S", "60"))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await save_snapshot()
+        except Exception as e:
+            print(f"[SKILL] Snapshot failed: {e}")
+
+
+def start() -> None:
+    global _snapshot_task
+    try:
+        if model.load(snapshot_path()):
+            print(f"[SKILL] Loaded {len(model)} student/skill rows from {snapshot_path()}")
+    except Exception as e:
+        print(f"[SKILL] Ignoring unreadable snapshot {snapshot_path()}: {e}")
+    _snapshot_task = asyncio.create_task(_snapshot_forever())
+
+
+async def stop() -> None:
+    global _snapshot_task
+    if _snapshot_task is not None:
+        _snapshot_task.cancel()
+        _snapshot_task = None
+    await save_snapshot()
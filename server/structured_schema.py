@@ -1,4 +1,7 @@
 # server/structured_schema.py
+# Strict structured-output schema for quiz generation (response_format of chat.completions).
+# Strict mode requires every property to be listed in "required" and rejects oneOf/minItems,
+# so fitb items send an empty options list and the item count is left to the prompt.
 QUIZ_RESPONSE_FORMAT = {
     "type": "json_schema",
     "json_schema": {
@@ -9,7 +12,6 @@ QUIZ_RESPONSE_FORMAT = {
             "properties": {
                 "items": {
                     "type": "array",
-                    "minItems": 3,
                     "items": {
                         "type": "object",
                         "properties": {
@@ -17,10 +19,10 @@ QUIZ_RESPONSE_FORMAT = {
                             "type": {"type": "string", "enum": ["mcq", "fitb"]},
                             "question": {"type": "string"},
                             "options": {"type": "array", "items": {"type": "string"}},
-                            "answer": { "oneOf": [ {"type":"integer"}, {"type":"string"} ] },
+                            "answer": {"anyOf": [{"type": "integer"}, {"type": "string"}]},
                             "explanation": {"type": "string"}
                         },
-                        "required": ["type", "question", "answer"],
+                        "required": ["id", "type", "question", "options", "answer", "explanation"],
                         "additionalProperties": False
                     }
                 }
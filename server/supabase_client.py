@@ -1,9 +1,253 @@
+# server/supabase_client.py
+"""
+Process-wide database access: one Supabase client per process (its HTTP connections
+are reused across calls) plus bulk write helpers.
+
+Both backends implement the same `Store` interface:
+  SupabaseStore  the hosted Postgres, through `sb()`
+  SQLiteStore    a local stand-in (rows as JSON plus the columns we filter on), for
+                 development, tests and benchmarks without network access
+
+Writes go through `insert_many` / `upsert_many`, which chunk rows into multi-row
+requests instead of one round trip per row.
+
+Env:
+  SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+  PERSIST_BACKEND       supabase | sqlite   (default: supabase if SUPABASE_URL is set)
+  PERSIST_SQLITE_PATH   SQLite stand-in     (default: server/data/app.sqlite)
+  DB_CHUNK_SIZE         rows per request    (default: 500)
+  DB_HEALTH_TABLE       table for the ping  (default: profiles)
+  DB_HEALTH_INTERVAL_S  ping cache lifetime (default: 30)
+  ATTEMPTS_TABLE        (default: quiz_attempts)
+  QUIZZES_TABLE         (default: saved_quizzes)
+  PROGRESS_TABLE        (default: student_progress)
+"""
+
+from __future__ import annotations
+
+import json
 import os
-from supabase import create_client, Client
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Protocol, Sequence
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+DATA_DIR = Path(__file__).parent / "data"
+
+_client: Optional["Client"] = None
+_client_key: Optional[tuple] = None
+_client_lock = threading.Lock()
 
-def sb() -> Client:
+
+def sb() -> "Client":
+    """The shared Supabase client (built on first use, rebuilt if the env changed)."""
+    global _client, _client_key
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
     if not url or not key:
         raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
-    return create_client(url, key)
+    if _client is None or _client_key != (url, key):
+        with _client_lock:
+            if _client is None or _client_key != (url, key):
+                from supabase import create_client
+                _client, _client_key = create_client(url, key), (url, key)
+    return _client
+
+
+def reset() -> None:
+    """Drop the shared client so the next sb() reconnects (after a failed health check)."""
+    global _client, _client_key
+    with _client_lock:
+        _client, _client_key = None, None
+
+
+def chunked(rows: Sequence[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    for i in range(0, len(rows), size):
+        yield list(rows[i:i + size])
+
+
+def _chunk_size() -> int:
+    return int(os.getenv("DB_CHUNK_SIZE", "500"))
+
+
+class Store(Protocol):
+    def insert_many(self, table: str, rows: Sequence[Dict[str, Any]]) -> int: ...
+
+    def upsert_many(self, table: str, rows: Sequence[Dict[str, Any]], on_conflict: str) -> int: ...
+
+    def select(self, table: str, where: Dict[str, Any], order_by: str, limit: int) -> List[Dict[str, Any]]: ...
+
+    def ping(self) -> bool: ...
+
+
+class SupabaseStore:
+    def insert_many(self, table: str, rows: Sequence[Dict[str, Any]]) -> int:
+        client = sb()
+        for chunk in chunked(rows, _chunk_size()):
+            client.table(table).insert(chunk).execute()
+        return len(rows)
+
+    def upsert_many(self, table: str, rows: Sequence[Dict[str, Any]], on_conflict: str) -> int:
+        client = sb()
+        for chunk in chunked(rows, _chunk_size()):
+            client.table(table).upsert(chunk, on_conflict=on_conflict).execute()
+        return len(rows)
+
+    def select(self, table: str, where: Dict[str, Any], order_by: str, limit: int) -> List[Dict[str, Any]]:
+        q = sb().table(table).select("*")
+        for col, val in where.items():
+            q = q.eq(col, val)
+        return q.order(order_by, desc=True).limit(limit).execute().data
+
+    def ping(self) -> bool:
+        sb().table(os.getenv("DB_HEALTH_TABLE", "profiles")).select("id").limit(1).execute()
+        return True
+
+
+class SQLiteStore:
+    """
+    Local stand-in: each table keeps the row as JSON plus the columns we filter on, and
+    a `key` column holding the on_conflict values so upserts behave like Postgres.
+    """
+
+    INDEXED = ("id", "user_id", "skill", "quiz_id", "created_at")
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._tables: set = set()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _ensure(self, conn: sqlite3.Connection, table: str) -> None:
+        if table in self._tables:
+            return
+        cols = ", ".join(f"{c} TEXT" for c in self.INDEXED)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (rowid INTEGER PRIMARY KEY, {cols}, data TEXT NOT NULL)')
+        if "key" not in {r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')}:
+            conn.execute(f'ALTER TABLE "{table}" ADD COLUMN key TEXT')
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{table}_key" ON "{table}"(key)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "{table}_user_skill" ON "{table}"(user_id, skill, created_at)')
+        self._tables.add(table)
+
+    def _write(self, table: str, rows: Sequence[Dict[str, Any]], conflict: Optional[List[str]]) -> int:
+        conn = self._conn()
+        cols = (*self.INDEXED, "key", "data")
+        sql = f'INSERT INTO "{table}" ({", ".join(cols)}) VALUES ({", ".join("?" * len(cols))})'
+        if conflict:
+            updates = ", ".join(f"{c} = excluded.{c}" for c in (*self.INDEXED, "data"))
+            sql += f" ON CONFLICT(key) DO UPDATE SET {updates}"
+        with conn:
+            self._ensure(conn, table)
+            for chunk in chunked(rows, _chunk_size()):
+                conn.executemany(sql, [
+                    tuple(_text(r.get(c)) for c in self.INDEXED)
+                    + (json.dumps([r.get(c) for c in conflict]) if conflict else None, json.dumps(r))
+                    for r in chunk
+                ])
+        return len(rows)
+
+    def insert_many(self, table: str, rows: Sequence[Dict[str, Any]]) -> int:
+        return self._write(table, rows, None)
+
+    def upsert_many(self, table: str, rows: Sequence[Dict[str, Any]], on_conflict: str) -> int:
+        return self._write(table, rows, [c.strip() for c in on_conflict.split(",")])
+
+    def select(self, table: str, where: Dict[str, Any], order_by: str, limit: int) -> List[Dict[str, Any]]:
+        conn = self._conn()
+        with conn:
+            self._ensure(conn, table)
+        clause = " AND ".join(f"{c} = ?" for c in where) or "1"
+        rows = conn.execute(
+            f'SELECT data FROM "{table}" WHERE {clause} ORDER BY {order_by} DESC, rowid DESC LIMIT ?',
+            (*[_text(v) for v in where.values()], limit),
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def ping(self) -> bool:
+        self._conn().execute("SELECT 1").fetchone()
+        return True
+
+
+def _text(v: Any) -> Optional[str]:
+    return None if v is None else str(v)
+
+
+_store: Optional[Store] = None
+_health: Dict[str, Any] = {"ok": None, "checked_at": 0.0, "error": None}
+
+
+def backend() -> str:
+    return os.getenv("PERSIST_BACKEND") or ("supabase" if os.getenv("SUPABASE_URL") else "sqlite")
+
+
+def get_store() -> Store:
+    """The process-wide store for the configured backend."""
+    global _store
+    if _store is None:
+        with _client_lock:
+            if _store is None:
+                kind = backend()
+                if kind == "supabase":
+                    _store = SupabaseStore()
+                elif kind == "sqlite":
+                    _store = SQLiteStore(Path(os.getenv("PERSIST_SQLITE_PATH", str(DATA_DIR / "app.sqlite"))))
+                else:
+                    raise ValueError(f"Unknown PERSIST_BACKEND {kind!r}; expected supabase or sqlite")
+    return _store
+
+
+def health(force: bool = False) -> Dict[str, Any]:
+    """
+    Cached ping of the store (at most one per DB_HEALTH_INTERVAL_S). A failed ping drops
+    the Supabase client so the next call starts from a fresh connection.
+    """
+    now = time.time()
+    if not force and now - _health["checked_at"] < float(os.getenv("DB_HEALTH_INTERVAL_S", "30")):
+        return dict(_health)
+    try:
+        get_store().ping()
+        _health.update(ok=True, error=None)
+    except Exception as e:
+        _health.update(ok=False, error=str(e))
+        reset()
+    _health.update(checked_at=now, backend=backend())
+    return dict(_health)
+
+
+# --- bulk helpers for the write-heavy tables -------------------------------------------
+def attempts_table() -> str:
+    return os.getenv("ATTEMPTS_TABLE", "quiz_attempts")
+
+
+def quizzes_table() -> str:
+    return os.getenv("QUIZZES_TABLE", "saved_quizzes")
+
+
+def progress_table() -> str:
+    return os.getenv("PROGRESS_TABLE", "student_progress")
+
+
+def upsert_attempts(rows: Sequence[Dict[str, Any]]) -> int:
+    return get_store().upsert_many(attempts_table(), rows, on_conflict="id")
+
+
+def upsert_saved_quizzes(rows: Sequence[Dict[str, Any]]) -> int:
+    return get_store().upsert_many(quizzes_table(), rows, on_conflict="id")
+
+
+def upsert_progress(rows: Sequence[Dict[str, Any]]) -> int:
+    """student_progress rows, one per (user_id, topic)."""
+    return get_store().upsert_many(progress_table(), rows, on_conflict="user_id,topic")
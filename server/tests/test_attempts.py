@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from server import skill_model, supabase_client
+from server.quiz_schema import AttemptPayload
+from server.routes import attempts
+from server.write_behind import WriteBehind
+
+USER = "6f1c3c2e-8a5b-4d0e-9c51-2f7d1f0b9a11"
+
+
+class SlowStore:
+    """select blocks until released, like a Supabase round trip."""
+
+    def __init__(self, stored):
+        self.stored = stored
+        self.release = threading.Event()
+        self.selects = 0
+
+    def select(self, table, where, order_by, limit):
+        self.selects += 1
+        assert self.release.wait(5)
+        return list(self.stored)
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    model = skill_model.SkillModel()
+    monkeypatch.setattr(skill_model, "model", model)
+    monkeypatch.setenv("WRITE_SPILL_DIR", str(tmp_path))
+    monkeypatch.setattr(attempts, "writes", WriteBehind())
+    monkeypatch.setattr(attempts, "_deferred", {})
+    monkeypatch.setattr(attempts, "_hydrating", {})
+    old = datetime(2026, 1, 1, tzinfo=timezone.utc).isoformat()
+    store = SlowStore([{"id": f"s{i}", "user_id": USER, "skill": "grammar", "is_correct": True, "created_at": old} for i in range(2)])
+    monkeypatch.setattr(supabase_client, "get_store", lambda: store)
+    return model, store
+
+
+def attempt(ok=False):
+    return AttemptPayload(quiz_id="q", item_id="i", skill="grammar", user_id=USER, user_answer="a", is_correct=ok, time_ms=3000)
+
+
+def test_first_attempt_is_acknowledged_before_history_loads(env):
+    model, store = env
+
+    async def scenario():
+        acks = [await attempts.log_attempt(attempt()) for _ in range(3)]
+        assert all(a["ok"] for a in acks)
+        assert (USER, "grammar") not in model  # history still loading
+        store.release.set()
+        await attempts.ensure_loaded(USER, "grammar")
+
+    asyncio.run(scenario())
+    state = model.get(USER, "grammar")
+    assert state["attempts"] == 5  # 2 stored + 3 acknowledged meanwhile
+    assert store.selects == 1
+    assert attempts._deferred == {}
+
+
+def test_loaded_rows_update_in_memory(env):
+    model, store = env
+    store.release.set()
+
+    async def scenario():
+        await attempts.ensure_loaded(USER, "grammar")
+        await attempts.log_attempt(attempt(ok=True))
+
+    asyncio.run(scenario())
+    assert model.get(USER, "grammar")["attempts"] == 3
+    assert store.selects == 1
@@ -0,0 +1,47 @@
+from server.chunker import Chunker, count_tokens
+
+PAGE = """Unit 3 ― Travel and Tourism
+Name:
+_______________
+Activity 1: Grammar practice
+We went to the market yesterday.
+It was a very busy day.
+The children bought fresh apples there.
+Then everybody walked home together.
+"""
+
+
+def test_passages_are_tagged_with_unit_and_section():
+    passages = list(Chunker().chunk_page("book.pdf", 0, PAGE))
+    assert [p["id"] for p in passages] == ["book.pdf:p0_0"]
+    assert passages[0]["meta"] == {"source": "book.pdf", "page": 1, "unit": 3, "section": "grammar"}
+
+
+def test_headings_carry_over_to_later_pages():
+    chunker = Chunker()
+    list(chunker.chunk_page("book.pdf", 0, PAGE))
+    (p,) = chunker.chunk_page("book.pdf", 1, "Reading about trains is fun for every child.")
+    assert p["meta"] == {"source": "book.pdf", "page": 2, "unit": 3, "section": "grammar"}
+
+
+def test_boilerplate_is_dropped():
+    text = " ".join(p["text"] for p in Chunker().chunk_page("book.pdf", 0, PAGE))
+    assert "Name" not in text and "___" not in text and "Unit 3" not in text
+
+
+def test_running_footer_is_dropped_after_repeating():
+    chunker = Chunker()
+    pages = [f"Story number {i} begins here and goes on.\nEnglish 68 GRADE 6\nThe Green School" for i in range(5)]
+    texts = [" ".join(p["text"] for p in chunker.chunk_page("book.pdf", i, page)) for i, page in enumerate(pages)]
+    assert "The Green School" in texts[0]
+    assert "The Green School" not in texts[-1] and "GRADE" not in texts[-1]
+
+
+def test_consecutive_passages_overlap_within_budget():
+    chunker = Chunker(max_tokens=20, overlap_tokens=8)
+    passages = list(chunker.chunk_page("book.pdf", 0, PAGE))
+    assert len(passages) > 1
+    assert all(count_tokens(p["text"]) <= 20 for p in passages)
+    for prev, nxt in zip(passages, passages[1:]):
+        last = prev["text"].rsplit(". ", 1)[-1]
+        assert nxt["text"].startswith(last)
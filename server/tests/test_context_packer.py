@@ -0,0 +1,39 @@
+from server import context_packer
+from server.chunker import count_tokens
+
+
+def test_sentences_cut_by_the_trim_stay_available(monkeypatch):
+    monkeypatch.setattr(context_packer, "MIN_PIECE_TOKENS", 1)
+    long = "One two three four five six seven eight nine ten."
+    passages = [
+        {"id": "a", "text": f"Alpha beta gamma delta. {long}"},
+        {"id": "b", "text": long},
+    ]
+    packed = context_packer.pack(passages, max_tokens=14)
+    assert packed.ids == ["a", "b"] and packed.dropped == 0
+    assert packed.text.splitlines() == ["[a] Alpha beta gamma delta.", "[b] One two three"]
+    assert packed.tokens == count_tokens(packed.text.replace("\n", " ")) == 14
+
+
+def test_pack_stays_within_budget_and_cuts_at_a_sentence():
+    passages = [
+        {"id": str(i), "text": f"Cat {i} sat on mat {i}. It was warm in room {i}. Then cat {i} slept. Dog {i} woke up."}
+        for i in range(5)
+    ]
+    packed = context_packer.pack(passages, max_tokens=52)
+    assert packed.tokens <= 52
+    assert packed.tokens == sum(count_tokens(line) for line in packed.text.splitlines())
+    assert packed.ids == ["0", "1"] and packed.dropped == 3
+    assert packed.text.splitlines()[-1] == "[1] Cat 1 sat on mat 1. It was warm in room 1. Then cat 1 slept."
+
+
+def test_repeated_sentences_are_packed_once():
+    passages = [{"id": "a", "text": "One fact here. Two facts here."}, {"id": "b", "text": "Two facts here. Three facts."}]
+    packed = context_packer.pack(passages, max_tokens=100)
+    assert packed.text.splitlines() == ["[a] One fact here. Two facts here.", "[b] Three facts."]
+
+
+def test_trim_cuts_at_sentence_boundary_or_by_words():
+    assert context_packer.trim("Short one. Another sentence follows here.", 4) == "Short one."
+    assert context_packer.trim("one two three four five six", 3) == "one two three"
+    assert context_packer.trim("fits.", 10) == "fits."
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from server import diversity
+
+
+def unit_rows(*rows):
+    v = np.asarray(rows, dtype="float32")
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_mmr_without_diversity_keeps_rank_order():
+    vecs = unit_rows([1, 0], [1, 0.01], [0, 1], [0.01, 1])
+    assert diversity.mmr(vecs, 3, lam=1.0) == [0, 1, 2]
+
+
+def test_mmr_skips_near_copies_of_picked_rows():
+    vecs = unit_rows([1, 0], [1, 0.01], [0, 1], [0.01, 1])
+    assert diversity.mmr(vecs, 2, lam=0.7) == [0, 2]
+
+
+def test_mmr_follows_given_relevance():
+    vecs = unit_rows([1, 0], [0, 1], [1, 1])
+    relevance = np.array([0.1, 0.2, 0.9], dtype="float32")
+    assert diversity.mmr(vecs, 1, lam=0.7, relevance=relevance) == [2]
+
+
+def test_mmr_edge_cases():
+    vecs = unit_rows([1, 0], [0, 1])
+    assert diversity.mmr(vecs, 0) == []
+    assert diversity.mmr(vecs[:0], 3) == []
+    assert sorted(diversity.mmr(vecs, 5)) == [0, 1]
+
+
+def test_rank_relevance_falls_from_one():
+    r = diversity.rank_relevance(4)
+    assert r[0] == 1.0 and np.all(np.diff(r) < 0)
+
+
+def test_near_duplicates_clusters_boilerplate():
+    texts = [
+        "Fill in the blanks with the correct form of the verb.",
+        "The sea was calm and the fishermen went out early in the morning.",
+        "Fill in the blanks with the correct form of the verb!",
+    ]
+    assert diversity.near_duplicates(texts).tolist() == [0, 1, 0]
+
+
+def test_select_prefers_top_ranked_rows(monkeypatch):
+    retriever = pytest.importorskip("server.retriever")
+    monkeypatch.setattr(retriever, "_stored_vectors", lambda ids: None)
+    ids = list(range(100, 120))
+    relevance = diversity.rank_relevance(len(ids))
+    assert retriever._select(ids, 3, relevance) == [100, 101, 102]
+
+    rng = np.random.default_rng(0)
+    picks = retriever._select(ids, 6, relevance + rng.uniform(0, retriever.RANK_JITTER, len(ids)).astype("float32"))
+    assert len(set(picks)) == 6 and max(picks) <= 115  # rows past 15 score below rows 0-5 whatever the jitter
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+index_types = pytest.importorskip("server.index_types")
+
+
+@pytest.mark.parametrize("n", [2, 3, 5, 16, 100])
+def test_pq_codes_never_need_more_centroids_than_vectors(n):
+    params = index_types.resolve_params("pq", n, 384)
+    assert 2 ** params["nbits"] <= n
+    vecs = np.random.default_rng(n).standard_normal((n, 384)).astype("float32")
+    assert index_types.build("pq", vecs, params).ntotal == n
+
+
+def test_single_vector_corpus_is_served_flat():
+    kind = index_types.serving_kind("pq", 1)
+    assert kind == "flat"
+    index = index_types.build(kind, np.ones((1, 8), dtype="float32"), index_types.resolve_params(kind, 1, 8))
+    assert index.ntotal == 1
+    assert index_types.serving_kind("ivf", 1) == "ivf"
+    assert index_types.serving_kind("pq", 2) == "pq"
+
+
+def test_pq_m_divides_dimension():
+    assert 384 % index_types.resolve_params("pq", 10000, 384, {"pq_m": 50})["pq_m"] == 0
@@ -0,0 +1,94 @@
+import asyncio
+
+from server import item_bank
+from server.item_bank import ItemBank, bucket, check_bucket
+from server.quiz_schema import QuizItem
+
+
+def mcq(question, answer=0):
+    return QuizItem(id="x", type="mcq", question=question, options=["a", "b", "c"], answer=answer)
+
+
+def make(tmp_path, **kw):
+    return ItemBank(tmp_path / "bank.sqlite", target=5, low_water=2, batch=5, **kw)
+
+
+def test_add_ignores_duplicates_and_assigns_bank_ids(tmp_path):
+    bank = make(tmp_path)
+    b = bucket("3", "Grammar", 2)
+    assert b == ("3", "grammar", 2)
+    assert bank.add(b, [mcq("Q1"), mcq("Q2"), mcq(" Q1 ")]) == 2
+    assert bank.add(b, [mcq("Q2")]) == 0
+    items, left = bank.take(b, 5)
+    assert [i.question for i in items] == ["Q1", "Q2"]
+    assert all(i.id.startswith("bank_") for i in items)
+    assert left == 0
+
+
+def test_take_is_oldest_first_and_per_bucket(tmp_path):
+    bank = make(tmp_path)
+    a, b = bucket(None, "grammar", 1), bucket(None, "grammar", 2)
+    bank.add(a, [mcq(f"A{i}") for i in range(4)])
+    bank.add(b, [mcq("B0")])
+    items, left = bank.take(a, 3)
+    assert [i.question for i in items] == ["A0", "A1", "A2"] and left == 1
+    assert bank.count(b) == 1
+    assert bank.buckets() == 2
+
+
+def test_pop_queues_one_refill_for_a_low_bucket(tmp_path):
+    async def scenario():
+        bank = make(tmp_path)
+        bank._queue = asyncio.Queue(maxsize=bank.max_queued)
+        b = bucket(None, "reading", 2)
+        bank.add(b, [mcq("R0"), mcq("R1")])
+        await bank.pop(b, 1)
+        await bank.pop(b, 1)
+        return bank
+
+    bank = asyncio.run(scenario())
+    assert bank._queued == {("", "reading", 2)}
+    assert bank._queue.qsize() == 1
+    assert bank.served == 2
+
+
+def test_refill_queue_is_bounded(tmp_path):
+    async def scenario():
+        bank = make(tmp_path, max_queued=2)
+        bank._queue = asyncio.Queue(maxsize=bank.max_queued)
+        for d in (1, 2, 3):
+            bank.request_refill(bucket(None, "grammar", d))
+        return bank
+
+    bank = asyncio.run(scenario())
+    assert len(bank._queued) == 2 and bank.refused == 1
+
+
+def test_refill_refuses_new_buckets_past_the_cap(tmp_path):
+    bank = make(tmp_path, max_buckets=1)
+    bank.add(bucket(None, "grammar", 1), [mcq("G0")])
+
+    async def generate(b, n):
+        raise AssertionError("should not call the LLM")
+
+    bank._generate = generate
+    assert asyncio.run(bank.refill(bucket(None, "writing", 1))) == 0
+    assert bank.refused == 1
+
+
+def test_check_bucket_rejects_unknown_skills_and_units():
+    warm = [("", "phonics", 1), ("intro", "grammar", 2)]
+    assert check_bucket(bucket(None, "grammar", 2), warm, 12) is None
+    assert check_bucket(bucket("12", "reading", 1), warm, 12) is None
+    assert check_bucket(bucket(None, "phonics", 1), warm, 12) is None
+    assert check_bucket(bucket("intro", "grammar", 1), warm, 12) is None
+    assert "skill" in check_bucket(bucket(None, "astrology", 1), warm, 12)
+    assert "unit" in check_bucket(bucket("13", "grammar", 1), warm, 12)
+    assert "unit" in check_bucket(bucket("0", "grammar", 1), warm, 12)
+
+
+def test_known_bucket_error_reads_env(monkeypatch):
+    monkeypatch.setenv("ITEM_BANK_WARM", "40:grammar:1")
+    monkeypatch.setenv("ITEM_BANK_MAX_UNIT", "3")
+    assert item_bank.known_bucket_error(bucket("40", "grammar", 3)) is None
+    assert item_bank.known_bucket_error(bucket("4", "grammar", 3)) is not None
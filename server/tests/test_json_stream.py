@@ -0,0 +1,42 @@
+import json
+
+from server.json_stream import ItemStreamParser
+
+ITEMS = [
+    {"id": "q1", "question": "Which word is a {noun}?", "options": ["run", "cat"], "answer": "cat"},
+    {"id": "q2", "question": "Say \"hello\" \\ bye]", "options": [], "answer": "hello"},
+]
+
+
+def feed_all(parser, text, size):
+    out = []
+    for i in range(0, len(text), size):
+        out.append(parser.feed(text[i:i + size]))
+    return out
+
+
+def test_item_split_across_chunks_is_returned_once_complete():
+    doc = json.dumps({"items": ITEMS})
+    parser = ItemStreamParser()
+    first = doc.index('"cat"}') + 6  # end of the first item (the "}" in its question doesn't count)
+    assert parser.feed(doc[:first - 5]) == []
+    assert parser.feed(doc[first - 5:first]) == ITEMS[:1]
+    assert parser.feed(doc[first:]) == ITEMS[1:]
+    assert parser.errors == 0
+
+
+def test_one_character_at_a_time():
+    for doc in (json.dumps({"questions": ITEMS}), json.dumps(ITEMS)):
+        batches = feed_all(ItemStreamParser(), doc, 1)
+        assert [item for batch in batches for item in batch] == ITEMS
+
+
+def test_objects_outside_the_item_list_are_ignored():
+    doc = json.dumps({"meta": {"n": 2}, "notes": [{"x": 1}], "items": ITEMS[:1]})
+    assert [i for b in feed_all(ItemStreamParser(), doc, 7) for i in b] == ITEMS[:1]
+
+
+def test_malformed_item_is_counted_and_skipped():
+    parser = ItemStreamParser()
+    assert parser.feed('{"items": [{"id": 1,}, {"id": 2}]}') == [{"id": 2}]
+    assert parser.errors == 1
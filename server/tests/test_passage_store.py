@@ -0,0 +1,40 @@
+import pytest
+
+from server.passage_store import PassageStore, write_store
+
+RECORDS = [
+    {"id": "book.pdf:p0_0", "text": "Unit 1 opens with a story.", "meta": {"source": "book.pdf", "page": 1, "unit": 1}},
+    {"id": "book.pdf:p0_1", "text": "Choose the correct verb ― “go” or “goes”.",
+     "meta": {"source": "book.pdf", "page": 1, "unit": 1, "section": "grammar"}},
+    {"id": "other.pdf:p3_0", "text": "", "meta": {"source": "other.pdf", "page": 4}},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "passages.store"
+    assert write_store(RECORDS, path) == len(RECORDS)
+    return PassageStore(path)
+
+
+def test_round_trip(store):
+    assert len(store) == 3
+    assert list(store) == RECORDS
+    assert store[-1] == RECORDS[-1]
+    assert store.id(1) == "book.pdf:p0_1" and store.text(1) == RECORDS[1]["text"]
+
+
+def test_missing_meta_reads_back_as_absent(store):
+    assert store.meta_column("section") == [None, "grammar", None]
+    assert store.meta_column("unit") == [1, 1, None]
+    assert store.meta_column("nope") == [None] * 3
+    assert list(store.iter_meta()) == [r["meta"] for r in RECORDS]
+
+
+def test_out_of_range_and_foreign_files(store, tmp_path):
+    with pytest.raises(IndexError):
+        store[3]
+    bogus = tmp_path / "bogus.store"
+    bogus.write_bytes(b"not a store at all")
+    with pytest.raises(ValueError):
+        PassageStore(bogus)
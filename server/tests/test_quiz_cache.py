@@ -0,0 +1,148 @@
+import asyncio
+import itertools
+
+import pytest
+
+from server import quiz_cache
+from server.quiz_cache import QuizCache, make_key
+from server.quiz_schema import BackendQuizResponse, GenerateQuizPayload, QuizItem
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    ticks = itertools.count(1000.0)
+    monkeypatch.setattr(quiz_cache.time, "time", lambda: next(ticks))
+
+
+def quiz(n, pad=0):
+    return {"items": [{"question": f"Q{n}", "pad": "x" * pad}], "source": "llm"}
+
+
+def test_make_key_depends_on_everything_that_shapes_output():
+    base = make_key("m", ["sys", "user"], ["p1"], temperature=0.7)
+    assert base == make_key("m", ["sys", "user"], ["p1"], temperature=0.7)
+    assert base != make_key("m", ["sys", "user"], ["p2"], temperature=0.7)
+    assert base != make_key("m", ["sys", "user"], ["p1"], temperature=0.2)
+    assert base != make_key("other", ["sys", "user"], ["p1"], temperature=0.7)
+
+
+def test_pool_replaces_the_oldest_variant(tmp_path, clock):
+    cache = QuizCache(tmp_path / "c.sqlite", max_bytes=1 << 20, pool_size=2)
+    for n in range(3):
+        cache.put("k", quiz(n))
+    assert cache.variants("k") == 2
+    seen = {cache.get("k")["items"][0]["question"] for _ in range(30)}
+    assert seen == {"Q1", "Q2"}
+
+
+def test_eviction_drops_least_recently_used_first(tmp_path, clock):
+    size = len(quiz_cache.json.dumps(quiz(0, pad=100)))
+    cache = QuizCache(tmp_path / "c.sqlite", max_bytes=3 * size, pool_size=1)
+    for key in ("a", "b", "c"):
+        cache.put(key, quiz(0, pad=100))
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.put("d", quiz(0, pad=100))
+    assert cache.get("b") is None
+    assert all(cache.get(k) is not None for k in ("a", "c", "d"))
+    assert cache.stats()["evictions"] == 1 and len(cache) == 3
+
+
+def test_coalesce_shares_one_call(tmp_path):
+    cache = QuizCache(tmp_path / "c.sqlite", max_bytes=1 << 20, pool_size=1)
+    calls = []
+
+    async def make():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "quiz"
+
+    async def scenario():
+        return await asyncio.gather(*(cache.coalesce("k", make) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["quiz"] * 5
+    assert len(calls) == 1 and cache.coalesced == 4
+
+
+def test_coalesce_cancels_call_once_every_waiter_is_gone(tmp_path):
+    cache = QuizCache(tmp_path / "c.sqlite", max_bytes=1 << 20, pool_size=1)
+    cancelled = []
+
+    async def make():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def scenario():
+        first = asyncio.ensure_future(cache.coalesce("k", make))
+        second = asyncio.ensure_future(cache.coalesce("k", make))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled and "k" in cache._inflight  # one caller still waiting
+        second.cancel()
+        await asyncio.sleep(0.01)
+        return first.cancelled() and second.cancelled()
+
+    assert asyncio.run(scenario())
+    assert cancelled == [1] and not cache._inflight
+
+
+@pytest.fixture
+def routes(tmp_path, monkeypatch):
+    from server.routes import quizzes
+
+    cache = QuizCache(tmp_path / "c.sqlite", max_bytes=1 << 20, pool_size=3)
+    monkeypatch.setattr(quiz_cache, "get_cache", lambda: cache)
+    counter = itertools.count(1)
+
+    async def generate_items(client, model, payload, passages):
+        n = next(counter)
+        item = QuizItem(id="q1", type="mcq", question=f"Variant {n}", options=["a", "b"], answer=0)
+        return BackendQuizResponse(items=[item], source="llm", passage_ids=[p["id"] for p in passages])
+
+    monkeypatch.setattr(quizzes, "generate_items", generate_items)
+    return quizzes, cache, counter
+
+
+def test_seeded_requests_serve_one_variant(routes):
+    quizzes, cache, counter = routes
+    payload = GenerateQuizPayload(count=1, skills=["grammar"], seed=7)
+
+    async def passages():
+        return [{"id": "p1", "text": "t"}]
+
+    async def scenario():
+        return [await quizzes.cached_generate(None, "m", payload, passages) for _ in range(4)]
+
+    results = asyncio.run(scenario())
+    assert {r.items[0].question for r in results} == {"Variant 1"}
+    assert next(counter) == 2  # generated once
+
+
+def test_unseeded_requests_grow_a_pool_of_variants(routes):
+    quizzes, cache, counter = routes
+    payload = GenerateQuizPayload(count=1, skills=["grammar"])
+    fetched = []
+
+    async def passages():
+        fetched.append(1)
+        return [{"id": f"p{len(fetched)}", "text": "t"}]
+
+    quiz_cache.random.seed(0)  # which variant a hit draws
+
+    async def scenario():
+        out = []
+        for _ in range(12):
+            out.append(await quizzes.cached_generate(None, "m", payload, passages))
+            await asyncio.sleep(0)  # let background growth run
+            await asyncio.gather(*cache._background)
+        return out
+
+    results = asyncio.run(scenario())
+    key = quiz_cache.make_key("m", quizzes.build_prompts(payload), **quizzes.LLM_SETTINGS)
+    assert cache.variants(key) == 3
+    assert next(counter) == 4  # exactly pool_size generations, each with fresh retrieval
+    assert len(fetched) == 3
+    assert len({r.items[0].question for r in results}) > 1
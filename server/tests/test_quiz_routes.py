@@ -0,0 +1,53 @@
+import asyncio
+import json
+import types
+
+import pytest
+
+from server.quiz_schema import GenerateQuizPayload
+
+quizzes = pytest.importorskip("server.routes.quizzes")
+
+
+def item(n):
+    return {"id": "x", "type": "mcq", "question": f"Q{n}?", "options": ["a", "b"], "answer": 0, "explanation": ""}
+
+
+class Client:
+    """chat.completions.create returning (or raising) the queued outcomes in order."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    async def create(self, **kw):
+        self.calls += 1
+        out = self.outcomes.pop(0)
+        if isinstance(out, Exception):
+            raise out
+        message = types.SimpleNamespace(content=json.dumps({"items": out}))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def generate(client, count):
+    return asyncio.run(quizzes.generate_items(client, "m", GenerateQuizPayload(count=count), []))
+
+
+def test_failed_topup_keeps_items_already_validated():
+    client = Client([item(1), item(2), item(3)], TimeoutError("slow"))
+    quiz = generate(client, 4)
+    assert quiz.source == "llm"
+    assert [i.question for i in quiz.items] == ["Q1?", "Q2?", "Q3?"]
+    assert client.calls == 2
+
+
+def test_topup_asks_only_for_the_shortfall():
+    client = Client([item(1)], [item(1), item(2)])
+    quiz = generate(client, 2)
+    assert [(i.id, i.question) for i in quiz.items] == [("q1", "Q1?"), ("q2", "Q2?")]
+
+
+def test_falls_back_only_without_any_item():
+    quiz = generate(Client(TimeoutError("down")), 2)
+    assert quiz.source.startswith("fallback")
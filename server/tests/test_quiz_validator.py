@@ -0,0 +1,99 @@
+import pytest
+
+from server import quiz_validator
+from server.json_stream import ItemStreamParser
+from server.quiz_schema import QuizItem
+
+
+def normalize(i, q):
+    return QuizItem(
+        id=q.get("id", f"ai_q_{i + 1}"),
+        type=q.get("type", "mcq"),
+        question=q.get("question", ""),
+        options=q.get("options", []),
+        answer=q.get("answer", 0),
+        explanation=q.get("explanation", ""),
+    )
+
+
+@pytest.fixture
+def counts(monkeypatch):
+    fresh = {k: 0 for k in quiz_validator._counts}
+    monkeypatch.setattr(quiz_validator, "_counts", fresh)
+    return fresh
+
+
+@pytest.mark.parametrize(
+    "answer, expected",
+    [("B", 1), ("b", 1), ("2", 2), ("Paris", 0), (" rome ", 2), (1, 1), ("Z", "Z")],
+)
+def test_repair_maps_mcq_answers_to_indexes(answer, expected):
+    fixed = quiz_validator.repair({"type": "mcq", "options": ["Paris", "Lyon", "Rome"], "answer": answer})
+    assert fixed["answer"] == expected
+
+
+def test_repair_drops_blank_and_duplicate_options_and_remaps_answer():
+    raw = {"type": "MCQ", "options": ["cat", " ", "dog", "cat ", "bird"], "answer": 4}
+    fixed = quiz_validator.repair(raw)
+    assert fixed == {"type": "mcq", "options": ["cat", "dog", "bird"], "answer": 2}
+    assert raw["options"][1] == " "  # input untouched
+
+
+def test_repair_stringifies_fitb_answers():
+    assert quiz_validator.repair({"type": "fitb", "answer": 7})["answer"] == "7"
+    assert quiz_validator.repair({"type": "fitb", "answer": True})["answer"] is True
+
+
+@pytest.mark.parametrize(
+    "raw, repaired",
+    [
+        ({"type": "mcq", "question": "Q", "options": ["a", "b"], "answer": 1}, False),
+        ({"type": "mcq", "question": "Q", "options": [" a", "b "], "answer": 1}, False),  # whitespace only
+        ({"question": "Q", "options": ["a", "b"], "answer": 0}, False),  # type defaulted
+        ({"type": "mcq", "question": "Q", "options": ["a", "b"], "answer": "B"}, True),
+        ({"type": "mcq", "question": "Q", "options": ["a", "a", "b"], "answer": 2}, True),
+        ({"type": "MCQ", "question": "Q", "options": ["a", "b"], "answer": 0}, True),
+        ({"type": "fitb", "question": "Q", "options": [], "answer": 3}, True),
+    ],
+)
+def test_check_counts_only_real_repairs(counts, raw, repaired):
+    items, dropped = quiz_validator.check([raw], normalize)
+    assert len(items) == 1 and dropped == 0
+    assert counts["repaired_items"] == int(repaired)
+
+
+def test_check_drops_unanswerable_items(counts):
+    raws = [
+        {"type": "mcq", "question": "ok", "options": ["a", "b"], "answer": 0},
+        {"type": "mcq", "question": "one option", "options": ["a", "a"], "answer": 0},
+        {"type": "mcq", "question": "", "options": ["a", "b"], "answer": 0},
+        {"type": "mcq", "question": "bad index", "options": ["a", "b"], "answer": 5},
+        {"type": "fitb", "question": "blank", "options": [], "answer": " "},
+    ]
+    items, dropped = quiz_validator.check(raws, normalize, start=10)
+    assert [i.question for i in items] == ["ok"]
+    assert items[0].id == "ai_q_11"
+    assert dropped == 4
+    assert (counts["items"], counts["invalid_items"]) == (5, 4)
+
+
+def test_parse_items_salvages_truncated_output(counts):
+    content = '{"items": [{"question": "a", "answer": 0}, {"question": "b", "ans'
+    assert [q["question"] for q in quiz_validator.parse_items(content)] == ["a"]
+    assert counts["parse_failures"] == 1 and counts["unusable_responses"] == 0
+    assert quiz_validator.parse_items('{"items": [{"question": "c"}]}') == [{"question": "c"}]
+    assert quiz_validator.stats()["parse_failure_rate"] == 0.5
+
+
+def test_record_stream_counts_malformed_items_and_parse_failures(counts):
+    parser = ItemStreamParser()
+    parser.feed('{"items": [{"question": "a"}, {"question": oops}, {"question": "b"}')
+    quiz_validator.record_stream(parser, items=2, finished=True)
+    assert counts["responses"] == 1
+    assert counts["malformed_items"] == 1 and counts["invalid_items"] == 1
+    assert counts["parse_failures"] == 1 and counts["unusable_responses"] == 0
+
+    parser = ItemStreamParser()
+    parser.feed('{"items": [{"question": "a"}, {"quest')
+    quiz_validator.record_stream(parser, items=1, finished=False)  # cut short by the caller
+    assert counts["responses"] == 2 and counts["parse_failures"] == 1
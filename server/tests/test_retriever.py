@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+retriever = pytest.importorskip("server.retriever")
+
+
+@pytest.fixture
+def filter_index(monkeypatch):
+    index = {
+        ("1", "grammar"): np.array([0, 2], dtype="int64"),
+        ("1", "reading"): np.array([1, 2], dtype="int64"),
+        ("1", retriever.ANY): np.array([0, 1, 2], dtype="int64"),
+    }
+    monkeypatch.setattr(retriever, "_filter_index", index)
+    monkeypatch.setattr(retriever, "_selectors", type(retriever._selectors)())
+    return index
+
+
+def test_filter_unions_known_sections(filter_index):
+    ids, sel = retriever._filter(1, ["Reading", "grammar", "astrology"])
+    assert ids.tolist() == [0, 1, 2] and sel is not None
+    assert list(retriever._selectors) == [("1", ("grammar", "reading"))]
+    assert retriever._filter("1", ["grammar", "reading"])[0] is ids
+
+
+def test_unknown_filters_are_not_memoised(filter_index):
+    for i in range(50):
+        assert retriever._filter(i + 100, [f"skill{i}"]) == (None, None)
+    assert len(retriever._selectors) == 0
+
+
+def test_selector_cache_is_lru_bounded(filter_index, monkeypatch):
+    monkeypatch.setattr(retriever, "SELECTOR_CACHE_SIZE", 2)
+    retriever._filter(1, ["grammar"])
+    retriever._filter(1, ["reading"])
+    retriever._filter(1, ["grammar"])  # most recently used again
+    retriever._filter(1, None)
+    assert list(retriever._selectors) == [("1", ("grammar",)), ("1", ("*",))]
+
+
+class _Lexical:
+    def __init__(self, hits):
+        self.hits = hits
+
+    def top(self, query, n, ids=None):
+        return [i for i in self.hits if ids is None or i in ids][:n]
+
+
+@pytest.fixture
+def ranking(monkeypatch):
+    monkeypatch.setattr(retriever, "_passages", [{"id": str(i)} for i in range(50)])
+    monkeypatch.setattr(retriever, "_canonical", None)
+    monkeypatch.setattr(retriever, "_filter", lambda unit, skills: (None, None))
+    dense_calls = []
+
+    def dense_top(query, n, ids, selector):
+        dense_calls.append(query)
+        return list(range(49, 49 - n, -1))
+
+    monkeypatch.setattr(retriever, "_dense_top", dense_top)
+    return dense_calls
+
+
+def test_lexical_pool_is_topped_up_with_dense_hits(ranking, monkeypatch):
+    monkeypatch.setattr(retriever, "_lexical", _Lexical([3, 7]))
+    ids = retriever._rank("rare term", None, None, "lexical")
+    assert ids[:2] == [3, 7] and len(ids) == retriever.TOP_N
+    assert ids[2:5] == [49, 48, 47] and ranking == ["rare term"]
+
+
+def test_full_lexical_pool_skips_the_model(ranking, monkeypatch):
+    monkeypatch.setattr(retriever, "_lexical", _Lexical(list(range(30))))
+    assert retriever._rank("common", None, None, "lexical") == list(range(retriever.TOP_N))
+    assert ranking == []
+
+
+def test_lexical_without_matches_falls_back_to_dense(ranking, monkeypatch):
+    monkeypatch.setattr(retriever, "_lexical", _Lexical([]))
+    assert retriever._rank("unknown", None, None, "lexical")[:2] == [49, 48]
+    assert ranking == ["unknown"]
@@ -0,0 +1,101 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from server.skill_model import MAX_LEVEL, MIN_LEVEL, START_LEVEL, SkillModel
+
+
+def iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def test_levels_move_after_min_attempts():
+    m = SkillModel()
+    levels = [m.update("u", "grammar", True, time_ms=5000) for _ in range(3)]
+    assert levels == [START_LEVEL, START_LEVEL, START_LEVEL + 1]
+    for _ in range(6):
+        m.update("u", "grammar", True, time_ms=5000)
+    assert m.get("u", "grammar")["difficulty"] == MAX_LEVEL
+    for _ in range(20):
+        m.update("u", "grammar", False, time_ms=5000)
+    assert m.get("u", "grammar")["difficulty"] == MIN_LEVEL
+
+
+def test_untimed_attempts_never_level_up():
+    m = SkillModel()
+    for _ in range(5):
+        m.update("u", "reading", True)
+    state = m.get("u", "reading")
+    assert state["difficulty"] == START_LEVEL and state["avg_time_s"] is None
+
+
+def test_rows_grow_past_capacity():
+    m = SkillModel(capacity=2)
+    for i in range(5):
+        m.update(f"u{i}", "grammar", i % 2 == 0)
+    assert len(m) == 5
+    assert m.get("u4", "grammar")["accuracy"] == 1.0
+    assert m.get("u3", "grammar")["accuracy"] == 0.0
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "skill.npz"
+    m = SkillModel()
+    for i in range(4):
+        m.update("u", "grammar", True, time_ms=3000, at=100.0 + i)
+    m.update("v", "reading", False, hints=2, at=200.0)
+    SkillModel.save(m.snapshot(), path)
+    assert not m.dirty
+
+    loaded = SkillModel()
+    assert loaded.load(path)
+    assert loaded.get("u", "grammar") == m.get("u", "grammar")
+    assert loaded.get("v", "reading") == m.get("v", "reading")
+    assert loaded.stale == {("u", "grammar"), ("v", "reading")}
+
+
+def test_save_merges_with_other_workers(tmp_path):
+    path = tmp_path / "skill.npz"
+    a, b = SkillModel(), SkillModel()
+    a.update("u", "grammar", True, at=100.0)
+    a.update("only-a", "grammar", True, at=100.0)
+    b.update("u", "grammar", False, at=200.0)
+    b.update("only-b", "reading", True, at=50.0)
+    SkillModel.save(b.snapshot(), path)
+    SkillModel.save(a.snapshot(), path)  # last writer, but older for ("u", "grammar")
+
+    merged = SkillModel()
+    merged.load(path)
+    assert len(merged) == 3
+    assert merged.get("u", "grammar")["accuracy"] == 0.0
+    assert merged.get("only-a", "grammar") is not None
+    assert merged.get("only-b", "reading") is not None
+
+
+def test_replay_after_snapshot_applies_only_newer_attempts(tmp_path):
+    path = tmp_path / "skill.npz"
+    m = SkillModel()
+    history = [{"is_correct": True, "time_ms": 4000, "created_at": iso(1000.0 + i)} for i in range(3)]
+    m.replay("u", "grammar", history)
+    SkillModel.save(m.snapshot(), path)
+
+    later = history + [{"is_correct": False, "time_ms": 4000, "created_at": iso(2000.0)}]
+    loaded = SkillModel()
+    loaded.load(path)
+    assert loaded.replay("u", "grammar", later) == 1
+    assert loaded.get("u", "grammar")["attempts"] == 4
+    assert ("u", "grammar") not in loaded.stale
+    assert loaded.cols["updated_at"][loaded.rows[("u", "grammar")]] == np.float64(2000.0)
+
+
+def test_snapshot_without_updated_at_uses_file_mtime(tmp_path):
+    path = tmp_path / "old.npz"
+    m = SkillModel()
+    m.update("u", "grammar", True)
+    arrays = m.snapshot()
+    del arrays["updated_at"]
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+    loaded = SkillModel()
+    loaded.load(path)
+    assert loaded.cols["updated_at"][0] == path.stat().st_mtime
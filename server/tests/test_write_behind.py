@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+import pytest
+
+from server.write_behind import WriteBehindBuffer
+
+
+class Sink:
+    def __init__(self):
+        self.batches = []
+        self.down = False
+
+    def __call__(self, rows):
+        if self.down:
+            raise ConnectionError("storage down")
+        self.batches.append(list(rows))
+        return len(rows)
+
+
+def make(tmp_path, sink, batch_size=2, max_rows=10):
+    return WriteBehindBuffer("attempts", sink, batch_size=batch_size, flush_s=0.01, spill_dir=tmp_path, max_rows=max_rows)
+
+
+def spilled(buf):
+    with open(buf.spill_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_flush_writes_in_batches(tmp_path):
+    sink = Sink()
+    buf = make(tmp_path, sink)
+    for i in range(5):
+        buf.add({"id": i})
+    assert asyncio.run(buf.flush()) == 5
+    assert [len(b) for b in sink.batches] == [2, 2, 1]
+    assert buf.rows == [] and buf.stats()["flushes"] == 3
+
+
+def test_failed_flush_keeps_rows_in_order(tmp_path):
+    sink = Sink()
+    buf = make(tmp_path, sink)
+    for i in range(3):
+        buf.add({"id": i})
+    sink.down = True
+    with pytest.raises(ConnectionError):
+        asyncio.run(buf.flush())
+    assert [r["id"] for r in buf.rows] == [0, 1, 2]
+    assert buf.pending(id=1) == [{"id": 1}]
+    assert buf.stats()["failures"] == 1
+
+
+def test_spills_as_soon_as_the_cap_is_hit(tmp_path):
+    buf = make(tmp_path, Sink(), max_rows=4)
+    for i in range(9):
+        buf.add({"id": i})
+    assert [r["id"] for r in spilled(buf)] == list(range(8))
+    assert [r["id"] for r in buf.rows] == [8]
+    assert buf.stats()["spilled"] == 8
+
+
+def test_stop_spills_what_cannot_be_written(tmp_path):
+    sink = Sink()
+    sink.down = True
+    buf = make(tmp_path, sink)
+    buf.add({"id": "a"})
+    asyncio.run(buf.stop())
+    assert spilled(buf) == [{"id": "a"}]
+    assert buf.rows == []
+
+
+def test_spill_is_requeued_a_buffer_at_a_time(tmp_path):
+    buf = make(tmp_path, Sink(), max_rows=4)
+    for i in range(8):
+        buf.add({"id": i})
+    fresh = make(tmp_path, Sink(), max_rows=4)
+    fresh._requeue_spill()
+    assert [r["id"] for r in fresh.rows] == [0, 1, 2]
+    assert [r["id"] for r in spilled(fresh)] == [3, 4, 5, 6, 7]
+    fresh.rows = []
+    fresh._requeue_spill()
+    fresh.rows = []
+    fresh._requeue_spill()
+    assert [r["id"] for r in fresh.rows] == [6, 7]
+    assert not fresh.spill_path.exists()
+
+
+def test_background_task_drains_spill_after_recovery(tmp_path):
+    sink = Sink()
+
+    async def scenario():
+        buf = make(tmp_path, sink, max_rows=4)
+        sink.down = True
+        for i in range(6):
+            buf.add({"id": i})
+        buf.start()
+        sink.down = False
+        for _ in range(200):
+            if not buf.rows and not buf.spill_path.exists():
+                break
+            await asyncio.sleep(0.01)
+        await buf.stop()
+
+    asyncio.run(scenario())
+    assert sorted(r["id"] for b in sink.batches for r in b) == list(range(6))
+
+
+@pytest.fixture
+def sqlite_store(tmp_path, monkeypatch):
+    from server import supabase_client
+
+    monkeypatch.setenv("PERSIST_BACKEND", "sqlite")
+    monkeypatch.setenv("PERSIST_SQLITE_PATH", str(tmp_path / "app.sqlite"))
+    monkeypatch.setattr(supabase_client, "_store", None)
+    return supabase_client
+
+
+def test_attempts_flush_upserts_progress(sqlite_store, monkeypatch):
+    from server import skill_model, write_behind
+
+    model = skill_model.SkillModel()
+    monkeypatch.setattr(skill_model, "model", model)
+    user = "6f1c3c2e-8a5b-4d0e-9c51-2f7d1f0b9a11"
+    rows = []
+    for i, ok in enumerate((True, False, True)):
+        model.update(user, "grammar", ok, time_ms=4000, hints=1)
+        rows.append({"id": f"a{i}", "user_id": user, "skill": "grammar", "is_correct": ok, "created_at": str(i)})
+    rows.append({"id": "anon", "user_id": None, "skill": "grammar", "is_correct": True, "created_at": "3"})
+
+    assert write_behind.write_attempts(rows) == 4
+    store = sqlite_store.get_store()
+    assert len(store.select(sqlite_store.attempts_table(), {"skill": "grammar"}, "created_at", 10)) == 4
+    (progress,) = store.select(sqlite_store.progress_table(), {"user_id": user}, "created_at", 10)
+    assert progress["topic"] == "grammar"
+    assert (progress["total_questions"], progress["correct_answers"], progress["hints_used"]) == (3, 2, 3)
+    assert progress["avg_response_time"] == 4.0
+
+    model.update(user, "grammar", True, time_ms=4000)
+    write_behind.write_attempts([{"id": "a3", "user_id": user, "skill": "grammar", "is_correct": True, "created_at": "4"}])
+    (progress,) = store.select(sqlite_store.progress_table(), {"user_id": user}, "created_at", 10)
+    assert progress["total_questions"] == 4
+
+
+def test_quizzes_use_their_upsert_helper(sqlite_store):
+    from server import write_behind
+
+    write = write_behind._writer(sqlite_store.quizzes_table())
+    write([{"id": "quiz-1", "quiz": {"items": []}, "created_at": "0"}])
+    write([{"id": "quiz-1", "quiz": {"items": [1]}, "created_at": "1"}])
+    (row,) = sqlite_store.get_store().select(sqlite_store.quizzes_table(), {"id": "quiz-1"}, "created_at", 10)
+    assert row["quiz"] == {"items": [1]}
@@ -0,0 +1,77 @@
+# server/warmup.py
+"""
+Startup preloading of the retriever (SBERT model, FAISS index, passages), so the first
+quiz request after a worker boots doesn't pay seconds of loading.
+
+The app lifespan starts `run()` in the background: the worker answers liveness
+(/api/live) right away and reports readiness (/api/ready) once preloading and a
+warm-up encode are done, so a load balancer only routes to warm workers.
+
+A failed preload still marks the worker ready, with the error recorded: quiz
+generation falls back to prompting without passages, and a worker that never turns
+ready would just be restarted into the same failure.
+
+With gunicorn and PRELOAD_IN_MASTER=1 (see gunicorn_conf.py), `preload_in_master()`
+loads everything once before forking, so workers share the model and index pages
+copy-on-write instead of each holding its own copy.
+
+Env:
+  PRELOAD_RETRIEVER  0 = keep lazy loading on first request  (default: 1)
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import time
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+state: Dict[str, Any] = {
+    "ready": False,
+    "preload": None,  # what was loaded (counts), once done
+    "error": None,
+    "took_s": None,
+}
+
+
+def enabled() -> bool:
+    return os.getenv("PRELOAD_RETRIEVER", "1") != "0"
+
+
+def _preload(encode: bool) -> Dict[str, Any]:
+    from . import retriever
+    return retriever.preload(encode=encode)
+
+
+async def run() -> None:
+    """Preload + warm up in a thread, then flip readiness."""
+    if not enabled():
+        state["ready"] = True
+        return
+    t = time.perf_counter()
+    try:
+        state["preload"] = await run_in_threadpool(_preload, True)
+        print(f"[WARMUP] Retriever ready: {state['preload']}")
+    except Exception as e:
+        state["error"] = f"{type(e).__name__}: {e}"
+        print(f"[WARMUP] Retriever preload failed, serving without it: {state['error']}")
+    state["took_s"] = round(time.perf_counter() - t, 3)
+    state["ready"] = True
+
+
+def preload_in_master() -> Optional[Dict[str, Any]]:
+    """
+    Pre-fork load (gunicorn master). No warm-up encode here: torch's OpenMP thread pool
+    isn't fork-safe, so each worker does its own (cheap) first encode in `run()`.
+    """
+    if not enabled():
+        return None
+    t = time.perf_counter()
+    loaded = _preload(False)
+    # Move everything allocated so far out of the GC's reach: collections in the workers
+    # would otherwise touch (and copy) these shared pages
+    gc.freeze()
+    print(f"[WARMUP] Preloaded in master in {time.perf_counter() - t:.1f}s: {loaded}")
+    return loaded
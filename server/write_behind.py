@@ -0,0 +1,264 @@
+# server/write_behind.py
+"""
+Write-behind persistence for attempts and saved quizzes.
+
+Routes enqueue a row and answer immediately; a background task flushes each table's
+buffer in one bulk insert when it reaches WRITE_BATCH_SIZE rows or WRITE_FLUSH_S
+seconds, whichever comes first. A classroom submitting together becomes a handful of
+inserts instead of hundreds of round trips.
+
+Rows that can't be flushed are appended to a JSONL spill file per table, so an
+acknowledged write is never silently dropped: at shutdown, and during an outage as soon
+as a buffer reaches WRITE_MAX_BUFFERED rows (memory stays bounded however long storage
+is down). Spilled rows are re-queued, at most a buffer's worth at a time, on the next
+start and after each successful flush.
+
+Rows are written with the bulk upsert helpers in supabase_client.py (Supabase, or the
+local SQLite stand-in), keyed on `id` so a retried batch never duplicates rows. The
+tables are created by supabase/migrations/20251017035200-write-behind-tables.sql.
+Each attempts batch also upserts the student_progress rows of the students in it,
+from the in-memory skill model (best effort: a failure there doesn't fail the batch).
+
+Env:
+  WRITE_BATCH_SIZE    rows per bulk upsert           (default: 200)
+  WRITE_FLUSH_S       max buffering delay            (default: 1.0)
+  WRITE_MAX_BUFFERED  rows held in memory per table  (default: 10000)
+  WRITE_SPILL_DIR     spill files                    (default: server/data/spill)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import skill_model, supabase_client
+from .supabase_client import attempts_table, quizzes_table
+
+DATA_DIR = Path(__file__).parent / "data"
+
+# Failed flushes back off up to this long before retrying
+MAX_BACKOFF_S = 30.0
+
+
+def _is_uuid(value: Any) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def progress_rows(attempts: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """student_progress rows for the (user, skill) pairs in a batch of attempts."""
+    # student_progress.user_id is a UUID referencing profiles: skip anonymous/other ids
+    pairs = dict.fromkeys((a["user_id"], a["skill"]) for a in attempts if _is_uuid(a.get("user_id")))
+    rows = (skill_model.model.progress(user_id, skill) for user_id, skill in pairs)
+    return [r for r in rows if r is not None]
+
+
+def write_attempts(rows: Sequence[Dict[str, Any]]) -> int:
+    n = supabase_client.upsert_attempts(rows)
+    progress = progress_rows(rows)
+    if progress:
+        try:
+            supabase_client.upsert_progress(progress)
+        except Exception as e:
+            # attempts are stored; the student's progress is written again with their next batch
+            print(f"[WRITE] Progress upsert of {len(progress)} rows failed: {e}")
+    return n
+
+
+def _writer(table: str) -> Callable[[Sequence[Dict[str, Any]]], int]:
+    if table == attempts_table():
+        return write_attempts
+    if table == quizzes_table():
+        return supabase_client.upsert_saved_quizzes
+    # idempotent on id: a batch retried after a partial failure doesn't duplicate
+    return lambda rows: supabase_client.get_store().upsert_many(table, rows, on_conflict="id")
+
+
+class WriteBehindBuffer:
+    """Per-table buffer flushed in bulk by a background task."""
+
+    def __init__(
+        self,
+        table: str,
+        write: Callable[[Sequence[Dict[str, Any]]], int],
+        batch_size: int,
+        flush_s: float,
+        spill_dir: Path,
+        max_rows: int = 10000,
+    ):
+        self.table = table
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_s = flush_s
+        self.max_rows = max(max_rows, batch_size)
+        self.spill_path = Path(spill_dir) / f"{table}.jsonl"
+        self.rows: List[Dict[str, Any]] = []
+        self.flushed = self.flushes = self.failures = self.spilled = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self.rows.append(row)
+        if len(self.rows) >= self.max_rows:
+            # Storage can't keep up (outage): move the buffer to disk rather than grow
+            self._spill()
+        elif len(self.rows) >= self.batch_size:
+            self._wake.set()
+
+    def pending(self, **match: Any) -> List[Dict[str, Any]]:
+        """Buffered (not yet stored) rows matching all of `match`."""
+        return [r for r in self.rows if all(r.get(k) == v for k, v in match.items())]
+
+    async def flush(self) -> int:
+        """Write everything buffered now; on failure the rows go back to the front."""
+        async with self._flush_lock:
+            written = 0
+            while self.rows:
+                batch, self.rows = self.rows[:self.batch_size], self.rows[self.batch_size:]
+                try:
+                    await run_in_threadpool(self.write, batch)
+                except Exception:
+                    self.rows = batch + self.rows
+                    self.failures += 1
+                    raise
+                written += len(batch)
+                self.flushed += len(batch)
+                self.flushes += 1
+            return written
+
+    async def _run(self) -> None:
+        backoff = self.flush_s
+        while True:
+            if backoff > self.flush_s:
+                # storage is failing: wait out the backoff even if the buffer fills up
+                await asyncio.sleep(backoff)
+            else:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=backoff)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            try:
+                n = await self.flush()
+                if n:
+                    print(f"[WRITE] Flushed {n} rows to {self.table}")
+                backoff = self.flush_s
+                if self.spill_path.exists():
+                    self._requeue_spill()
+            except Exception as e:
+                backoff = min(backoff * 2, MAX_BACKOFF_S)
+                print(f"[WRITE] Flush to {self.table} failed ({len(self.rows)} rows buffered), retry in {backoff:.0f}s: {e}")
+
+    def _requeue_spill(self) -> None:
+        """Move spilled rows back into the buffer, up to max_rows; the rest stay on disk."""
+        if not self.spill_path.exists():
+            return
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        room = max(self.max_rows - len(self.rows) - 1, 0)
+        take, rest = lines[:room], lines[room:]
+        if rest:
+            tmp = self.spill_path.with_name(self.spill_path.name + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(rest)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.spill_path)
+        else:
+            self.spill_path.unlink()
+        self.rows = [json.loads(line) for line in take] + self.rows
+        if take:
+            print(f"[WRITE] Re-queued {len(take)} spilled rows for {self.table} ({len(rest)} still on disk)")
+            if len(self.rows) >= self.batch_size:
+                self._wake.set()
+
+    def _spill(self) -> None:
+        if not self.rows:
+            return
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for row in self.rows:
+                f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"[WRITE] Spilled {len(self.rows)} unflushed rows to {self.spill_path}")
+        self.spilled += len(self.rows)
+        self.rows = []
+
+    def start(self) -> None:
+        self._requeue_spill()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Final flush; whatever still can't be written is spilled to disk."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"[WRITE] Final flush to {self.table} failed: {e}")
+        if self.rows:
+            self._spill()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self.rows),
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "spilled": self.spilled,
+            "on_disk": self.spill_path.exists(),
+        }
+
+
+class WriteBehind:
+    """The app's buffers, one per table."""
+
+    def __init__(self):
+        self.buffers: Dict[str, WriteBehindBuffer] = {}
+
+    def buffer(self, table: str) -> WriteBehindBuffer:
+        buf = self.buffers.get(table)
+        if buf is None:
+            buf = WriteBehindBuffer(
+                table,
+                _writer(table),
+                batch_size=int(os.getenv("WRITE_BATCH_SIZE", "200")),
+                flush_s=float(os.getenv("WRITE_FLUSH_S", "1.0")),
+                spill_dir=Path(os.getenv("WRITE_SPILL_DIR", str(DATA_DIR / "spill"))),
+                max_rows=int(os.getenv("WRITE_MAX_BUFFERED", "10000")),
+            )
+            self.buffers[table] = buf
+        return buf
+
+    def start(self) -> None:
+        for table in (attempts_table(), quizzes_table()):
+            self.buffer(table).start()
+
+    async def stop(self) -> None:
+        for buf in self.buffers.values():
+            await buf.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": supabase_client.backend(),
+            "tables": {t: b.stats() for t, b in self.buffers.items()},
+        }
+
+
+writes = WriteBehind()
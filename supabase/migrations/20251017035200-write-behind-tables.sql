@@ -0,0 +1,38 @@
+-- Tables written in bulk by the API's write-behind buffers (server/write_behind.py).
+-- Rows are upserted on id with the service role key, so retried batches never duplicate.
+
+-- One row per answered quiz question (POST /api/attempts)
+CREATE TABLE IF NOT EXISTS public.quiz_attempts (
+  id UUID NOT NULL PRIMARY KEY,
+  quiz_id TEXT NOT NULL,
+  item_id TEXT NOT NULL,
+  skill TEXT NOT NULL,
+  -- Not a foreign key: one unknown user id must not fail the whole batch
+  user_id TEXT,
+  user_answer TEXT NOT NULL,
+  is_correct BOOLEAN NOT NULL,
+  time_ms INTEGER, -- in milliseconds
+  hints INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Rebuilding a student's skill state reads their latest attempts per skill
+CREATE INDEX IF NOT EXISTS quiz_attempts_user_skill_created
+  ON public.quiz_attempts (user_id, skill, created_at DESC);
+
+-- Quizzes saved from the quiz generator (POST /api/quizzes/save)
+CREATE TABLE IF NOT EXISTS public.saved_quizzes (
+  id TEXT NOT NULL PRIMARY KEY, -- client-supplied quiz id, or a UUID
+  quiz JSONB NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Enable Row Level Security (the API writes with the service role, which bypasses it)
+ALTER TABLE public.quiz_attempts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.saved_quizzes ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own quiz attempts" ON public.quiz_attempts
+  FOR SELECT USING (auth.uid()::text = user_id);
+
+CREATE POLICY "Authenticated users can view saved quizzes" ON public.saved_quizzes
+  FOR SELECT USING (auth.role() = 'authenticated');